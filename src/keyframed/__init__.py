@@ -1,3 +1,6 @@
+from .algebra import fold
+from .approx import bake, decimate
+from .calculus import DerivativeCurve, IntegralCurve
 from .curve import (
     Composition,
     Curve,
@@ -5,33 +8,62 @@ from .curve import (
     Keyframe,
     ParameterGroup,
 )
+from .instrumentation import (
+    disable_instrumentation,
+    enable_instrumentation,
+    reset_stats,
+    stats,
+    trace,
+)
 from .interpolation import (
     bisect_left_keyframe, 
     bisect_right_keyframe, 
     register_interpolation_method,
 )
+from .mapped import (
+    MappedCurve,
+    open_curve,
+    save_curve,
+)
 from .misc import (
     SmoothCurve,
     SinusoidalCurve,
     HawkesProcessIntensity,
 )
+from .queries import InverseCurve
+from .realtime import Scheduler
 from .serialization import to_yaml
 
 from .utils import simplify
 
 
 __all__ = [
+    'bake',
     'bisect_left_keyframe',
     'bisect_right_keyframe',
     'Composition',
     'Curve',
     'CurveBase',
+    'decimate',
+    'DerivativeCurve',
+    'fold',
+    'disable_instrumentation',
+    'enable_instrumentation',
     'HawkesProcessIntensity',
+    'IntegralCurve',
+    'InverseCurve',
     'Keyframe',
+    'MappedCurve',
+    'open_curve',
     'ParameterGroup',
     'register_interpolation_method',
+    'reset_stats',
+    'save_curve',
+    'Scheduler',
     'simplify',
     'SinusoidalCurve',
     'SmoothCurve',
+    'stats',
     'to_yaml',
+    'trace',
     ]
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Exact folding of Compositions into single Curves: of piecewise-constant and piecewise-linear curves, and of
+scalar arithmetic on a single curve.
+"""
+from bisect import bisect_right
+from copy import copy
+from numbers import Number
+import operator
+from typing import Optional
+
+from .curve import CurveBase, Curve, Composition, Keyframe, ParameterGroup, REDUCTIONS, _is_constant_curve
+from .interpolation import _LERP_METHODS, _LINEAR_METHODS, _STEP_METHODS
+
+_MEAN = ('mean', 'average', 'avg')
+
+
+class _Piecewise:
+    """
+    A right-continuous piecewise-linear function: at breakpoint `ts[i]` it takes value `r[i]` and has left limit
+    `l[i]`, in between it interpolates linearly from `r[i]` to `l[i+1]`, and it holds `r[-1]` after the last one.
+    Steps are segments with `r[i] == l[i+1]`, jumps are breakpoints with `l[i] != r[i]`.
+    """
+    def __init__(self, ts:list, r:list, l:list):
+        self.ts, self.r, self.l = ts, r, l
+
+    def at(self, t):
+        """Returns (left limit, value) at `t`."""
+        i = bisect_right(self.ts, t) - 1
+        if self.ts[i] == t:
+            return self.l[i], self.r[i]
+        if i == len(self.ts) - 1:
+            return self.r[i], self.r[i]
+        v = _lerp(self.ts[i], self.r[i], self.ts[i+1], self.l[i+1], t)
+        return v, v
+
+    def scale(self, c) -> '_Piecewise':
+        return _Piecewise(self.ts, [v*c for v in self.r], [v*c for v in self.l])
+
+def _lerp(x0, y0, x1, y1, k):
+    if y0 == y1:
+        return y0
+    # same arithmetic as EASINGS['linear'], which is what Curve.__getitem__ resolves 'linear' to
+    t = (k - x0) / (x1 - x0)
+    return y1*t + y0*(1-t)
+
+def _is_number(v) -> bool:
+    return isinstance(v, Number) and not isinstance(v, complex)
+
+def _from_curve(curve:Curve) -> Optional[_Piecewise]:
+    if curve.loop or curve.bounce:
+        return None
+    kfs = list(curve._data.values())
+    ts, r, l = [], [], []
+    for i, kf in enumerate(kfs):
+        if kf.interpolator_arguments or not _is_number(kf.value) or (kf.interpolation_method not in _STEP_METHODS + _LINEAR_METHODS):
+            return None
+        ts.append(kf.t)
+        r.append(kf.value)
+        if i == 0:
+            l.append(kf.value)
+        else:
+            method = kfs[i-1].interpolation_method
+            if method in _STEP_METHODS:
+                l.append(kfs[i-1].value)
+            elif method in _LINEAR_METHODS:
+                l.append(kf.value)
+            else:
+                return None
+    return _Piecewise(ts, r, l)
+
+def _combine(p:_Piecewise, q:_Piecewise, f) -> Optional[_Piecewise]:
+    """Applies the binary reduction `f` over the union of the breakpoints of `p` and `q`."""
+    ts = sorted(set(p.ts) | set(q.ts))
+    ps = [p.at(t) for t in ts]
+    qs = [q.at(t) for t in ts]
+    out = _Piecewise([], [], [])
+    for j, t in enumerate(ts):
+        lp, rp = ps[j]
+        lq, rq = qs[j]
+        if j > 0:
+            t0, rp0, rq0 = ts[j-1], ps[j-1][1], qs[j-1][1]
+            if (f is operator.mul) and (rp0 != lp) and (rq0 != lq):
+                # the product of two sloped segments is quadratic
+                return None
+            if f in (min, max):
+                d0, d1 = rp0 - rq0, lp - lq
+                if d0 * d1 < 0:
+                    # p and q cross inside the segment: add the crossing as a breakpoint
+                    x = t0 + (t - t0) * d0 / (d0 - d1)
+                    if t0 < x < t:
+                        v = _lerp(t0, rp0, t, lp, x)
+                        out.ts.append(x)
+                        out.r.append(v)
+                        out.l.append(v)
+        out.ts.append(t)
+        out.r.append(f(rp, rq))
+        out.l.append(f(lp, lq) if j > 0 else f(rp, rq))
+    return out
+
+def _to_piecewise(obj) -> Optional[_Piecewise]:
+    if isinstance(obj, Composition):
+        if obj.loop or obj.bounce:
+            return None
+        f = REDUCTIONS.get(obj.reduction)
+        if f not in (operator.add, operator.sub, operator.mul, min, max):
+            return None
+        outv = None
+        for curve in obj.parameters.values():
+            p = _to_piecewise(curve)
+            if p is None:
+                return None
+            outv = p if outv is None else _combine(outv, p, f)
+            if outv is None:
+                return None
+        if obj.reduction in _MEAN:
+            outv = outv.scale(1 / len(obj.parameters))
+        weight = _to_piecewise(obj._weight)
+        if weight is None:
+            return None
+        if (weight.ts == [0]) and (weight.r == [1]):
+            return outv
+        return _combine(outv, weight, operator.mul)
+    if isinstance(obj, Curve):
+        return _from_curve(obj)
+    return None
+
+def _to_curve(p:_Piecewise, like) -> Optional[Curve]:
+    kfs = []
+    n = len(p.ts)
+    for i in range(n):
+        if (i == n - 1) or (p.r[i] == p.l[i+1]):
+            method = 'previous'
+        elif p.l[i+1] == p.r[i+1]:
+            method = 'linear'
+        else:
+            # a sloped segment that ends in a jump has no exact keyframe representation
+            return None
+        kfs.append(Keyframe(t=p.ts[i], value=p.r[i], interpolation_method=method))
+    outv = Curve(tuple(kfs), duration=like.duration, label=like.label)
+    if hasattr(like, '_using_default_label'):
+        outv._using_default_label = True
+    return outv
+
+def _constant(curve) -> Optional[Number]:
+    if _is_constant_curve(curve):
+        v = curve._data.peekitem(0)[1].value
+        if _is_number(v):
+            return v
+    return None
+
+def _affine(obj):
+    """
+    Returns `(curve, scale, offset)` if `obj` equals `curve * scale + offset` for a single non-constant Curve,
+    i.e. it is scalar arithmetic on one curve, else None.
+    """
+    if isinstance(obj, Curve):
+        return None if _constant(obj) is not None else (obj, 1, 0)
+    if (not isinstance(obj, Composition)) or obj.loop or obj.bounce:
+        return None
+    f = REDUCTIONS.get(obj.reduction)
+    if f not in (operator.add, operator.mul):
+        return None
+    weight = _constant(obj._weight)
+    if weight is None:
+        return None
+    inner, acc = None, (0 if f is operator.add else 1)
+    for curve in obj.parameters.values():
+        c = _constant(curve)
+        if c is not None:
+            acc = f(acc, c)
+        elif inner is None:
+            inner = _affine(curve)
+            if inner is None:
+                return None
+        else:
+            return None
+    if inner is None:
+        return None
+    curve, scale, offset = inner
+    if f is operator.add:
+        offset = offset + acc
+        if obj.reduction in _MEAN:
+            scale, offset = scale / len(obj.parameters), offset / len(obj.parameters)
+    else:
+        scale, offset = scale * acc, offset * acc
+    return curve, scale * weight, offset * weight
+
+def _affine_to_curve(obj) -> Optional[Curve]:
+    """Folds scalar arithmetic on one curve into that curve's keyframe values, where that's exact."""
+    inner = _affine(obj)
+    if inner is None:
+        return None
+    curve, scale, offset = inner
+    kfs = []
+    for kf in curve._data.values():
+        if (kf.interpolation_method not in _LERP_METHODS) or kf.interpolator_arguments or not _is_number(kf.value):
+            return None
+        kfs.append(Keyframe(t=kf.t, value=kf.value*scale + offset, interpolation_method=kf.interpolation_method))
+    outv = Curve(tuple(kfs), loop=curve.loop, bounce=curve.bounce, duration=curve._duration, label=obj.label)
+    if hasattr(obj, '_using_default_label'):
+        outv._using_default_label = True
+    return outv
+
+def fold(obj:CurveBase) -> CurveBase:
+    """
+    Returns an equivalent of `obj` in which every Composition that can be computed exactly as a single Curve has
+    been replaced by one. That's the case when all of its leaves use 'previous' or 'linear' interpolation with
+    numeric values, its reductions are sums, differences, means, min or max, or products where at most one factor
+    is sloped over any segment, and the result has no jump at the end of a sloped segment. The folded Curve's
+    keyframes are the union of the leaves' keyframes, plus the crossing points of min and max, so looking it up
+    costs one bisect.
+
+    Scalar arithmetic on a single curve, such as `curve * 2 + 1 - 0.5`, is folded into that curve's keyframe
+    values when its interpolation methods are weighted averages of keyframe values ('previous', 'next', 'linear'
+    and the eased lerps), for curves of any shape, including looping and bouncing ones.
+
+    Compositions that can't be folded are rebuilt around their folded children, and ParameterGroups around their
+    folded parameters. Note that folded nodes are new curves: later edits to the original leaves won't propagate.
+    """
+    if isinstance(obj, Composition):
+        p = _to_piecewise(obj)
+        curve = _to_curve(p, obj) if p is not None else None
+        if curve is None:
+            curve = _affine_to_curve(obj)
+        if curve is not None:
+            return curve
+    if isinstance(obj, ParameterGroup):
+        parameters = {name:fold(curve) for name, curve in obj.parameters.items()}
+        if all(parameters[name] is curve for name, curve in obj.parameters.items()):
+            return obj
+        outv = copy(obj)
+        outv.parameters = parameters
+        return outv
+    return obj
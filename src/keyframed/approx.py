@@ -0,0 +1,215 @@
+"""
+Error-bounded approximation of curves: thinning out keyframes, and baking arbitrary compositions into plain Curves.
+"""
+from copy import copy
+import math
+from numbers import Number
+from typing import Tuple
+
+from sortedcontainers import SortedDict
+
+from .curve import Curve, Keyframe, ParameterGroup, Composition
+from .interpolation import _LINEAR_METHODS, _STEP_METHODS
+
+
+def decimate_polyline(ts:list, vs:list, tolerance:float) -> list:
+    """
+    Greedy one-pass polyline simplification. Returns the indices of the points to keep, such that
+    linearly interpolating the kept points stays within `tolerance` of every dropped point.
+    For each run starting at an anchor, tracks the range of slopes that keep the line from the anchor
+    within tolerance of every point seen so far, and starts a new run once the next point falls outside it.
+    """
+    n = len(ts)
+    if n <= 2:
+        return list(range(n))
+    keep = [0]
+    a = 0
+    lo, hi = -math.inf, math.inf
+    for j in range(1, n):
+        dt = ts[j] - ts[a]
+        slope = (vs[j] - vs[a]) / dt
+        if not (lo <= slope <= hi):
+            # the line from the anchor to j misses an intermediate point, so the run ends at j-1
+            a = j - 1
+            keep.append(a)
+            lo, hi = -math.inf, math.inf
+            dt = ts[j] - ts[a]
+        lo = max(lo, (vs[j] - tolerance - vs[a]) / dt)
+        hi = min(hi, (vs[j] + tolerance - vs[a]) / dt)
+    keep.append(n - 1)
+    return keep
+
+def _segment_kind(kf:Keyframe):
+    """'step' or 'linear' for segments decimate knows how to thin out, else None."""
+    if kf.interpolator_arguments or not isinstance(kf.value, Number) or isinstance(kf.value, complex):
+        return None
+    if kf.interpolation_method in _STEP_METHODS:
+        return 'step'
+    if kf.interpolation_method in _LINEAR_METHODS:
+        return 'linear'
+    return None
+
+def _copy_keyframe(kf:Keyframe) -> Keyframe:
+    kf = copy(kf)
+    kf._interpolator_arguments = dict(kf._interpolator_arguments)
+    return kf
+
+def _copy_curve(curve, keyframes:list, copy_keyframes:bool=True) -> Curve:
+    """A new Curve made of `keyframes`, with the same looping, duration and label as `curve`."""
+    data = SortedDict((kf.t, _copy_keyframe(kf) if copy_keyframes else kf) for kf in keyframes)
+    outv = Curve(data, loop=curve.loop, bounce=curve.bounce, duration=getattr(curve, '_duration', None), label=curve.label)
+    if hasattr(curve, '_using_default_label'):
+        outv._using_default_label = True
+    return outv
+
+def decimate(curve:Curve, tolerance:float=0) -> Tuple[Curve, float]:
+    """
+    Returns a copy of `curve` with as few keyframes as this greedy pass can manage while staying within
+    `tolerance` of the original everywhere, along with the largest error actually introduced.
+
+    Runs of 'linear' keyframes are thinned with `decimate_polyline`. In runs of 'previous' keyframes, a keyframe
+    is dropped if its value is within `tolerance` of the last kept value. Keyframes using any other interpolation
+    method, interpolator arguments or non-numeric values are kept as is, as are the first and last keyframes and
+    the keyframes where the interpolation method changes. Runs in O(n).
+    """
+    kfs = list(curve._data.values())
+    n = len(kfs)
+    keep = [True] * n
+    max_error = 0
+    i = 0
+    while i < n - 1:
+        kind = _segment_kind(kfs[i])
+        j = i
+        while (j + 1 < n - 1) and (_segment_kind(kfs[j+1]) == kind):
+            j += 1
+        # segments i..j share a kind, so keyframes i+1..j are candidates and i, j+1 are kept as boundaries
+        if kind == 'step':
+            last = kfs[i].value
+            for m in range(i+1, j+1):
+                err = abs(kfs[m].value - last)
+                if err <= tolerance:
+                    keep[m] = False
+                    max_error = max(max_error, err)
+                else:
+                    last = kfs[m].value
+        elif kind == 'linear':
+            ts = [kf.t for kf in kfs[i:j+2]]
+            vs = [kf.value for kf in kfs[i:j+2]]
+            kept = decimate_polyline(ts, vs, tolerance)
+            for m in range(i+1, j+1):
+                keep[m] = False
+            for a, b in zip(kept[:-1], kept[1:]):
+                keep[i+a] = True
+                for m in range(a+1, b):
+                    # piecewise-linear curves differ most at their breakpoints
+                    x = (ts[m] - ts[a]) / (ts[b] - ts[a])
+                    max_error = max(max_error, abs(vs[b]*x + vs[a]*(1-x) - vs[m]))
+        i = j + 1
+    return _copy_curve(curve, [kf for kf, k in zip(kfs, keep) if k]), max_error
+
+
+def _breakpoints(obj, end) -> set:
+    """Times in [0, end] where some leaf of `obj` has a keyframe, repeated for looping and bouncing leaves."""
+    if isinstance(obj, ParameterGroup):
+        outv = set()
+        for curve in list(obj.parameters.values()) + [obj._weight]:
+            outv |= _breakpoints(curve, end)
+    else:
+        outv = {t for t in obj.keyframes if 0 <= t <= end}
+    if getattr(obj, 'loop', False) or getattr(obj, 'bounce', False):
+        period = obj.duration + 1 if obj.loop else 2 * obj.duration
+        if period > 0:
+            base = sorted(outv)
+            if obj.bounce:
+                base = sorted(set(base) | {period - t for t in base})
+            outv = {t + i*period for i in range(int(end // period) + 1) for t in base if t + i*period <= end}
+    return outv
+
+def _predict(method, a, va, b, vb, m):
+    if method in _STEP_METHODS:
+        return va
+    if method in _LINEAR_METHODS:
+        x = (m - a) / (b - a)
+        return vb*x + va*(1-x)
+    return Curve(((a, va, method), (b, vb)))[m]
+
+def _bake_curve(obj, tolerance:float, interpolation, max_depth:int) -> Tuple[Curve, float]:
+    end = obj.duration
+    points = sorted(_breakpoints(obj, end) | {0, end})
+    values = {}
+    def f(t):
+        v = values.get(t)
+        if v is None:
+            v = values[t] = obj[t]
+        return v
+
+    candidates = [interpolation] if interpolation in _STEP_METHODS else [interpolation, 'previous']
+    keyframes = []
+    max_error = 0
+    for a, b in zip(points[:-1], points[1:]):
+        stack = [(a, b, 0)]
+        while stack:
+            a_, b_, depth = stack.pop()
+            va, vb = f(a_), f(b_)
+            probes = [a_ + (b_ - a_) * q for q in (0.25, 0.5, 0.75)]
+            best = None
+            for method in candidates:
+                err = max(abs(f(m) - _predict(method, a_, va, b_, vb, m)) for m in probes)
+                if (best is None) or (err < best[1]):
+                    best = (method, err)
+                if err <= tolerance:
+                    break
+            if (best[1] > tolerance) and (depth < max_depth):
+                mid = (a_ + b_) / 2
+                # pushed right half first so segments come off the stack in time order
+                stack.append((mid, b_, depth+1))
+                stack.append((a_, mid, depth+1))
+                continue
+            keyframes.append(Keyframe(t=a_, value=va, interpolation_method=best[0]))
+            max_error = max(max_error, best[1])
+    keyframes.append(Keyframe(t=end, value=f(end), interpolation_method=interpolation))
+    return _copy_curve(obj, keyframes, copy_keyframes=False), max_error
+
+def bake(obj, frames=None, tolerance:float=None, interpolation='linear', max_depth:int=16):
+    """
+    Approximates a curve, Composition or ParameterGroup of any complexity by plain Curves of keyframes, which
+    evaluate with a single bisect. Returns `(baked, max_error)`.
+
+    - With `frames`, the curve is sampled at exactly those frames (plus frame 0, which every Curve starts at)
+      and interpolated with `interpolation`.
+      If `tolerance` is also given, the samples are then thinned with `decimate`, and `max_error` is the error
+      that introduced; otherwise it is 0, since the baked curve matches at every frame.
+    - With only `tolerance`, sampling is adaptive: each span between the keyframes of the curve's leaves
+      (which are always kept, so jumps and corners stay sharp) is checked at its quarter points and halved
+      until `interpolation` (or, failing that, a 'previous' hold) stays within `tolerance` there, for at most
+      `max_depth` halvings. `max_error` is the largest error seen at those quarter points only: it is not a
+      bound on the error in between them, which a curve wiggling faster than the check points can exceed.
+    - With neither, the curve is sampled at every integer frame up to its duration.
+
+    A ParameterGroup (other than a Composition) is baked parameter by parameter, weight included,
+    into a ParameterGroup of the same shape, with `max_error` the largest error over its curves.
+    """
+    if isinstance(obj, ParameterGroup) and not isinstance(obj, Composition):
+        parameters, max_error = {}, 0
+        for name, curve in obj.parameters.items():
+            parameters[name], err = bake(curve, frames, tolerance, interpolation, max_depth)
+            max_error = max(max_error, err)
+        weight = obj._weight.copy()
+        if (len(weight.keyframes) > 1) or not isinstance(weight, Curve):
+            weight, err = bake(weight, frames, tolerance, interpolation, max_depth)
+            max_error = max(max_error, err)
+        outv = ParameterGroup(parameters, weight=weight, label=obj.label, loop=obj.loop, bounce=obj.bounce)
+        return outv, max_error
+
+    if (frames is None) and (tolerance is not None):
+        return _bake_curve(obj, tolerance, interpolation, max_depth)
+    if frames is None:
+        frames = range(int(obj.duration) + 1)
+    # Curve() would fill a missing frame 0 with a 0, so sample the source there instead
+    frames = sorted(set(frames) | {0})
+    values = obj.evaluate(frames)
+    keyframes = [Keyframe(t=t, value=v, interpolation_method=interpolation) for t, v in zip(frames, values)]
+    outv = _copy_curve(obj, keyframes, copy_keyframes=False)
+    if tolerance is None:
+        return outv, 0
+    return decimate(outv, tolerance)
@@ -0,0 +1,335 @@
+"""
+Integrals and derivatives of curves, computed in closed form per segment where the interpolation method allows it.
+"""
+from bisect import bisect_right
+import math
+from numbers import Number
+
+from .curve import CurveBase, Curve
+from .interpolation import _LERP_METHODS, interpolation_method_name
+
+# antiderivatives over s in [0, 1] of the ease applied by each easing interpolator
+_EASE_INTEGRALS = {
+    'linear': lambda s: s*s/2,
+    'eased_lerp': lambda s: s/2 - math.sin(math.pi*s)/(2*math.pi),
+    'sin^2': lambda s: s/2 - math.sin(math.pi*s)/(2*math.pi),
+    'sin': lambda s: 2/math.pi * (1 - math.cos(math.pi*s/2)),
+}
+
+# 5-point Gauss-Legendre nodes and weights on [0, 1], for interpolators without a closed form
+_GL_NODES = [0.5 + x/2 for x in (-0.9061798459386640, -0.5384693101056831, 0.0, 0.5384693101056831, 0.9061798459386640)]
+_GL_WEIGHTS = [w/2 for w in (0.2369268850561891, 0.4786286704993665, 0.5688888888888889, 0.4786286704993665, 0.2369268850561891)]
+# opaque segments are integrated one piece of this many frames at a time, each refined adaptively
+_QUAD_PIECE = 1.0
+_QUAD_TOLERANCE = 1e-10
+_QUAD_MAX_DEPTH = 12
+
+
+def _method_name(method):
+    if (method is None) or isinstance(method, str):
+        return method
+    # unregistered callables have no closed form, so they're kept as is
+    name = interpolation_method_name(method)
+    return method if name is None else name
+
+def _angular_frequency(wavelength=None, frequency=None):
+    # same defaults as interpolation.sine_wave
+    if wavelength is None:
+        wavelength = 1/frequency if frequency is not None else 4
+    return 2*math.pi / wavelength
+
+def _sine_wave_integral(a, b, wavelength=None, frequency=None, phase=0, amplitude=1):
+    w = _angular_frequency(wavelength, frequency)
+    return amplitude / w * (math.cos(w*a + phase) - math.cos(w*b + phase))
+
+def _gauss_legendre(f, a, b):
+    h = b - a
+    return h * sum(w * f(a + h*x) for x, w in zip(_GL_NODES, _GL_WEIGHTS))
+
+def _adaptive_integral(f, a, b, whole=None, depth:int=0):
+    """Integral of f over [a, b], halving until the halves agree with the whole to within _QUAD_TOLERANCE."""
+    if b <= a:
+        return 0
+    if whole is None:
+        whole = _gauss_legendre(f, a, b)
+    m = (a + b) / 2
+    left, right = _gauss_legendre(f, a, m), _gauss_legendre(f, m, b)
+    if (depth >= _QUAD_MAX_DEPTH) or (abs(left + right - whole) <= _QUAD_TOLERANCE * max(1, abs(left + right))):
+        return left + right
+    return _adaptive_integral(f, a, m, left, depth+1) + _adaptive_integral(f, m, b, right, depth+1)
+
+
+class _DerivedCurve(CurveBase):
+    """Shared plumbing for curves computed from another curve, which they follow as it's edited."""
+    loop = False
+    bounce = False
+    _prefix = ''
+
+    def __init__(self, curve:Curve, label:str=None):
+        self.curve = curve
+        if label is None:
+            label = f"{self._prefix}({curve.label})"
+        self.label = str(label)
+        self._cache = None
+
+    def _cached(self, build):
+        """Returns `build()`, recomputed only when the curve has been edited since the last call."""
+        curve = self.curve
+        key = (curve._data, curve._version)
+        if (self._cache is None) or (self._cache[0] != key):
+            self._cache = (key, build())
+        return self._cache[1]
+
+    @property
+    def keyframes(self) -> list:
+        return self.curve.keyframes
+
+    @property
+    def values(self) -> list:
+        return [self[t] for t in self.keyframes]
+
+    @property
+    def duration(self) -> Number:
+        return self.curve.duration
+
+    def to_dict(self, *args, **kargs):
+        raise TypeError(
+            f"Derived curves can't be serialized, {type(self).__name__} has no keyframes to write. "
+            "Use keyframed.bake(...) to approximate it with a Curve first."
+        )
+
+
+class IntegralCurve(_DerivedCurve):
+    """
+    The running integral of a Curve: `integral[t]` is the exact integral of `curve` from 0 to `t`.
+
+    Segments interpolated by 'previous', 'next', 'linear', 'eased_lerp', the 'sin'/'sin^2' easings, 'exp_decay'
+    or 'sine_wave' are integrated in closed form; anything else (e.g. `Curve.from_function` callables) falls back
+    to adaptive Gauss-Legendre quadrature over pieces of `_QUAD_PIECE` frames, whose running totals are kept so
+    repeated lookups only integrate the last partial piece. Per-keyframe prefix sums make each lookup a single
+    bisect. Looping and bouncing curves are integrated period by period.
+
+    The prefix sums and running totals are rebuilt lazily whenever the curve has been edited since they were computed.
+    """
+    _prefix = 'integral'
+
+    def _prefix_sums(self):
+        kfs = list(self.curve._data.values())
+        ts = [kf.t for kf in kfs]
+        # keyframe index -> running totals of its opaque segment at each multiple of _QUAD_PIECE past the keyframe
+        running = {}
+        prefix = [0]
+        for i in range(len(kfs) - 1):
+            prefix.append(prefix[-1] + self._segment(kfs, i, kfs[i+1].t - kfs[i].t, running))
+        return ts, kfs, prefix, running
+
+    def _numeric(self, running:dict, i:int, a, x):
+        totals = running.setdefault(i, [0])
+        f = self.curve.__getitem__
+        j = int(x // _QUAD_PIECE)
+        while len(totals) <= j:
+            n = len(totals) - 1
+            totals.append(totals[-1] + _adaptive_integral(f, a + n*_QUAD_PIECE, a + (n+1)*_QUAD_PIECE))
+        return totals[j] + _adaptive_integral(f, a + j*_QUAD_PIECE, a + x)
+
+    def _segment(self, kfs:list, i:int, x, running:dict):
+        """Integral of the curve from keyframe i to x past it, with x no further than the next keyframe."""
+        kf = kfs[i]
+        nxt = kfs[i+1] if i+1 < len(kfs) else None
+        method = kf.interpolation_method
+        name = _method_name(method)
+        args = kf.interpolator_arguments
+        if (nxt is None) and (name in _LERP_METHODS):
+            return kf.value * x
+        if (name in (None, 'previous')) or (x == 0):
+            return kf.value * x
+        if name == 'next':
+            return nxt.value * x
+        if (name in _EASE_INTEGRALS) and ('ease' not in args):
+            span = nxt.t - kf.t
+            s = x / span
+            return span * (kf.value * s + (nxt.value - kf.value) * _EASE_INTEGRALS[name](s))
+        if name == 'exp_decay':
+            rate = args['decay_rate']
+            if rate == 0:
+                return kf.value * x
+            return kf.value * (1 - math.exp(-rate * x)) / rate
+        if name == 'sine_wave':
+            return _sine_wave_integral(kf.t, kf.t + x, **args)
+        return self._numeric(running, i, kf.t, x)
+
+    def _integral(self, t):
+        """Integral from 0 to t, ignoring looping."""
+        ts, kfs, prefix, running = self._cached(self._prefix_sums)
+        i = bisect_right(ts, t) - 1
+        return prefix[i] + self._segment(kfs, i, t - ts[i], running)
+
+    def __getitem__(self, k) -> Number:
+        if isinstance(k, slice):
+            raise TypeError("IntegralCurve doesn't support slicing. Use keyframed.bake to get a Curve first.")
+        if k < 0:
+            raise ValueError(f"Curves are only defined from t=0, can't integrate to {k}")
+        curve = self.curve
+        if curve.loop and (k >= curve._last_keyframe()):
+            period = curve.duration + 1
+            cycles, k = divmod(k, period)
+            return cycles * self._integral(period) + self._integral(k)
+        if curve.bounce:
+            n = curve.duration + 1
+            n2 = 2 * (n - 1)
+            cycles, k = divmod(k, n2)
+            outv = cycles * (self._integral(n) + self._integral(n2 - n)) if cycles else 0
+            if k < n:
+                return outv + self._integral(k)
+            # past n the curve plays backwards from n2 - n
+            return outv + self._integral(n) + self._integral(n2 - n) - self._integral(n2 - k)
+        return self._integral(k)
+
+    def definite(self, t0, t1) -> Number:
+        """Integral of the curve from t0 to t1."""
+        return self[t1] - self[t0]
+
+
+# segment kinds for DerivativeCurve, with the meaning of their parameters (p0, p1, p2)
+_CONST = 0    # held value: derivative 0
+_RAMP = 1     # (slope,)
+_SIN2 = 2     # (slope, span) for 'eased_lerp' and 'sin^2'
+_SIN = 3      # (slope, span)
+_EXP = 4      # (value, decay rate)
+_SINE = 5     # (amplitude, angular frequency, phase)
+_NUMERIC = 6  # opaque callables, differenced numerically
+
+_EASE_KINDS = {'linear':_RAMP, 'eased_lerp':_SIN2, 'sin^2':_SIN2, 'sin':_SIN}
+_EPS = 1e-5
+
+
+class DerivativeCurve(_DerivedCurve):
+    """
+    The derivative of a Curve with respect to t, in value per frame. At a keyframe, this is the derivative of the
+    segment starting there, and the jumps of 'previous' and 'next' segments count as 0.
+
+    Segments interpolated by 'previous', 'next', 'linear', 'eased_lerp', the 'sin'/'sin^2' easings, 'exp_decay'
+    or 'sine_wave' are differentiated analytically; anything else (e.g. `Curve.from_function` callables) is
+    differenced numerically within its segment. `evaluate(ks)` computes the analytic segments of numeric curves
+    in one vectorized pass when numpy is installed.
+    """
+    _prefix = 'derivative'
+
+    def _segments(self):
+        """Per keyframe (t, kind, p0, p1, p2), see the segment kinds above."""
+        kfs = list(self.curve._data.values())
+        outv = []
+        for i, kf in enumerate(kfs):
+            nxt = kfs[i+1] if i+1 < len(kfs) else None
+            name = _method_name(kf.interpolation_method)
+            args = kf.interpolator_arguments
+            seg = (kf.t, _CONST, 0, 0, 0)
+            if (nxt is None) and (name in _LERP_METHODS):
+                pass
+            elif name in (None, 'previous', 'next'):
+                pass
+            elif (name in _EASE_KINDS) and ('ease' not in args):
+                span = nxt.t - kf.t
+                seg = (kf.t, _EASE_KINDS[name], (nxt.value - kf.value) / span, span, 0)
+            elif name == 'exp_decay':
+                seg = (kf.t, _EXP, kf.value, args['decay_rate'], 0)
+            elif name == 'sine_wave':
+                w = _angular_frequency(args.get('wavelength'), args.get('frequency'))
+                seg = (kf.t, _SINE, args.get('amplitude', 1), w, args.get('phase', 0))
+            else:
+                seg = (kf.t, _NUMERIC, 0, 0, 0)
+            outv.append(seg)
+        return outv
+
+    def _fold_time(self, k):
+        """Maps k into the curve's first period like `Curve._adjust_k_for_looping`, with -1 where it plays backwards."""
+        curve = self.curve
+        if curve.loop and (k >= curve._last_keyframe()):
+            return k % (curve.duration + 1), 1
+        if curve.bounce:
+            n = curve.duration + 1
+            n2 = 2 * (n - 1)
+            k %= n2
+            if k >= n:
+                return n2 - k, -1
+        return k, 1
+
+    def _numeric(self, segments:list, i:int, k):
+        lo = segments[i][0]
+        hi = segments[i+1][0] if i+1 < len(segments) else math.inf
+        # stay inside the segment, so jumps at its ends don't leak in
+        a = k - _EPS if k - _EPS >= lo else k
+        b = k + _EPS if k + _EPS < hi else k
+        if a == b:
+            return 0
+        return (self.curve[b] - self.curve[a]) / (b - a)
+
+    def _at(self, segments:list, k):
+        i = bisect_right(segments, (k, math.inf)) - 1
+        t, kind, p0, p1, p2 = segments[i]
+        if kind == _CONST:
+            return 0
+        if kind == _RAMP:
+            return p0
+        if kind == _SIN2:
+            return p0 * math.pi/2 * math.sin(math.pi * (k - t) / p1)
+        if kind == _SIN:
+            return p0 * math.pi/2 * math.cos(math.pi * (k - t) / (2*p1))
+        if kind == _EXP:
+            return -p1 * p0 * math.exp(-p1 * (k - t))
+        if kind == _SINE:
+            return p0 * p1 * math.cos(p1 * k + p2)
+        return self._numeric(segments, i, k)
+
+    def __getitem__(self, k) -> Number:
+        if isinstance(k, slice):
+            raise TypeError("DerivativeCurve doesn't support slicing. Use keyframed.bake to get a Curve first.")
+        k, sign = self._fold_time(k)
+        outv = self._at(self._cached(self._segments), k)
+        return -outv if sign < 0 else outv
+
+    def evaluate(self, ks) -> list:
+        """
+        Evaluates the derivative at each of `ks`. If numpy is installed and the curve's values are plain numbers,
+        analytic segments are computed in a single vectorized pass and only numeric ones are looked up one by one.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return super().evaluate(ks)
+        segments = self._cached(self._segments)
+        try:
+            table = np.array(segments, dtype=np.float64)
+        except (TypeError, ValueError):
+            # e.g. vector-valued keyframes
+            return super().evaluate(ks)
+        curve = self.curve
+        ks = np.asarray(ks, dtype=np.float64)
+        sign = np.ones_like(ks)
+        if curve.loop:
+            n = curve.duration + 1
+            ks = np.where(ks >= curve._last_keyframe(), ks % n, ks)
+        elif curve.bounce:
+            n = curve.duration + 1
+            n2 = 2 * (n - 1)
+            ks = ks % n2
+            sign = np.where(ks >= n, -1.0, 1.0)
+            ks = np.where(ks >= n, n2 - ks, ks)
+        idx = np.searchsorted(table[:, 0], ks, side='right') - 1
+        t, kind, p0, p1, p2 = (table[idx, j] for j in range(5))
+        x = ks - t
+        with np.errstate(divide='ignore', invalid='ignore'):
+            outv = np.select(
+                [kind == _RAMP, kind == _SIN2, kind == _SIN, kind == _EXP, kind == _SINE],
+                [
+                    p0,
+                    p0 * np.pi/2 * np.sin(np.pi * x / p1),
+                    p0 * np.pi/2 * np.cos(np.pi * x / (2*p1)),
+                    -p1 * p0 * np.exp(-p1 * x),
+                    p0 * p1 * np.cos(p1 * ks + p2),
+                ],
+                default=0.0,
+            )
+        for j in np.flatnonzero(kind == _NUMERIC):
+            outv[j] = self._numeric(segments, idx[j], ks[j])
+        return (outv * sign).tolist()
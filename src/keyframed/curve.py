@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
+from array import array
+from contextlib import contextmanager
 from copy import deepcopy
 from functools import reduce, partial
 from numbers import Number
 import operator
 from sortedcontainers import SortedDict
+import threading
 from typing import Tuple, Optional, Union, Dict, Callable
 
 from .interpolation import (
@@ -13,6 +16,9 @@ from .interpolation import (
 )
 from .utils import id_generator, DictValuesArithmeticFriendly
 
+# serializes in-place edits to a curve's keyframes against snapshot() taking a reference to them
+_WRITE_LOCK = threading.RLock()
+
 def is_torch_tensor(obj):
     try:
         import torch
@@ -111,6 +117,60 @@ def ensure_sorteddict_of_keyframes(
     return SortedDict(d_)
 
 
+def _pack_numbers(xs:list):
+    """Packs a list into a typed array if every item is a plain int or every item is a plain float."""
+    if all(type(x) is int for x in xs):
+        try:
+            return array('q', xs)
+        except OverflowError:
+            return xs
+    if all(type(x) is float for x in xs):
+        return array('d', xs)
+    return xs
+
+def pack_keyframes(data:SortedDict) -> tuple:
+    """
+    Compact, picklable representation of a SortedDict of Keyframes: parallel arrays of times and values,
+    an index into a table of distinct (interpolation_method, interpolator_arguments) pairs, and any keyframe labels.
+    """
+    times, values, index, table, labels = [], [], array('i'), [], {}
+    last = None
+    for i, kf in enumerate(data.values()):
+        times.append(kf.t)
+        values.append(kf.value)
+        entry = (kf.interpolation_method, kf.interpolator_arguments)
+        # consecutive keyframes usually share their interpolation method, so check the last entry first
+        if (last is None) or (table[last] != entry):
+            last = table.index(entry) if entry in table else None
+            if last is None:
+                table.append(entry)
+                last = len(table) - 1
+        index.append(last)
+        if kf.label is not None:
+            labels[i] = kf.label
+    if len(table) <= 256:
+        index = array('B', index)
+    return _pack_numbers(times), _pack_numbers(values), index, table, labels
+
+def unpack_keyframes(packed:tuple) -> SortedDict:
+    times, values, index, table, labels = packed
+    d = {}
+    for i, (t, value, j) in enumerate(zip(times, values, index)):
+        method, args = table[j]
+        # values were already copied by unpickling, so skip the array-copying checks in Keyframe.__init__
+        kf = Keyframe.__new__(Keyframe)
+        kf.__dict__.update(
+            t=t,
+            label=labels.get(i),
+            value=value,
+            interpolation_method=method,
+            # keyframes sharing a table entry each get their own arguments dict, as they had before pickling
+            _interpolator_arguments=dict(args) if args else {},
+        )
+        d[t] = kf
+    return SortedDict(d)
+
+
 class Keyframe:
     """
     Represents a single keyframe in a curve. Comes with magic methods to support arithmetic operations on the value attribute.
@@ -196,6 +256,36 @@ class CurveBase(ABC):
     def copy(self) -> 'CurveBase':
         return deepcopy(self)
 
+    def snapshot(self) -> 'CurveBase':
+        """Returns a copy of the curve that won't observe later edits."""
+        return self.copy()
+
+    @contextmanager
+    def edit(self):
+        """
+        Context manager for a batch of edits that are published all at once: yields a private draft,
+        and on exit atomically swaps the draft's keyframes in. Snapshots taken while the batch is open see
+        none of its edits. Assumes a single writer: edits made to the curve itself during the batch are lost.
+        """
+        with _WRITE_LOCK:
+            draft = self._draft()
+        yield draft
+        with _WRITE_LOCK:
+            pairs = list(self._drafted_curves(draft))
+            for curve, _ in pairs:
+                curve._writable_data()  # refuse to publish into a snapshot, before anything is swapped
+            for curve, drafted in pairs:
+                curve._data = drafted._data
+                curve._shared = False
+                curve._version += 1
+
+    def _draft(self) -> 'CurveBase':
+        raise TypeError(f"{type(self).__name__} can't be edited.")
+
+    def _drafted_curves(self, draft):
+        """Yields (curve, draft curve) pairs for every Curve under this one."""
+        raise TypeError(f"{type(self).__name__} can't be edited.")
+
     @property
     @abstractmethod
     def keyframes(self) -> list:
@@ -215,11 +305,58 @@ class CurveBase(ABC):
     def __getitem__(self, k) -> Number:
         pass
 
+    def evaluate(self, ks) -> list:
+        """
+        Evaluates the curve at each of the (possibly fractional) frames in `ks`.
+        Subclasses may override this with a faster batch implementation.
+        """
+        return [self[k] for k in ks]
+
+    def render(self, frames, workers:int=None, chunksize:int=None):
+        """
+        Evaluates the curve at every frame in `frames`, optionally across `workers` processes.
+        Returns a list of values, or a dict of per-parameter lists for a ParameterGroup.
+        See `keyframed.render.render`.
+        """
+        from .render import render
+        return render(self, frames, workers=workers, chunksize=chunksize)
+
+    def astream(self, fps:float=60, start:float=0, **kargs):
+        """
+        Streams `(frame, value)` pairs in real time at `fps`, for use with `async for`.
+        See `keyframed.realtime.astream`.
+        """
+        from .realtime import astream
+        return astream(self, fps=fps, start=start, **kargs)
+
+    def explain(self) -> dict:
+        """
+        Reports the structure of the curve tree and its estimated evaluation cost per frame.
+        See `keyframed.explain.explain`.
+        """
+        from .explain import explain
+        return explain(self)
+
+    def _last_keyframe(self) -> Number:
+        return max(self.keyframes)
+
+    def _bounds_stamp(self) -> tuple:
+        """
+        A tuple whose items stay the very same objects for as long as the curve's duration and last keyframe can't
+        have changed, which groups use to validate their cached bounds. By default nothing is assumed.
+        """
+        return (object(),)
+
+    def _loop_bounds(self) -> tuple:
+        return self._last_keyframe(), self.duration
+
     def _adjust_k_for_looping(self, k:Number) -> Number:
-        n = (self.duration + 1)
-        if self.loop and k >= max(self.keyframes):
-            k %= n
-        elif self.bounce:
+        if self.loop:
+            last, duration = self._loop_bounds()
+            if k >= last:
+                return k % (duration + 1)
+        if self.bounce:
+            n = self.duration + 1
             n2 = 2*(n-1)
             k %= n2
             if k >= n:
@@ -281,9 +418,45 @@ class CurveBase(ABC):
     def to_dict(simplify=False, for_yaml=False, ignore_labels=False):
         raise NotImplementedError
 
+# interpolation methods that hold the value of a curve's only keyframe for every k
+_HOLDING_METHODS = (None, 'previous', 'linear')
+
+def _is_constant_curve(curve) -> bool:
+    """True for a Curve with a single keyframe whose interpolation method holds its value everywhere."""
+    return (
+        isinstance(curve, Curve)
+        and (len(curve._data) == 1)
+        and (curve._data.peekitem(0)[1].interpolation_method in _HOLDING_METHODS)
+    )
+
+def _is_unit_curve(curve) -> bool:
+    return _is_constant_curve(curve) and (curve._data.peekitem(0)[1].value == 1)
+
+
+class FunctionInterpolator:
+    """
+    Adapts a function of time to the interpolator signature, for `Curve.from_function`.
+    Unlike a lambda, this pickles whenever `f` does (e.g. module-level functions).
+    """
+    def __init__(self, f:Callable):
+        self.f = f
+
+    def __call__(self, k, curve=None, *args, **kargs):
+        return self.f(k)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FunctionInterpolator) and (self.f == other.f)
+
+    def __hash__(self):
+        return hash(self.f)
+
+    def __repr__(self) -> str:
+        return f"FunctionInterpolator({self.f!r})"
+
 class Curve(CurveBase):
     """
     Represents a curve as a sorted dictionary of Keyframes. Default interpolation produces a step function.
+    Readers that may race with edits from another thread should read through `snapshot()`.
 
     Attributes:
         loop (bool): Whether the curve should loop.
@@ -292,6 +465,12 @@ class Curve(CurveBase):
         keyframes: Returns an iterator over the times of the keyframes in the curve.
         values: Returns an iterator over the values of the keyframes in the curve.
     """
+    # copy-on-write state for snapshot(): whether a snapshot shares _data, whether this is a snapshot,
+    # and a counter bumped every time the keyframes change
+    _shared = False
+    _frozen = False
+    _version = 0
+
     def __init__(self,
         curve: Union[
             int,
@@ -316,7 +495,11 @@ class Curve(CurveBase):
             duration (float, optional): The duration of the curve. Defaults to None.
         """
         if isinstance(curve, type(self)):
-            self._data = curve._data
+            # share the keyframes copy-on-write, so neither curve's edits reach the other (or a snapshot)
+            with _WRITE_LOCK:
+                curve._shared = True
+                self._data = curve._data
+                self._shared = True
         else:
             self._data = ensure_sorteddict_of_keyframes(
                 curve,
@@ -342,11 +525,19 @@ class Curve(CurveBase):
         # not a fan of this
         return [kf.value for kf in self._data.values()]
 
+    def _last_keyframe(self) -> Number:
+        # keyframes are sorted, so this is O(1) rather than a scan
+        return self._data.keys()[-1]
+
+    def _bounds_stamp(self) -> tuple:
+        # any edit replaces _version (or _data), and _duration only changes by assignment
+        return (self._data, self._version, self._duration)
+
     @property
     def duration(self) -> Number:
         if self._duration:
             return self._duration
-        return max(self.keyframes)
+        return self._last_keyframe()
 
     def __get_slice(self, k:slice):
         start, end = k.start, k.stop
@@ -397,10 +588,26 @@ class Curve(CurveBase):
         """
         if isinstance(k, slice):
             return self.__get_slice(k)
+        return self._lookup(k)
+
+    def _lookup(self, k:Number, used:list=None) -> Number:
+        """
+        Looks up the value at frame `k`. If `used` is given, the interpolation method the lookup went through is
+        appended to it ('keyframe' for an exact hit), for `keyframed.instrumentation`.
+        """
+        if len(self._data) == 1:
+            # constant curves, e.g. scalar operands of curve arithmetic
+            kf = self._data.peekitem(0)[1]
+            if kf.interpolation_method in _HOLDING_METHODS:
+                if used is not None:
+                    used.append(kf.interpolation_method)
+                return kf.value
 
         k = self._adjust_k_for_looping(k)
 
         if k in self._data.keys():
+            if used is not None:
+                used.append('keyframe')
             outv = self._data[k]
             if isinstance(outv, Keyframe):
                 outv = outv.value
@@ -408,6 +615,8 @@ class Curve(CurveBase):
 
         left_value = bisect_left_keyframe(k, self)
         interp = left_value.interpolation_method
+        if used is not None:
+            used.append(interp)
 
         if (interp is None) or isinstance(interp, str):
             f = EASINGS.get(interp)
@@ -429,6 +638,30 @@ class Curve(CurveBase):
         except IndexError:
             return left_value.value
     
+    def evaluate(self, ks) -> list:
+        """
+        Evaluates the curve at each of `ks`. Frames that fall under a keyframe whose interpolation method
+        exposes its own `evaluate(ks)` (e.g. a compiled `keyframed.dsl.Expression`) are batched and
+        handed to it in a single call per keyframe.
+        """
+        outv = [None] * len(ks)
+        batches = {}
+        for i, k in enumerate(ks):
+            k = self._adjust_k_for_looping(k)
+            if k not in self._data:
+                kf = bisect_left_keyframe(k, self)
+                if hasattr(kf.interpolation_method, 'evaluate') and not kf.interpolator_arguments:
+                    idx, ks_ = batches.setdefault(kf.t, ([], []))
+                    idx.append(i)
+                    ks_.append(k)
+                    continue
+            outv[i] = self[k]
+        for t, (idx, ks_) in batches.items():
+            values = self._data[t].interpolation_method.evaluate(ks_)
+            for i, v in zip(idx, values):
+                outv[i] = v
+        return outv
+
     def __setitem__(self, k, v):
         interp_args = None
         if not isinstance(v, Keyframe):
@@ -445,7 +678,44 @@ class Curve(CurveBase):
                 interpolation_method=interp,
                 interpolator_arguments=interp_args if interp_args else None,
             )
-        self._data[k] = v
+        with _WRITE_LOCK:
+            self._writable_data()[k] = v
+            self._version += 1
+
+    def _writable_data(self) -> SortedDict:
+        """
+        Returns the keyframes for in-place modification, first copying them if a snapshot still shares them.
+        Callers must hold _WRITE_LOCK.
+        """
+        if self._frozen:
+            raise TypeError("Curve snapshots are read-only.")
+        if self._shared:
+            self._data = self._data.copy()
+            self._shared = False
+        return self._data
+
+    def snapshot(self) -> 'Curve':
+        """
+        Returns a read-only view of the curve as it is right now. Taking a snapshot is O(1): it shares
+        the current keyframes, and the next edit to this curve copies them first (copy-on-write).
+        Reading from a snapshot never blocks on, or observes, edits made after it was taken.
+        """
+        with _WRITE_LOCK:
+            self._shared = True
+            snap = object.__new__(type(self))
+            snap.__dict__.update(self.__dict__)
+        snap._frozen = True
+        return snap
+
+    def _draft(self) -> 'Curve':
+        draft = object.__new__(type(self))
+        draft.__dict__.update(self.__dict__)
+        draft._data = self._data.copy()
+        draft._shared = draft._frozen = False
+        return draft
+
+    def _drafted_curves(self, draft):
+        yield self, draft
     
     def __str__(self) -> str:
         d_ = {k:self[k] for k in self.keyframes}
@@ -480,9 +750,70 @@ class Curve(CurveBase):
         #params = ParameterGroup(params) ## added... no difference
         return Composition(parameters=params, label=new_label, reduction='multiply')
 
+    def integral(self) -> 'CurveBase':
+        """
+        Returns a curve whose value at t is the integral of this curve from 0 to t. See `keyframed.calculus.IntegralCurve`.
+        """
+        from .calculus import IntegralCurve
+        return IntegralCurve(self)
+
+    def derivative(self) -> 'CurveBase':
+        """
+        Returns a curve whose value at t is the derivative of this curve at t. See `keyframed.calculus.DerivativeCurve`.
+        """
+        from .calculus import DerivativeCurve
+        return DerivativeCurve(self)
+
+    def crossings(self, value:Number, t0:Number=0, t1:Number=None) -> list:
+        """
+        Returns the times in [t0, t1] at which the curve reaches `value`. See `keyframed.queries.crossings`.
+        """
+        from .queries import crossings
+        return crossings(self, value, t0, t1)
+
+    def inverse(self) -> 'CurveBase':
+        """
+        Returns the inverse of a monotone curve, mapping values to the earliest time they're reached.
+        See `keyframed.queries.InverseCurve`.
+        """
+        from .queries import InverseCurve
+        return InverseCurve(self)
+
+    def range_extrema(self, t0:Number=0, t1:Number=None) -> tuple:
+        """
+        Returns `(min, max)` of the curve over [t0, t1]. See `keyframed.queries.range_extrema`.
+        """
+        from .queries import range_extrema
+        return range_extrema(self, t0, t1)
+
+    def downsample_minmax(self, t0:Number, t1:Number, buckets:int) -> list:
+        """
+        Returns `(min, max)` of the curve over each of `buckets` equal spans of [t0, t1].
+        See `keyframed.queries.downsample_minmax`.
+        """
+        from .queries import downsample_minmax
+        return downsample_minmax(self, t0, t1, buckets)
+
     @classmethod
     def from_function(cls, f:Callable) -> CurveBase:
-        return cls({0:f(0)}, default_interpolation=lambda k, _: f(k))
+        return cls({0:f(0)}, default_interpolation=FunctionInterpolator(f))
+
+    def __getstate__(self) -> dict:
+        # pickle the keyframes as packed arrays rather than a SortedDict of Keyframe objects
+        state = self.__dict__.copy()
+        state['_data'] = pack_keyframes(self._data)
+        # copies of a snapshot are ordinary, writable curves
+        state.pop('_frozen', None)
+        state.pop('_shared', None)
+        # rebuilt on demand by keyframed.queries
+        state.pop('_extrema_index', None)
+        state.pop('_segment_cache', None)
+        return state
+
+    def __setstate__(self, state:dict):
+        state = state.copy()
+        state['_data'] = unpack_keyframes(state['_data'])
+        self.__dict__.update(state)
 
     def to_dict(self, simplify=False, for_yaml=False, ignore_labels=False):
 
@@ -553,10 +884,13 @@ class Curve(CurveBase):
         if not isinstance(other, Curve):
             return NotImplemented # delegate figuring out what to do to the other object
         delta = self.duration + 1
-        for t0, kf in other.copy()._data.items():
-            t = delta + t0
-            kf.t = t
-            self._data[t] = kf
+        with _WRITE_LOCK:
+            data = self._writable_data()
+            for t0, kf in other.copy()._data.items():
+                t = delta + t0
+                kf.t = t
+                data[t] = kf
+            self._version += 1
         return self
 
 
@@ -632,6 +966,31 @@ class ParameterGroup(CurveBase):
     def copy(self) -> 'ParameterGroup':
         return deepcopy(self)
 
+    def snapshot(self) -> 'ParameterGroup':
+        """
+        Returns a group with the same structure whose curves are all snapshots, see `Curve.snapshot`.
+        All of them are taken at the same instant.
+        """
+        with _WRITE_LOCK:
+            snap = object.__new__(type(self))
+            snap.__dict__.update(self.__dict__)
+            snap.parameters = {name:curve.snapshot() for name, curve in self.parameters.items()}
+            snap._weight = self._weight.snapshot()
+        return snap
+
+    def _draft(self) -> 'ParameterGroup':
+        # only the keyframes of the group's existing curves get published: curves added to the draft are ignored
+        draft = object.__new__(type(self))
+        draft.__dict__.update(self.__dict__)
+        draft.parameters = {name:curve._draft() for name, curve in self.parameters.items()}
+        draft._weight = self._weight._draft()
+        return draft
+
+    def _drafted_curves(self, draft):
+        for name, curve in self.parameters.items():
+            yield from curve._drafted_curves(draft.parameters[name])
+        yield from self._weight._drafted_curves(draft._weight)
+
     # feels a bit redundant with DictValuesArithmeticFriendly, but fuck it.
     def __add__(self, other) -> 'ParameterGroup':
         outv = self.copy()
@@ -660,9 +1019,41 @@ class ParameterGroup(CurveBase):
     def __eq__(self, other) -> bool:
         return self.to_dict(simplify=True, ignore_labels=True)['parameters'] == other.to_dict(simplify=True, ignore_labels=True)['parameters']
 
+    def _bounds_stamp(self) -> tuple:
+        # changes when a parameter is replaced, or anything below it is edited or replaced
+        outv = []
+        for curve in self.parameters.values():
+            outv.append(curve)
+            outv.extend(curve._bounds_stamp())
+        return tuple(outv)
+
+    def _bounds(self) -> tuple:
+        """
+        (duration, last keyframe) over the parameters, cached until one of them, or anything nested in them,
+        is edited or replaced. Validating the cache is an identity check per curve, never a look at keyframes.
+        """
+        stamp = self._bounds_stamp()
+        cached = self.__dict__.get('_bounds_cache')
+        if (cached is not None) and (len(cached[0]) == len(stamp)) and all(map(operator.is_, cached[0], stamp)):
+            return cached[1]
+        curves = self.parameters.values()
+        bounds = (
+            max(curve.duration for curve in curves),
+            max(curve._last_keyframe() for curve in curves),
+        )
+        self._bounds_cache = (stamp, bounds)
+        return bounds
+
+    def _last_keyframe(self) -> Number:
+        return self._bounds()[1]
+
+    def _loop_bounds(self) -> tuple:
+        duration, last = self._bounds()
+        return last, duration
+
     @property
     def duration(self) -> Number:
-        return max(curve.duration for curve in self.parameters.values())
+        return self._bounds()[0]
 
     def plot(self, n:int=None, xs:list=None, eps:float=1e-9, *args, **kargs):
         if n is None:
@@ -687,8 +1078,16 @@ class ParameterGroup(CurveBase):
 
     def random_label(self) -> str:
         return f"pgroup({','.join([c.label for c in self.parameters.values()])})"
-    def to_dict(self, simplify=False, for_yaml=False, ignore_labels=False):
-        params = {k:v.to_dict(simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels) for k,v in self.parameters.items()}
+    def _parameter_to_dict(self, curve, refs=None, **kargs):
+        # `refs` maps id(obj) -> name for sub-curves that are serialized once in a shared table
+        if refs and id(curve) in refs:
+            return {'$ref': refs[id(curve)]}
+        if isinstance(curve, ParameterGroup):
+            return curve.to_dict(refs=refs, **kargs)
+        return curve.to_dict(**kargs)
+
+    def to_dict(self, simplify=False, for_yaml=False, ignore_labels=False, refs=None):
+        params = {k:self._parameter_to_dict(v, refs=refs, simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels) for k,v in self.parameters.items()}
         weight = self.weight.to_dict(simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels)
         
         if not simplify:
@@ -717,6 +1116,22 @@ class ParameterGroup(CurveBase):
                 outv.pop('label')
             return outv
 
+def _fold_scalar(composition:'Composition', other:'Curve', op:Callable) -> bool:
+    """
+    Constant folding for `composition + scalar` (or `*`, per `op`) on a composition that already sums (multiplies)
+    a scalar: combines `other` into that scalar's curve rather than adding another constant child, so chains like
+    `c * 2 + 1 - 0.5` don't grow a child per operand. Only applies to constants created by curve arithmetic,
+    never to user-labelled curves. Returns False if there is nothing to fold into.
+    """
+    if not (_is_constant_curve(other) and hasattr(other, '_using_default_label')):
+        return False
+    for curve in composition.parameters.values():
+        if _is_constant_curve(curve) and hasattr(curve, '_using_default_label'):
+            kf = curve._data.peekitem(0)[1]
+            kf.value = op(kf.value, other._data.peekitem(0)[1].value)
+            return True
+    return False
+
 REDUCTIONS = {
     'add': operator.add,
     'sum': operator.add,
@@ -773,12 +1188,14 @@ class Composition(ParameterGroup):
         f = REDUCTIONS.get(self.reduction)
 
         vals = [curve[k] for curve in self.parameters.values()]
+        if not vals:
+            raise ValueError(f"Composition {self.label} has no curves to reduce.")
         outv = reduce(f, vals)
         if self.reduction in ('avg', 'average', 'mean'):
             outv = outv * (1/ len(vals))
         # TO DO: this only fixes equality test for unmodified pgroup weight.
         # if pgroup weight is anything non-standard, equality test will fail with isinstance(k, slice)
-        if self.weight != Curve({0:1}):
+        if not _is_unit_curve(self._weight):
             outv = outv * self.weight[k]
         return outv
 
@@ -811,7 +1228,8 @@ class Composition(ParameterGroup):
 
         pg_copy = self.copy()
         if self.reduction in ('sum', 'add'):
-            pg_copy.parameters[other.label] = other
+            if not _fold_scalar(pg_copy, other, operator.add):
+                pg_copy.parameters[other.label] = other
             return pg_copy
         else:
             d = {pg_copy.label:pg_copy, other.label:other}
@@ -825,7 +1243,8 @@ class Composition(ParameterGroup):
 
         pg_copy = self.copy()
         if self.reduction in ('multiply', 'mul', 'product', 'prod'):
-            pg_copy.parameters[other.label] = other
+            if not _fold_scalar(pg_copy, other, operator.mul):
+                pg_copy.parameters[other.label] = other
             return pg_copy
         else:
             d = {pg_copy.label:pg_copy, other.label:other}
@@ -892,8 +1311,8 @@ class Composition(ParameterGroup):
                 kfx = self.keyframes
                 kfy = [self[x][label] for x in kfx]
                 plt.scatter(kfx, kfy)
-    def to_dict(self, simplify=False, for_yaml=False, ignore_labels=False):
-        outv = super().to_dict(simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels)
+    def to_dict(self, simplify=False, for_yaml=False, ignore_labels=False, refs=None):
+        outv = super().to_dict(simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels, refs=refs)
         outv['reduction'] = self.reduction
         if ignore_labels and 'label' in outv:
             outv.pop('label')
@@ -1,14 +1,167 @@
+import ast
+from collections import OrderedDict
+import json
+import math
 import re
-from keyframed import Curve
+import sys
+import threading
+import warnings
+from keyframed import Curve, ParameterGroup
+from keyframed.approx import decimate_polyline
+from keyframed.interpolation import _LINEAR_METHODS, _STEP_METHODS
+
+# functions available to schedule expressions: name -> (scalar implementation, numpy function name)
+EXPRESSION_FUNCTIONS = {
+    'sin': (math.sin, 'sin'),
+    'cos': (math.cos, 'cos'),
+    'tan': (math.tan, 'tan'),
+    'asin': (math.asin, 'arcsin'),
+    'acos': (math.acos, 'arccos'),
+    'atan': (math.atan, 'arctan'),
+    'atan2': (math.atan2, 'arctan2'),
+    'sinh': (math.sinh, 'sinh'),
+    'cosh': (math.cosh, 'cosh'),
+    'tanh': (math.tanh, 'tanh'),
+    'sqrt': (math.sqrt, 'sqrt'),
+    'exp': (math.exp, 'exp'),
+    'log': (math.log, 'log'),
+    'log10': (math.log10, 'log10'),
+    'abs': (abs, 'abs'),
+    'floor': (math.floor, 'floor'),
+    'ceil': (math.ceil, 'ceil'),
+    'round': (round, 'round'),
+    'pow': (math.pow, 'float_power'),
+}
+EXPRESSION_CONSTANTS = {'pi':math.pi, 'e':math.e}
+
+# numeric and string literals parse as ast.Num and ast.Str before Python 3.8
+_NUMBER_NODES = (ast.Constant,) if sys.version_info >= (3, 8) else (ast.Num,)
+_TEXT_NODES = (ast.Constant,) if sys.version_info >= (3, 8) else (ast.Str,)
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+) + _NUMBER_NODES
+
+def _literal(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    # before Python 3.8
+    return node.s if isinstance(node, ast.Str) else node.n
+
+
+class _PowToCall(ast.NodeTransformer):
+    """
+    Rewrites `a ** b` as `_pow(a, b)`, which works in floats: Python's integer `**` would happily try to
+    build `9**9**9` and hang, where a float power overflows straight away.
+    """
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id='_pow', ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+                node,
+            )
+        return node
+
+
+class Expression:
+    """
+    A Deforum-style math expression of the frame index `t`, e.g. "1 + 0.5*sin(2*pi*t/24)".
+    The expression is parsed and checked against a whitelist of AST nodes (arithmetic, numeric constants,
+    `t`, `pi`, `e`, any extra `variables`, and calls to EXPRESSION_FUNCTIONS), then compiled once.
+
+    Calling it evaluates a single frame, and its signature doubles as an interpolator so it can be
+    attached to a keyframe. `evaluate` computes a whole array of frames in one call using numpy.
+    Powers are computed in floats, and both fail the same way on math errors: a ValueError outside a
+    function's domain, OverflowError on overflow and ZeroDivisionError on division by zero.
+    """
+    def __init__(self, source:str, variables:dict=None):
+        self.source = source.strip()
+        self.variables = dict(variables or {})
+        tree = ast.parse(self.source, mode='eval')
+        self._check(tree)
+        tree = ast.fix_missing_locations(_PowToCall().visit(tree))
+        self._code = compile(tree, '<keyframed expression>', 'eval')
+
+    def _check(self, tree):
+        names = set(EXPRESSION_CONSTANTS) | set(self.variables) | {'t'}
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"Unsupported syntax in expression {self.source!r}: {type(node).__name__}")
+            if isinstance(node, _NUMBER_NODES) and not isinstance(_literal(node), (int, float)):
+                raise ValueError(f"Unsupported constant in expression {self.source!r}: {_literal(node)!r}")
+            if isinstance(node, ast.Call):
+                if not (isinstance(node.func, ast.Name) and (node.func.id in EXPRESSION_FUNCTIONS)):
+                    raise ValueError(f"Unsupported function call in expression {self.source!r}")
+                if node.keywords:
+                    raise ValueError(f"Keyword arguments are not supported in expression {self.source!r}")
+            if isinstance(node, ast.Name) and (node.id not in names) and (node.id not in EXPRESSION_FUNCTIONS):
+                raise ValueError(f"Unknown name in expression {self.source!r}: {node.id}")
+
+    def __call__(self, k, curve=None, *args, **kargs):
+        namespace = {name:f for name, (f, _) in EXPRESSION_FUNCTIONS.items()}
+        namespace.update(EXPRESSION_CONSTANTS)
+        namespace.update(self.variables)
+        namespace['_pow'] = math.pow
+        namespace['t'] = k
+        return eval(self._code, {'__builtins__':{}}, namespace)
+
+    def evaluate(self, ts) -> list:
+        """Evaluates the expression at every frame in `ts` in a single vectorized call."""
+        try:
+            import numpy as np
+        except ImportError:
+            return [self(t) for t in ts]
+        ts = np.asarray(ts, dtype=float)
+        namespace = {name:getattr(np, f) for name, (_, f) in EXPRESSION_FUNCTIONS.items()}
+        namespace.update(EXPRESSION_CONSTANTS)
+        namespace.update(self.variables)
+        namespace['_pow'] = np.float_power
+        namespace['t'] = ts
+        try:
+            with np.errstate(divide='raise', over='raise', invalid='raise'):
+                outv = eval(self._code, {'__builtins__':{}}, namespace)
+        except FloatingPointError:
+            # numpy would return nan or inf here; evaluate frame by frame to raise what the scalar path raises
+            return [self(t) for t in ts.tolist()]
+        # constant expressions don't broadcast on their own
+        return np.broadcast_to(outv, ts.shape).tolist()
+
+    def __reduce__(self):
+        # code objects don't pickle, so recompile from source
+        return (self.__class__, (self.source, self.variables))
+
+    # compiled expressions are immutable, so copies can share them instead of recompiling
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Expression) and (self.source, self.variables) == (other.source, other.variables)
+
+    def __hash__(self):
+        return hash(self.source)
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+
+def compile_expression(source:str, variables:dict=None) -> Expression:
+    return Expression(source, variables=variables)
+
+# because math functions (i.e. sin(t)) can utilize brackets 
+# it extracts the value in form of some stuff
+# which has previously been enclosed with brackets and
+# with a comma or end of line existing after the closing one
+KEYFRAME_PATTERN = re.compile(r'((?P<frame>[0-9]+):[\s]*\((?P<param>[\S\s]*?)\)([,][\s]?|[\s]?$))')
+# cheap test for whether a settings value is meant to be a schedule at all
+SCHEDULE_PREFIX = re.compile(r'^\s*[0-9]+\s*:')
 
 def deforum_parse(string, prompt_parser=None):
-    # because math functions (i.e. sin(t)) can utilize brackets 
-    # it extracts the value in form of some stuff
-    # which has previously been enclosed with brackets and
-    # with a comma or end of line existing after the closing one
-    pattern = r'((?P<frame>[0-9]+):[\s]*\((?P<param>[\S\s]*?)\)([,][\s]?|[\s]?$))'
     frames = dict()
-    for match_object in re.finditer(pattern, string):
+    for match_object in KEYFRAME_PATTERN.finditer(string):
         frame = int(match_object.groupdict()['frame'])
         param = match_object.groupdict()['param']
         if prompt_parser:
@@ -19,10 +172,230 @@ def deforum_parse(string, prompt_parser=None):
         raise RuntimeError('Key Frame string not correctly formatted')
     return frames
 
-def curve_from_cn_string(cn_string):
-    d = {k:float(v) for k,v in deforum_parse(cn_string).items()}
+def _parse_value(param:str, variables:dict=None):
+    """
+    Returns a float for numeric params, otherwise an Expression compiled from the param.
+    """
+    try:
+        return float(param)
+    except ValueError:
+        return compile_expression(param, variables=variables)
+
+class ParseCache:
+    """
+    Bounded LRU cache of parsed keyframe strings, keyed by the (frame, param) pairs the string tokenizes to and the
+    parse options, so strings that only differ in whitespace the grammar ignores share an entry. Stores private curves and hands out copies, so callers can't corrupt cached entries.
+    """
+    def __init__(self, maxsize:int=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(frames:dict, variables:dict=None):
+        options = tuple(sorted(variables.items())) if variables else ()
+        return (tuple(frames.items()), options)
+
+    def get(self, key):
+        with self._lock:
+            curve = self._entries.get(key)
+            if curve is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return _fresh_copy(curve)
+
+    def put(self, key, curve:Curve):
+        with self._lock:
+            self._entries[key] = _fresh_copy(curve)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
+
+_parse_cache = None
+
+def _fresh_copy(curve:Curve) -> Curve:
+    outv = curve.copy()
+    if hasattr(outv, '_using_default_label'):
+        outv.label = outv.random_label()
+    return outv
+
+def enable_parse_cache(maxsize:int=1024):
+    """Turns on memoization of `curve_from_cn_string`, keeping at most `maxsize` parsed strings."""
+    global _parse_cache
+    _parse_cache = ParseCache(maxsize=maxsize)
+
+def disable_parse_cache():
+    global _parse_cache
+    _parse_cache = None
+
+def clear_parse_cache():
+    if _parse_cache is not None:
+        _parse_cache.clear()
+
+def parse_cache_info() -> dict:
+    """Returns hit/miss counts and the size of the parse cache, or None if it is disabled."""
+    if _parse_cache is None:
+        return None
+    return _parse_cache.info()
+
+def curve_from_cn_string(cn_string, variables:dict=None):
+    """
+    Builds a Curve from a Deforum/Chigozie-Nri keyframe string, e.g. "0:(0), 10:(1 + 0.5*sin(t/4))".
+    Numeric keyframes are linearly interpolated. A keyframe holding an expression takes the value of
+    the expression at its own frame, and uses the expression as the interpolator until the next keyframe.
+    If the parse cache is enabled (see `enable_parse_cache`), repeated strings return a copy of the cached curve.
+    """
+    cache = _parse_cache
+    if cache is None:
+        return _curve_from_cn_string(cn_string, variables)
+    # tokenizing is cheap next to compiling expressions, and keying on its output can't disagree with it
+    frames = deforum_parse(cn_string)
+    try:
+        key = cache.key(frames, variables)
+        hash(key)
+    except TypeError:
+        # unhashable variables, don't cache
+        return _curve_from_frames(frames, variables)
+    curve = cache.get(key)
+    if curve is None:
+        curve = _curve_from_frames(frames, variables)
+        cache.put(key, curve)
+    return curve
+
+def _curve_from_cn_string(cn_string, variables:dict=None):
+    return _curve_from_frames(deforum_parse(cn_string), variables)
+
+def _curve_from_frames(frames:dict, variables:dict=None):
+    d = {k:_parse_value(v, variables) for k,v in frames.items()}
     if 0 not in d:
         start_frame = min(d.keys())
         d[0] = d[start_frame]
-    curve = Curve(d, default_interpolation='linear')
-    return curve
\ No newline at end of file
+    kfs = []
+    for t, v in d.items():
+        if isinstance(v, Expression):
+            kfs.append((t, v(t), v))
+        else:
+            kfs.append((t, v, 'linear'))
+    curve = Curve(tuple(kfs), default_interpolation='linear')
+    return curve
+
+def _is_text_schedule(cn_string:str) -> bool:
+    """Whether a schedule holds quoted strings, e.g. Deforum's sampler_schedule '0: ("Euler a")'."""
+    for param in deforum_parse(cn_string).values():
+        try:
+            node = ast.parse(param.strip(), mode='eval').body
+        except SyntaxError:
+            continue
+        if isinstance(node, _TEXT_NODES) and isinstance(_literal(node), str):
+            return True
+    return False
+
+def parameter_group_from_deforum_settings(settings, keys=None, variables:dict=None, errors:str='warn') -> ParameterGroup:
+    """
+    Builds a ParameterGroup from every numeric schedule string in a Deforum settings dict (or its JSON text),
+    e.g. {"zoom": "0:(1.04)", "angle": "0:(0), 50:(10)", ...}, in a single pass over the settings.
+    A value counts as a schedule if it is a string that starts like "<frame>:". Other settings are ignored,
+    as are schedules of quoted strings such as sampler_schedule.
+
+    Arguments
+        keys (iterable): (Optional) restrict parsing to these settings.
+        variables (dict): (Optional) extra names available to schedule expressions, e.g. {'max_f': 100}.
+        errors (str): 'warn' (default) emits a warning per schedule that fails to parse, e.g. Deforum's
+            seed_schedule when `s` isn't in `variables`, and leaves it out. 'raise' collects every failure
+            and raises a single ValueError naming each one.
+    """
+    if errors not in ('raise', 'warn'):
+        raise ValueError(f"errors must be 'raise' or 'warn', got {errors!r}")
+    if isinstance(settings, (str, bytes)):
+        settings = json.loads(settings)
+    if keys is not None:
+        keys = set(keys)
+
+    curves, failed = {}, {}
+    for name, value in settings.items():
+        if (keys is not None) and (name not in keys):
+            continue
+        if not (isinstance(value, str) and SCHEDULE_PREFIX.match(value)):
+            continue
+        try:
+            if _is_text_schedule(value):
+                continue
+            curves[name] = curve_from_cn_string(value, variables=variables)
+        except (RuntimeError, ValueError, SyntaxError) as e:
+            failed[name] = e
+
+    if failed:
+        report = "; ".join(f"{name}: {e}" for name, e in failed.items())
+        if errors == 'raise':
+            raise ValueError(f"Failed to parse {len(failed)} schedule(s): {report}")
+        for name, e in failed.items():
+            warnings.warn(f"Skipping schedule {name}: {e}")
+    return ParameterGroup(curves)
+
+
+def _format_number(v) -> str:
+    if isinstance(v, int) and not isinstance(v, bool):
+        return str(v)
+    return repr(float(v))
+
+def _format_frame(t) -> str:
+    if float(t).is_integer():
+        return str(int(t))
+    return repr(float(t))
+
+
+def _keyframes_as_linear(curve:Curve):
+    """
+    Rewrites a curve made of 'previous'/'linear' keyframes at integer frames as (frame, value) pairs that
+    reproduce it at every integer frame under Deforum's linear interpolation. Returns None if that isn't possible,
+    including for compositions and other curves without keyframes of their own.
+    """
+    if (not isinstance(curve, Curve)) or curve.loop or curve.bounce:
+        return None
+    kfs = list(curve._data.values())
+    for kf in kfs:
+        if (kf.interpolation_method not in _STEP_METHODS + _LINEAR_METHODS) or kf.interpolator_arguments:
+            return None
+        if not float(kf.t).is_integer():
+            return None
+    pairs = []
+    for kf_prev, kf in zip([None] + kfs[:-1], kfs):
+        if (kf_prev is not None) and (kf_prev.interpolation_method in _STEP_METHODS) and (kf_prev.value != kf.value):
+            # hold the previous value right up to the frame before the jump
+            if kf.t - 1 > kf_prev.t:
+                pairs.append((kf.t - 1, kf_prev.value))
+        pairs.append((kf.t, kf.value))
+    return pairs
+
+def curve_to_cn_string(curve:Curve, frames=None, tolerance:float=0) -> str:
+    """
+    Writes a curve as a Deforum/Chigozie-Nri keyframe string, e.g. "0:(0), 10:(1)".
+
+    Curves made only of 'previous'/'linear' keyframes at integer frames are written straight from their
+    keyframes (steps are written as a hold on the frame before the jump). Anything else is sampled at
+    `frames` (default: every integer frame up to the curve's duration) and decimated, keeping the result
+    within `tolerance` of every sample under linear interpolation.
+    Passing `frames` always samples.
+    """
+    pairs = None
+    if frames is None:
+        pairs = _keyframes_as_linear(curve)
+        frames = range(int(math.floor(curve.duration)) + 1)
+    if pairs is None:
+        frames = list(frames)
+        values = curve.evaluate(frames)
+        keep = decimate_polyline(frames, values, tolerance)
+        pairs = [(frames[i], values[i]) for i in keep]
+    return ", ".join(f"{_format_frame(t)}:({_format_number(v)})" for t, v in pairs)
@@ -0,0 +1,201 @@
+"""
+Static cost report for curve expression trees, see `explain`.
+"""
+from collections import Counter
+from time import perf_counter
+
+from .curve import CurveBase, Curve, ParameterGroup, Composition, FunctionInterpolator, _is_unit_curve
+from .interpolation import interpolation_method_name
+
+# interpolation methods MappedCurve.evaluate vectorizes with numpy
+_NUMPY_METHODS = (None, 'previous', 'linear')
+
+# (kind, name, args) -> seconds per lookup, filled in lazily by `_calibrated`
+_calibration = {}
+
+
+def _time_per_call(f, ks, repeat:int=3, number:int=200) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = perf_counter()
+        for _ in range(number):
+            for k in ks:
+                f(k)
+        elapsed = (perf_counter() - t0) / (number * len(ks))
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return best
+
+def _calibrated(kind:str, name=None, args=None) -> float:
+    """
+    Seconds per lookup for one kind of node, measured once per process with a small microbenchmark:
+    a curve lookup through interpolation method `name` (with `args`), an exact keyframe hit,
+    or the overhead a ParameterGroup or Composition adds per child.
+    """
+    key = (kind, name, repr(args))
+    if key in _calibration:
+        return _calibration[key]
+    if kind == 'method':
+        curve = Curve(((0, 0, name, args or None), (10, 1)))
+        cost = _time_per_call(curve.__getitem__, [2.5, 5.5, 7.25])
+    elif kind == 'keyframe':
+        curve = Curve({0:0, 10:1})
+        cost = _time_per_call(curve.__getitem__, [0, 10])
+    else:
+        # overhead of a two-child node over looking up its two children directly
+        a, b = Curve({0:1}), Curve({0:2})
+        if kind == 'reduction':
+            node = Composition({'a':a, 'b':b}, reduction='add')
+        else:
+            node = ParameterGroup({'a':a, 'b':b})
+        leaves = 2 * _time_per_call(a.__getitem__, [1, 2])
+        cost = max(_time_per_call(node.__getitem__, [1, 2], number=100) - leaves, 0) / 2
+    _calibration[key] = cost
+    return cost
+
+def _method_label(method):
+    """
+    Returns (name, registered) for an interpolation method. Unregistered methods are Python callables,
+    which can't be benchmarked in isolation.
+    """
+    if (method is None) or isinstance(method, str):
+        return ('previous' if method is None else method), True
+    name = interpolation_method_name(method)
+    if name is not None:
+        return name, True
+    if isinstance(method, FunctionInterpolator):
+        return f"from_function({getattr(method.f, '__name__', method.f)})", False
+    if hasattr(method, 'source'):
+        return f"expression({method.source})", False
+    return getattr(method, '__name__', type(method).__name__), False
+
+def _signature(curve:Curve):
+    """Hashable description of a curve's content, for finding duplicate sub-curves."""
+    kfs = tuple(
+        (t, repr(kf.value), _method_label(kf.interpolation_method)[0], repr(kf.interpolator_arguments))
+        for t, kf in curve._data.items()
+    )
+    return (type(curve).__name__, curve.loop, curve.bounce, curve._duration, kfs)
+
+def _sampled_cost(obj) -> float:
+    """Times lookups of `obj` itself, for nodes whose cost can't be predicted from their structure."""
+    duration = obj.duration or 1
+    ks = [duration * i / 7 for i in range(8)]
+    return _time_per_call(obj.__getitem__, ks, repeat=1, number=5)
+
+
+class Explanation(dict):
+    """
+    The report returned by `explain`. A dict, so it can be inspected or serialized; prints as a summary.
+    """
+    def __str__(self) -> str:
+        lines = [
+            f"nodes: {self['nodes']}, depth: {self['depth']}, leaves: {len(self['leaves'])}",
+            f"estimated cost: {self['cost_per_frame']*1e6:.1f}us per frame",
+            "methods: " + ', '.join(f"{name} ({n})" for name, n in sorted(self['methods'].items())),
+        ]
+        if self['opaque']:
+            lines.append("opaque callables: " + ', '.join(f"{path}: {name}" for path, name in self['opaque']))
+        if self['weights']:
+            lines.append("non-unit weights: " + ', '.join(self['weights']))
+        for paths in self['duplicates']:
+            lines.append("duplicates: " + ', '.join(paths))
+        lines.append("leaves:")
+        for leaf in self['leaves']:
+            flags = []
+            if leaf['vectorizable']:
+                flags.append(f"vectorizable ({leaf['vectorizable']})")
+            lines.append(
+                f"  {leaf['path']}: {leaf['keyframes']} keyframes, {leaf['cost_per_frame']*1e6:.1f}us"
+                + (f", {', '.join(flags)}" if flags else "")
+            )
+        return '\n'.join(lines)
+
+
+def explain(obj:CurveBase) -> Explanation:
+    """
+    Reports the structure and predicted evaluation cost of a curve, ParameterGroup or Composition tree:
+
+      nodes, depth: size of the tree, counting non-unit weights as nodes
+      leaves: per-leaf path, type, keyframe count, interpolation methods, estimated cost per frame, and whether
+        the leaf qualifies for vectorized evaluation ('numpy' via `save_curve`/MappedCurve for previous/linear
+        keyframes, 'expression' for compiled `keyframed.dsl` expressions), else None
+      methods: number of keyframes using each interpolation method, across all leaves
+      opaque: (path, name) for keyframes interpolated by unregistered Python callables, e.g. from `Curve.from_function`
+      duplicates: lists of paths that are the same curve object or have identical keyframes
+      weights: paths of groups whose weight isn't the default constant 1
+      cost_per_frame: estimated seconds to evaluate the whole tree at one frame
+
+    Costs are per-lookup timings of each interpolation method and node type, measured by a small microbenchmark
+    the first time they're needed in the process. Nodes that can't be predicted (opaque callables, custom
+    CurveBase subclasses) are timed directly at a few frames.
+    """
+    report = Explanation(
+        nodes=0, depth=0, leaves=[], methods=Counter(), opaque=[], duplicates=[], weights=[], cost_per_frame=0.0,
+    )
+    seen = {}
+    report['cost_per_frame'] = _explain(obj, obj.label, 1, report, seen)
+    report['methods'] = dict(report['methods'])
+    report['duplicates'] = [paths for paths in seen.values() if len(paths) > 1]
+    return report
+
+def _explain(obj, path:str, depth:int, report:Explanation, seen:dict) -> float:
+    report['nodes'] += 1
+    report['depth'] = max(report['depth'], depth)
+
+    if isinstance(obj, ParameterGroup):
+        kind = 'reduction' if isinstance(obj, Composition) else 'group'
+        cost = _calibrated(kind) * len(obj.parameters)
+        for name, child in obj.parameters.items():
+            cost += _explain(child, f"{path}/{name}", depth+1, report, seen)
+        if not _is_unit_curve(obj._weight):
+            report['weights'].append(path)
+            cost += _explain(obj._weight, f"{path}/weight", depth+1, report, seen)
+        return cost
+
+    seen.setdefault(('id', id(obj)), []).append(path)
+    if not isinstance(obj, Curve):
+        cost = _sampled_cost(obj)
+        report['leaves'].append(dict(
+            path=path, type=type(obj).__name__, keyframes=len(obj.keyframes), methods={},
+            cost_per_frame=cost, vectorizable=None,
+        ))
+        return cost
+
+    if seen[('id', id(obj))] == [path]:
+        seen.setdefault(('content', _signature(obj)), []).append(path)
+    methods = Counter()
+    costs = []
+    unregistered = False
+    vectorizable = {'numpy', 'expression'}
+    for kf in obj._data.values():
+        method = kf.interpolation_method
+        name, registered = _method_label(method)
+        methods[name] += 1
+        if (method not in _NUMPY_METHODS) or kf.interpolator_arguments:
+            vectorizable.discard('numpy')
+        if not hasattr(method, 'evaluate'):
+            vectorizable.discard('expression')
+        if registered:
+            if not ((method is None) or isinstance(method, str)):
+                method = name
+            costs.append(_calibrated('method', method, kf.interpolator_arguments or None))
+        else:
+            unregistered = True
+            # compiled dsl expressions are callables too, but not opaque ones
+            if not hasattr(method, 'evaluate') and ((path, name) not in report['opaque']):
+                report['opaque'].append((path, name))
+    if unregistered or obj.loop or obj.bounce:
+        cost = _sampled_cost(obj)
+    else:
+        cost = sum(costs) / len(costs) if costs else _calibrated('keyframe')
+    report['methods'].update(methods)
+    report['leaves'].append(dict(
+        path=path,
+        type=type(obj).__name__,
+        keyframes=len(obj._data),
+        methods=dict(methods),
+        cost_per_frame=cost,
+        vectorizable=('numpy' if 'numpy' in vectorizable else 'expression' if vectorizable else None),
+    ))
+    return cost
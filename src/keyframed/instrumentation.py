@@ -0,0 +1,250 @@
+"""
+Opt-in instrumentation of curve evaluation: lookup counts per curve, time spent per interpolation method
+and per composition reduction, and hierarchical traces of individual lookups.
+
+While disabled, nothing here is on the evaluation path at all. `enable_instrumentation` (or an active `trace`)
+swaps instrumented `__getitem__` methods onto Curve, ParameterGroup and Composition, and the originals are put
+back once neither is in use.
+"""
+from collections import Counter, namedtuple
+import os
+import threading
+from time import perf_counter
+
+from .curve import Curve, ParameterGroup, Composition
+from .interpolation import interpolation_method_name
+from .utils import Histogram
+
+# class -> its own uninstrumented __getitem__, while instrumentation or tracing is enabled
+_originals = {}
+_stats_enabled = False
+# active Trace objects, see `trace`
+_tracers = []
+_lock = threading.Lock()
+# per-thread stack of the lookups in progress, used to compute exclusive times and trace stacks
+_local = threading.local()
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = Counter()
+        self.interpolation = {}
+        self.reduction = {}
+
+    def _add(self, table, name, elapsed):
+        hist = table.get(name)
+        if hist is None:
+            hist = table[name] = Histogram()
+        hist.add(elapsed)
+
+    def record(self, obj, method, elapsed):
+        with _lock:
+            self.calls[obj.label] += 1
+            if isinstance(obj, Composition):
+                self._add(self.reduction, str(obj.reduction), elapsed)
+            elif isinstance(obj, Curve):
+                self._add(self.interpolation, method, elapsed)
+
+    def to_dict(self) -> dict:
+        with _lock:
+            return dict(
+                calls=dict(self.calls),
+                interpolation={name:hist.to_dict() for name, hist in self.interpolation.items()},
+                reduction={name:hist.to_dict() for name, hist in self.reduction.items()},
+            )
+
+_recorder = _Recorder()
+
+
+def _method_name(used:list) -> str:
+    """
+    Name of the interpolation method a Curve lookup reported using (see `Curve._lookup`), or 'unknown' if it
+    failed before getting that far.
+    """
+    if not used:
+        return 'unknown'
+    method = used[0]
+    if method is None:
+        return 'previous'
+    if isinstance(method, str):
+        return method
+    name = interpolation_method_name(method)
+    if name is None:
+        name = getattr(method, '__name__', type(method).__name__)
+    return name
+
+def _stack() -> list:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _instrumented(original):
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return original(self, k)
+        # Curves report the method they used, rather than working it out again here
+        used = [] if isinstance(self, Curve) else None
+        stack = _stack()
+        # [time spent in nested lookups, label]
+        frame = [0.0, self.label]
+        stack.append(frame)
+        t0 = perf_counter()
+        try:
+            if used is None:
+                return original(self, k)
+            return self._lookup(k, used)
+        finally:
+            elapsed = perf_counter() - t0
+            method = _method_name(used) if used is not None else None
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            exclusive = elapsed - frame[0]
+            if _stats_enabled:
+                _recorder.record(self, method, exclusive)
+            if _tracers:
+                span = Span(
+                    name=self.label,
+                    kind=type(self).__name__,
+                    k=k,
+                    method=method if method is not None else getattr(self, 'reduction', None),
+                    start=t0,
+                    duration=elapsed,
+                    self_time=exclusive,
+                    stack=tuple(f[1] for f in stack) + (self.label,),
+                    thread=threading.get_ident(),
+                )
+                for tracer in _tracers:
+                    tracer.spans.append(span)
+    __getitem__.__wrapped__ = original
+    return __getitem__
+
+def _install():
+    for cls in (Curve, ParameterGroup, Composition):
+        if cls not in _originals:
+            _originals[cls] = cls.__dict__['__getitem__']
+            cls.__getitem__ = _instrumented(_originals[cls])
+
+def _uninstall_if_idle():
+    if _stats_enabled or _tracers:
+        return
+    for cls, original in _originals.items():
+        cls.__getitem__ = original
+    _originals.clear()
+
+def enable_instrumentation():
+    """
+    Starts recording stats for every curve lookup. Times are exclusive: time spent evaluating a child curve of
+    a Composition (or a curve looked up by a callable interpolator) is attributed to the child, not the parent,
+    so a Composition's time is the time spent in its reduction.
+    """
+    global _stats_enabled
+    with _lock:
+        _stats_enabled = True
+        _install()
+
+def disable_instrumentation():
+    global _stats_enabled
+    with _lock:
+        _stats_enabled = False
+        _uninstall_if_idle()
+
+def instrumentation_enabled() -> bool:
+    return _stats_enabled
+
+def reset_stats():
+    global _recorder
+    _recorder = _Recorder()
+
+def stats() -> dict:
+    """
+    Returns the stats recorded since instrumentation was enabled or last reset:
+      calls: number of lookups per curve label
+      interpolation: time histogram per interpolation method name ('keyframe' for lookups that hit a keyframe exactly)
+      reduction: time histogram per composition reduction
+    Each histogram is summarized as a dict with count, total, mean, min, max, p50, p99 and non-empty buckets, in seconds.
+    """
+    return _recorder.to_dict()
+
+
+Span = namedtuple('Span', ['name', 'kind', 'k', 'method', 'start', 'duration', 'self_time', 'stack', 'thread'])
+Span.__doc__ = """
+One curve lookup recorded by a Trace. `stack` holds the labels of the enclosing lookups, outermost first,
+ending with this one. Times are in seconds from `time.perf_counter`; `self_time` excludes nested lookups.
+"""
+
+
+class Trace:
+    """
+    Records a Span for every curve lookup made while it is active, on any thread.
+    Use via `keyframed.trace()`:
+
+        with keyframed.trace() as tr:
+            composition[10]
+        json.dump(tr.to_chrome_trace(), f)
+    """
+    def __init__(self):
+        self.spans = []
+        self._t0 = None
+
+    def start(self) -> 'Trace':
+        with _lock:
+            if self not in _tracers:
+                self._t0 = perf_counter()
+                _tracers.append(self)
+                _install()
+        return self
+
+    def stop(self):
+        with _lock:
+            if self in _tracers:
+                _tracers.remove(self)
+            _uninstall_if_idle()
+
+    def __enter__(self) -> 'Trace':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Returns the spans as Chrome trace-event JSON (a dict ready for `json.dump`), viewable in
+        chrome://tracing, Perfetto or speedscope. Timestamps are microseconds from the start of the trace.
+        """
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            args = {'k': span.k, 'self_us': span.self_time * 1e6}
+            if span.method is not None:
+                args['method'] = str(span.method)
+            events.append(dict(
+                name=span.name,
+                cat=span.kind,
+                ph='X',
+                ts=(span.start - self._t0) * 1e6,
+                dur=span.duration * 1e6,
+                pid=pid,
+                tid=span.thread,
+                args=args,
+            ))
+        return {'traceEvents': events, 'displayTimeUnit': 'ns'}
+
+    def to_collapsed(self) -> str:
+        """
+        Returns the spans in collapsed-stack format (one `outer;inner;leaf <microseconds>` line per distinct
+        stack, weighted by self time), as consumed by flamegraph.pl, inferno or speedscope.
+        """
+        totals = Counter()
+        for span in self.spans:
+            totals[span.stack] += span.self_time
+        lines = []
+        for stack, seconds in sorted(totals.items()):
+            frames = ';'.join(name.replace(';', ',') for name in stack)
+            lines.append(f"{frames} {max(1, round(seconds * 1e6))}")
+        return '\n'.join(lines)
+
+def trace() -> Trace:
+    """Returns a Trace, for use as a context manager around the evaluations to trace."""
+    return Trace()
@@ -1,6 +1,6 @@
 import math
 from numbers import Number
-from typing import Callable
+from typing import Callable, Optional
 #import numpy as np
 #import torch
 from functools import partial
@@ -118,6 +118,13 @@ EASINGS={
 
 }
 
+# groups of interpolation method names, by what they compute between two keyframes
+_STEP_METHODS = (None, 'previous')
+_LINEAR_METHODS = ('linear',)
+# a weighted average of the two keyframes' values: these run monotonically from one value to the other,
+# commute with `a*value + b`, and hold the left keyframe's value when there is no keyframe to their right
+_LERP_METHODS = (None, 'previous', 'next', 'linear', 'eased_lerp', 'sin', 'sin^2')
+
 
 def register_interpolation_method(name:str, f:Callable):
     """
@@ -125,6 +132,16 @@ def register_interpolation_method(name:str, f:Callable):
     """
     INTERPOLATORS[name] = f
 
+def interpolation_method_name(f:Callable) -> Optional[str]:
+    """
+    Returns the name a callable interpolation method is registered under, or None if it isn't registered.
+    """
+    for registry in (INTERPOLATORS, EASINGS):
+        for name, g in registry.items():
+            if (g is f) and (name is not None):
+                return name
+    return None
+
 def get_context_left(k, curve, n, eps=1e-9):
   kfs = []
   while len(kfs) < n:
@@ -0,0 +1,275 @@
+"""
+Memory-mapped curve files.
+
+A curve file stores a Curve's keyframe times, values and interpolation methods as flat arrays, so it can be
+evaluated straight from an `mmap` without loading it into memory. Pages are faulted in on demand, and every
+process that maps the same file shares the OS page cache.
+
+File layout (native byte order, recorded in the header):
+    magic (8 bytes) | schema version (uint32) | header length (uint32) | JSON header | padding to 8 bytes
+    times (n float64) | values (n float64) | interpolation table index (n int32)
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import mmap
+from numbers import Number
+import struct
+import sys
+
+from sortedcontainers import SortedDict
+
+from .curve import Curve, Keyframe
+from .interpolation import interpolation_method_name
+
+MAGIC = b'KFCURVE\0'
+VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+
+# interpolation methods with a vectorized implementation in MappedCurve.evaluate
+_VECTORIZED = {None:0, 'previous':0, 'linear':1}
+
+
+def _interpolation_table(curve:Curve):
+    table, index = [], []
+    for kf in curve._data.values():
+        method = kf.interpolation_method
+        if not ((method is None) or isinstance(method, str)):
+            name = interpolation_method_name(method)
+            if name is None:
+                raise TypeError(
+                    f"Keyframe at t={kf.t} uses an unregistered callable interpolation method ({method}), which can't be written to a curve file. "
+                    "Register it with `register_interpolation_method` so it can be written by name."
+                )
+            method = name
+        entry = [method, kf.interpolator_arguments or {}]
+        if entry not in table:
+            table.append(entry)
+        index.append(table.index(entry))
+    return table, index
+
+def save_curve(curve:Curve, path):
+    """
+    Writes `curve` to `path` in a format that can be opened with `open_curve`.
+    Only curves with real-valued keyframes and named interpolation methods are supported.
+    """
+    times, values = array('d'), array('d')
+    for t, kf in curve._data.items():
+        if not isinstance(kf.value, Number) or isinstance(kf.value, complex):
+            raise TypeError(f"Only real-valued curves can be written to a curve file, got {type(kf.value)} at t={t}")
+        times.append(t)
+        values.append(kf.value)
+    table, index = _interpolation_table(curve)
+    header = json.dumps(dict(
+        n=len(times),
+        byteorder=sys.byteorder,
+        interpolation=table,
+        loop=curve.loop,
+        bounce=curve.bounce,
+        duration=curve._duration,
+        label=curve.label,
+        default_label=hasattr(curve, '_using_default_label'),
+    )).encode('utf8')
+    pad = -(_PREAMBLE.size + len(header)) % 8
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(b'\0' * pad)
+        times.tofile(f)
+        values.tofile(f)
+        array('i', index).tofile(f)
+
+def open_curve(path, **kargs) -> 'MappedCurve':
+    return MappedCurve(path, **kargs)
+
+
+class _MappedKeys:
+    """Sorted sequence of keyframe times backed by the mapped array."""
+    def __init__(self, data:'_MappedKeyframes'):
+        self._times = data._times
+    def __len__(self):
+        return len(self._times)
+    def __getitem__(self, i):
+        return self._times[i]
+    def __iter__(self):
+        return iter(self._times)
+    def __contains__(self, k):
+        i = bisect_left(self._times, k)
+        return (i < len(self._times)) and (self._times[i] == k)
+
+
+class _MappedKeyframes:
+    """
+    Read-only stand-in for the SortedDict of Keyframes on a Curve. Exposes the subset of the SortedDict API
+    the interpolators use, building Keyframe objects on demand from the mapped arrays.
+    """
+    def __init__(self, times, values, methods, table):
+        self._times = times
+        self._values = values
+        self._methods = methods
+        self._table = table
+
+    def _keyframe(self, i:int) -> Keyframe:
+        method, args = self._table[self._methods[i]]
+        return Keyframe(
+            t=self._times[i],
+            value=self._values[i],
+            interpolation_method=method,
+            interpolator_arguments=dict(args) if args else None,
+        )
+
+    def __len__(self):
+        return len(self._times)
+
+    def bisect_left(self, k):
+        return bisect_left(self._times, k)
+
+    def bisect_right(self, k):
+        return bisect_right(self._times, k)
+
+    def peekitem(self, index:int=-1):
+        if index < 0:
+            index += len(self._times)
+        if not (0 <= index < len(self._times)):
+            raise IndexError("peekitem index out of range")
+        return self._times[index], self._keyframe(index)
+
+    def keys(self) -> _MappedKeys:
+        return _MappedKeys(self)
+
+    def values(self):
+        return [self._keyframe(i) for i in range(len(self._times))]
+
+    def items(self):
+        return [(self._times[i], self._keyframe(i)) for i in range(len(self._times))]
+
+    def __iter__(self):
+        return iter(self._times)
+
+    def __contains__(self, k):
+        return k in self.keys()
+
+    def __getitem__(self, k) -> Keyframe:
+        i = bisect_left(self._times, k)
+        if (i < len(self._times)) and (self._times[i] == k):
+            return self._keyframe(i)
+        raise KeyError(k)
+
+    def __setitem__(self, k, v):
+        raise TypeError("Mapped curves are read-only. Use MappedCurve.copy() to get an editable Curve.")
+
+    def copy(self) -> SortedDict:
+        return SortedDict(self.items())
+
+
+class MappedCurve(Curve):
+    """
+    A read-only Curve evaluated directly from a memory-mapped curve file written by `save_curve`.
+    Supports everything a Curve does except modification; `copy()` returns a regular in-memory Curve.
+    Pickling a MappedCurve only sends its path, so workers re-map the same file instead of copying it.
+    """
+    def __init__(self, path, label:str=None, loop:bool=None, bounce:bool=None):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a keyframed curve file")
+        if version > VERSION:
+            raise ValueError(f"{self.path} was written with curve file version {version}, expected at most {VERSION}")
+        header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size+header_len].decode('utf8'))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{self.path} was written on a {header['byteorder']}-endian machine")
+
+        n = header['n']
+        offset = _PREAMBLE.size + header_len
+        offset += -offset % 8
+        self._offsets = (offset, offset + 8*n, offset + 16*n)
+        buf = memoryview(self._mmap)
+        self._views = (
+            buf,
+            buf[self._offsets[0]:self._offsets[1]].cast('d'),
+            buf[self._offsets[1]:self._offsets[2]].cast('d'),
+            buf[self._offsets[2]:self._offsets[2] + 4*n].cast('i'),
+        )
+        self._table = [tuple(entry) for entry in header['interpolation']]
+        self._data = _MappedKeyframes(*self._views[1:], self._table)
+
+        self.loop = header['loop'] if loop is None else loop
+        self.bounce = header['bounce'] if bounce is None else bounce
+        self._duration = header['duration']
+        if label is None:
+            label = header['label']
+            if header['default_label']:
+                self._using_default_label = True
+        self.label = str(label)
+
+    def __setitem__(self, k, v):
+        raise TypeError("Mapped curves are read-only. Use MappedCurve.copy() to get an editable Curve.")
+
+    def append(self, other):
+        raise TypeError("Mapped curves are read-only. Use MappedCurve.copy() to get an editable Curve.")
+
+    def snapshot(self) -> 'MappedCurve':
+        # the file is immutable, so the curve is its own snapshot
+        return self
+
+    def copy(self) -> Curve:
+        curve = Curve(self._data.copy(), loop=self.loop, bounce=self.bounce, duration=self._duration, label=self.label)
+        if hasattr(self, '_using_default_label'):
+            curve._using_default_label = True
+        return curve
+
+    def close(self):
+        self._data = None
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __deepcopy__(self, memo):
+        # the file is immutable, so a "deep" copy just maps it again
+        return self.__class__(self.path, label=self.label, loop=self.loop, bounce=self.bounce)
+
+    def __reduce__(self):
+        return (self.__class__, (self.path, self.label, self.loop, self.bounce))
+
+    def _numpy_arrays(self):
+        import numpy as np
+        n = len(self._data)
+        times = np.frombuffer(self._mmap, dtype=np.float64, count=n, offset=self._offsets[0])
+        values = np.frombuffer(self._mmap, dtype=np.float64, count=n, offset=self._offsets[1])
+        methods = np.frombuffer(self._mmap, dtype=np.int32, count=n, offset=self._offsets[2])
+        return times, values, methods
+
+    def evaluate(self, ks) -> list:
+        """
+        Evaluates the curve at each of `ks`. If numpy is installed and every keyframe uses 'previous' or 'linear'
+        interpolation, this runs as a single vectorized lookup over the mapped arrays without building Keyframes.
+        """
+        codes = [_VECTORIZED.get(method) if not args else None for method, args in self._table]
+        if (None in codes) or self.loop or self.bounce:
+            return super().evaluate(ks)
+        try:
+            import numpy as np
+        except ImportError:
+            return super().evaluate(ks)
+        times, values, methods = self._numpy_arrays()
+        ks = np.asarray(ks, dtype=np.float64)
+        if (ks < times[0]).any():
+            return super().evaluate(ks.tolist())
+        left = np.searchsorted(times, ks, side='right') - 1
+        right = np.minimum(left + 1, len(times) - 1)
+        x0, x1 = times[left], times[right]
+        y0, y1 = values[left], values[right]
+        is_linear = (np.asarray(codes)[methods[left]] == 1) & (right > left)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (ks - x0) / (x1 - x0)
+            lerped = y1*t + y0*(1-t)
+        outv = np.where(is_linear & (ks != x0), lerped, y0)
+        return outv.tolist()
@@ -0,0 +1,507 @@
+"""
+Queries over whole ranges of a curve: the times at which it reaches a value, and its extrema over ranges.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from functools import partial
+import math
+from numbers import Number
+
+from .calculus import _DerivedCurve, _angular_frequency, _method_name
+from .curve import Curve
+from .interpolation import EASINGS, INTERPOLATORS, _LERP_METHODS
+
+# samples per segment when searching segments that have no closed-form inverse
+_ROOT_SAMPLES = 32
+_ROOT_ITERATIONS = 64
+# crossings closer together than this are reported once
+_TOLERANCE = 1e-9
+
+_EASES = {
+    'linear': (lambda s: s, lambda u: u),
+    'eased_lerp': (lambda s: math.sin(s*math.pi/2)**2, lambda u: 2/math.pi * math.asin(math.sqrt(u))),
+    'sin^2': (lambda s: math.sin(s*math.pi/2)**2, lambda u: 2/math.pi * math.asin(math.sqrt(u))),
+    'sin': (lambda s: math.sin(s*math.pi/2), lambda u: 2/math.pi * math.asin(u)),
+}
+
+_Segment = namedtuple('_Segment', 'a b y start end lo hi f inverse extrema')
+_Segment.__doc__ = """
+The span [a, b] of one keyframe: the keyframe's value `y` at a, the segment's formula `f` on (a, b) with its limits
+`start` at a and `end` at b, bounds `lo`/`hi` on every value in the span (jumps included), the closed-form inverse
+of a monotone `f` (else None), and for segments without one, a function returning the times in (u0, u1) where `f`
+may turn around (None when unknown, so the span gets sampled).
+"""
+
+
+def _interpolator(kf):
+    """The function Curve.__getitem__ would use between this keyframe and the next."""
+    method = kf.interpolation_method
+    if (method is None) or isinstance(method, str):
+        f = EASINGS.get(method) or INTERPOLATORS.get(method)
+    else:
+        f = method
+    if kf.interpolator_arguments:
+        f = partial(f, **kf.interpolator_arguments)
+    return f
+
+def _segment(curve:Curve, kf, nxt, b) -> _Segment:
+    a, y = kf.t, kf.value
+    name = _method_name(kf.interpolation_method)
+    args = kf.interpolator_arguments
+    if (nxt is None) and (name in _LERP_METHODS):
+        name = 'previous'
+    if name in (None, 'previous', 'next'):
+        c = nxt.value if name == 'next' else y
+        def inverse(v):
+            return a if v == c else None
+        return _Segment(a, b, y, c, c, min(y, c), max(y, c), lambda t: c, inverse, None)
+    if (name in _EASES) and ('ease' not in args):
+        ease, uninverse = _EASES[name]
+        y1, span = nxt.value, nxt.t - a
+        def f(t):
+            return y + (y1 - y) * ease((t - a) / span)
+        def inverse(v):
+            if y1 == y:
+                return a if v == y else None
+            u = (v - y) / (y1 - y)
+            return a + span * uninverse(u) if 0 <= u <= 1 else None
+        return _Segment(a, b, y, y, y1, min(y, y1), max(y, y1), f, inverse, None)
+    if name == 'exp_decay':
+        rate = args['decay_rate']
+        def f(t):
+            return y * math.exp(-rate * (t - a))
+        def inverse(v):
+            if (v == y) or (rate == 0):
+                return a if v == y else None
+            if (v == 0) or (v / y <= 0):
+                return None
+            t = a - math.log(v / y) / rate
+            return t if a <= t <= b else None
+        end = f(b) if b < math.inf else (0 if rate > 0 else y if rate == 0 else math.copysign(math.inf, y))
+        return _Segment(a, b, y, y, end, min(y, end), max(y, end), f, inverse, None)
+    if name == 'sine_wave':
+        w = _angular_frequency(args.get('wavelength'), args.get('frequency'))
+        amplitude, phase = args.get('amplitude', 1), args.get('phase', 0)
+        def f(t):
+            return amplitude * math.sin(w*t + phase)
+        def extrema(u0, u1):
+            # w*t + phase = pi/2 + m*pi
+            lo, hi = sorted(((w*u0 + phase - math.pi/2) / math.pi, (w*u1 + phase - math.pi/2) / math.pi))
+            return [(math.pi/2 + m*math.pi - phase) / w for m in range(math.ceil(lo), math.floor(hi) + 1)]
+        lo, hi = min(y, -abs(amplitude)), max(y, abs(amplitude))
+        return _Segment(a, b, y, f(a), f(b), lo, hi, f, None, extrema)
+    # opaque callable: look it up on the curve itself, stopping just short of the next keyframe
+    g = _interpolator(kf)
+    def f(t):
+        try:
+            return g(min(t, b - _TOLERANCE*max(1, abs(b))) if nxt is not None else t, curve)
+        except IndexError:
+            return y
+    return _Segment(a, b, y, f(a), f(b) if b < math.inf else None, -math.inf, math.inf, f, None, None)
+
+class _Segments:
+    """
+    The segments of `curve`, ignoring looping, with the last one running to `end`. Segments are built on first
+    use and cached on the curve until it is edited, except the last, whose span depends on `end`.
+    """
+    def __init__(self, curve:Curve, end):
+        self.curve, self.end = curve, end
+        cached = curve.__dict__.get('_segment_cache')
+        if (cached is None) or (cached[0] is not curve._data) or (cached[1] != curve._version):
+            cached = curve._segment_cache = (curve._data, curve._version, {})
+        self._built = cached[2]
+
+    def __len__(self) -> int:
+        return len(self.curve._data)
+
+    def index(self, u, left:bool=False) -> int:
+        """Index of the segment containing u (of the one ending at u, with `left`), or -1 before the first one."""
+        data = self.curve._data
+        return (data.bisect_left(u) if left else data.bisect_right(u)) - 1
+
+    def at(self, i:int) -> _Segment:
+        seg = self._built.get(i)
+        if seg is None:
+            _, kf = self.curve._data.peekitem(i)
+            if i + 1 == len(self):
+                return _segment(self.curve, kf, None, max(self.end, kf.t))
+            nxt = self.curve._data.peekitem(i+1)[1]
+            seg = self._built[i] = _segment(self.curve, kf, nxt, nxt.t)
+        return seg
+
+def _segments(curve:Curve, end) -> list:
+    """Segments of `curve` covering [0, end], ignoring looping."""
+    view = _Segments(curve, end)
+    outv = []
+    for i in range(len(view)):
+        outv.append(view.at(i))
+        if outv[-1].a >= end:
+            break
+    return outv
+
+def _bisect(f, value, p, q, fp):
+    """Narrows down a sign change of f - value between p and q."""
+    for _ in range(_ROOT_ITERATIONS):
+        m = (p + q) / 2
+        if m in (p, q):
+            break
+        fm = f(m)
+        if (fm - value == 0) or ((fm - value > 0) != (fp - value > 0)):
+            q = m
+        else:
+            p, fp = m, fm
+    return q
+
+def _continuous_hits(seg:_Segment, value, u0, u1) -> list:
+    """Times in [u0, u1] where the segment's formula reaches `value`."""
+    if seg.inverse is not None:
+        t = seg.inverse(value)
+        if (t is not None) and (t == seg.a) and (seg.start == seg.end):
+            # a flat segment at `value` reaches it where the search starts
+            t = u0
+        return [t] if (t is not None) and (u0 <= t <= u1) else []
+    if seg.extrema is not None:
+        ts = [u0] + [t for t in seg.extrema(u0, u1) if u0 < t < u1] + [u1]
+    else:
+        ts = [u0 + (u1 - u0) * j / _ROOT_SAMPLES for j in range(_ROOT_SAMPLES + 1)]
+    vs = [seg.f(t) for t in ts]
+    outv = []
+    for j, (t, v) in enumerate(zip(ts, vs)):
+        if v == value:
+            if (j == 0) or (vs[j-1] != value):
+                outv.append(t)
+        elif (j + 1 < len(ts)) and (vs[j+1] != value) and ((vs[j+1] > value) != (v > value)):
+            outv.append(_bisect(seg.f, value, t, ts[j+1], v))
+    return outv
+
+def _jump_hit(before, y, after, value) -> bool:
+    """Whether the curve reaches `value` by jumping from `before` to `y` (and on to `after`) at one instant."""
+    if (before == y == after) or (value == before):
+        return False
+    return min(before, y, after) <= value <= max(before, y, after)
+
+def _candidates(curve:Curve, value, i0:int, i1:int) -> list:
+    """
+    Indices in [i0, i1] of the segments that can reach `value`, from the extrema index: each keyframe's bounds
+    cover its span and the jump onto the next keyframe, so a segment that isn't listed, and whose predecessor
+    isn't either, can't reach `value` even by jumping.
+    """
+    los, his = _index(curve)
+    n = len(curve._data)
+    nodes = []
+    l, r = i0 + n, i1 + n + 1
+    while l < r:
+        if l & 1:
+            nodes.append(l)
+            l += 1
+        if r & 1:
+            r -= 1
+            nodes.append(r)
+        l, r = l // 2, r // 2
+    outv = []
+    while nodes:
+        j = nodes.pop()
+        if los[j] <= value <= his[j]:
+            if j >= n:
+                outv.append(j - n)
+            else:
+                nodes.extend((2*j, 2*j + 1))
+    return outv
+
+def _hits(segments:_Segments, value, u0, u1, before=None, reverse:bool=False) -> list:
+    """
+    Times in [u0, u1] where the unlooped curve reaches `value`. `before` is the curve's value just before the span
+    starts, if any. With `reverse`, the span is played backwards: it starts at u1, and jumps are checked in that
+    direction. Only the segments the extrema index can't rule out are visited.
+    """
+    outv = []
+    i0, i1 = max(segments.index(u0), 0), max(segments.index(u1), 0)
+    if reverse and (before is not None):
+        # the jump onto u1, e.g. where a bouncing curve turns around, unless a keyframe there handles it below
+        seg = segments.at(i1)
+        if (seg.a != u1) and _jump_hit(before, seg.f(u1), seg.f(u1), value):
+            outv.append(u1)
+    visit = set(_candidates(segments.curve, value, i0, i1))
+    # the jump onto a segment is bounded by its predecessor, and `before` only matters at the ends of the span
+    visit |= {i + 1 for i in visit if i < i1} | {i0, i1}
+    for i in sorted(visit):
+        seg = segments.at(i)
+        if i == i0:
+            prev_end = None if reverse else before
+        else:
+            prev_end = segments.at(i-1).end
+        if seg.a >= u0:
+            left = prev_end if prev_end is not None else seg.y
+            if reverse:
+                right = before if (seg.a == u1) and (before is not None) else seg.start
+                if _jump_hit(right, seg.y, left, value):
+                    outv.append(seg.a)
+            elif _jump_hit(left, seg.y, seg.start, value):
+                outv.append(seg.a)
+        elif (prev_end is not None) and _jump_hit(prev_end, seg.f(u0), seg.f(u0), value):
+            outv.append(u0)
+        lo, hi = max(seg.a, u0), min(seg.b, u1)
+        if (lo <= hi) and (seg.lo <= value <= seg.hi):
+            outv.extend(_continuous_hits(seg, value, lo, hi))
+    return outv
+
+def _limit(segments:_Segments, u, left:bool):
+    """The unlooped curve's limit at u from the left (or right)."""
+    i = segments.index(u, left)
+    if i < 0:
+        return segments.at(0).y
+    seg = segments.at(i)
+    if left and (u >= seg.b) and (seg.end is not None):
+        return seg.end
+    return seg.start if u == seg.a else seg.f(u)
+
+def _pieces(curve:Curve, t0, t1):
+    """
+    Splits [t0, t1] into spans over which a looping or bouncing curve plays its keyframes straight through.
+    Yields (u0, u1, offset, direction), mapping unlooped time u to time offset + direction*u.
+    """
+    if curve.loop:
+        period = curve.duration + 1
+        m = 0 if t0 < curve._last_keyframe() else int(t0 // period)
+        while m * period <= t1:
+            lo, hi = max(t0, m*period), min(t1, (m+1)*period)
+            if lo <= hi:
+                yield lo - m*period, hi - m*period, m*period, 1
+            m += 1
+    elif curve.bounce:
+        n = curve.duration + 1
+        n2 = 2 * (n - 1)
+        m = int(t0 // n2)
+        while m * n2 <= t1:
+            base = m * n2
+            lo, hi = max(t0, base), min(t1, base + n)
+            if lo <= hi:
+                yield lo - base, hi - base, base, 1
+            lo, hi = max(t0, base + n), min(t1, base + n2)
+            if lo <= hi:
+                yield base + n2 - hi, base + n2 - lo, base + n2, -1
+            m += 1
+    else:
+        yield t0, t1, 0, 1
+
+def crossings(curve:Curve, value:Number, t0:Number=0, t1:Number=None) -> list:
+    """
+    Returns the sorted times in [t0, t1] at which `curve` reaches `value`. t1 defaults to the curve's duration, or
+    the end of its first period for looping and bouncing curves. Times are reported
+    where it crosses or touches `value`, where it jumps onto or across it (including where a looping curve wraps
+    around or a bouncing one turns), and at the start of any stretch where it holds exactly `value`.
+    Looping and bouncing curves are searched period by period.
+
+    Only the keyframes overlapping [t0, t1] are searched, and the segment tree `range_extrema` uses rules out
+    segments that can't reach `value`, so a query costs O(log K) plus the segments searched for K keyframes
+    (after an O(K) build, repeated after edits). Segments are built lazily and cached on the curve.
+    'previous', 'next', 'linear', 'eased_lerp', the easings and 'exp_decay' segments are inverted in closed form,
+    'sine_wave' segments are bisected between their turning points, and other callables are sampled at
+    `_ROOT_SAMPLES` points and bisected where they change sides, so they may miss crossings that come and go
+    between samples.
+    """
+    if t1 is None:
+        t1 = curve.duration
+        if curve.loop:
+            t1 += 1
+        elif curve.bounce:
+            t1 *= 2
+    if curve.loop or curve.bounce:
+        end = curve.duration + 1
+    else:
+        end = max(t1, curve.duration)
+    segments = _Segments(curve, end)
+    outv = []
+    before = None
+    for u0, u1, offset, direction in _pieces(curve, t0, t1):
+        if direction > 0:
+            outv.extend(offset + u for u in _hits(segments, value, u0, u1, before))
+            before = _limit(segments, u1, left=True)
+        else:
+            # played backwards: search the unlooped span, then flip
+            # the turnaround is only a jump within the range if the range starts before it
+            turn = before if offset - u1 > t0 else None
+            outv.extend(offset - u for u in _hits(segments, value, u0, u1, turn, reverse=True))
+            before = _limit(segments, u0, left=False)
+    outv.sort()
+    deduped = []
+    for t in outv:
+        if not deduped or (t - deduped[-1] > _TOLERANCE):
+            deduped.append(t)
+    return deduped
+
+
+def _span_bounds(seg:_Segment, u0, u1):
+    """(min, max) of the segment's values over [u0, u1], counting the limit at its end as reached."""
+    if u0 == seg.a:
+        vs = [seg.y, seg.start] if u1 > u0 else [seg.y]
+    else:
+        vs = [seg.f(u0)]
+    if (u1 >= seg.b) and (seg.end is not None):
+        vs.append(seg.end)
+    elif u1 > u0:
+        vs.append(seg.f(u1))
+    if seg.inverse is None and (u1 > u0):
+        if seg.extrema is not None:
+            vs.extend(seg.f(t) for t in seg.extrema(u0, u1) if u0 < t < u1)
+        else:
+            vs.extend(seg.f(u0 + (u1 - u0) * j / _ROOT_SAMPLES) for j in range(1, _ROOT_SAMPLES))
+    return min(vs), max(vs)
+
+def _build_index(curve:Curve):
+    """
+    A segment tree over the bounds of each keyframe's full span, up to and including the next keyframe's value:
+    leaves n..2n-1 hold segment i's bounds, node j holds the bounds of nodes 2j and 2j+1.
+    """
+    kfs = list(curve._data.values())
+    n = len(kfs)
+    lo, hi = [math.inf] * (2*n), [-math.inf] * (2*n)
+    for i, kf in enumerate(kfs[:-1]):
+        nxt = kfs[i+1]
+        method = kf.interpolation_method
+        if (method in _LERP_METHODS) and not kf.interpolator_arguments:
+            # these run monotonically from one keyframe's value to the next's
+            lo[n+i], hi[n+i] = min(kf.value, nxt.value), max(kf.value, nxt.value)
+        else:
+            seg = _segment(curve, kf, nxt, nxt.t)
+            lo_, hi_ = _span_bounds(seg, seg.a, seg.b)
+            lo[n+i], hi[n+i] = min(lo_, nxt.value), max(hi_, nxt.value)
+    for j in range(n - 1, 0, -1):
+        lo[j] = min(lo[2*j], lo[2*j+1])
+        hi[j] = max(hi[2*j], hi[2*j+1])
+    return lo, hi
+
+def _index(curve:Curve):
+    """The segment tree for `curve`, built on first use and rebuilt after edits."""
+    cached = curve.__dict__.get('_extrema_index')
+    if (cached is None) or (cached[0] is not curve._data) or (cached[1] != curve._version):
+        cached = curve._extrema_index = (curve._data, curve._version, _build_index(curve))
+    return cached[2]
+
+def _unlooped_extrema(curve:Curve, u0, u1):
+    i0 = curve._data.bisect_right(u0) - 1
+    i1 = curve._data.bisect_right(u1) - 1
+    segments = _Segments(curve, u1)
+    seg = segments.at(i0)
+    if i0 == i1:
+        return _span_bounds(seg, u0, u1)
+    lo, hi = _span_bounds(seg, u0, seg.b)
+    last = segments.at(i1)
+    lo1, hi1 = _span_bounds(last, last.a, u1)
+    lo, hi = min(lo, lo1), max(hi, hi1)
+    # whole segments i0+1..i1-1 come from the tree
+    los, his = _index(curve)
+    n = len(curve._data)
+    l, r = i0 + 1 + n, i1 - 1 + n + 1
+    while l < r:
+        if l & 1:
+            lo, hi = min(lo, los[l]), max(hi, his[l])
+            l += 1
+        if r & 1:
+            r -= 1
+            lo, hi = min(lo, los[r]), max(hi, his[r])
+        l, r = l // 2, r // 2
+    return lo, hi
+
+def range_extrema(curve:Curve, t0:Number=0, t1:Number=None) -> tuple:
+    """
+    Returns `(min, max)` of `curve` over [t0, t1] (t1 defaults to the curve's duration). Where the curve approaches
+    a value without reaching it, e.g. just before a jump, that value counts as reached.
+
+    Segments that lie wholly inside the range are covered by a segment tree over each keyframe's span, built the
+    first time it's needed and rebuilt after the curve is edited, so a query costs O(log K) for K keyframes
+    (after an O(K) build). The partial segments at either end are bounded exactly for 'previous', 'next',
+    'linear', 'eased_lerp', easing, 'exp_decay' and 'sine_wave' segments, and by sampling for other callables.
+    Looping and bouncing curves are queried period by period. Values must be plain numbers.
+    """
+    if t1 is None:
+        t1 = curve.duration
+    if t1 < t0:
+        raise ValueError(f"Empty range: [{t0}, {t1}]")
+    lo, hi = math.inf, -math.inf
+    for u0, u1, _, _ in _pieces(curve, t0, t1):
+        lo_, hi_ = _unlooped_extrema(curve, u0, u1)
+        lo, hi = min(lo, lo_), max(hi, hi_)
+    return lo, hi
+
+def downsample_minmax(curve:Curve, t0:Number, t1:Number, buckets:int) -> list:
+    """
+    Splits [t0, t1] into `buckets` equal spans and returns the `(min, max)` of `curve` over each, e.g. to draw
+    a curve with far more keyframes than pixels without losing its peaks. See `range_extrema`.
+    """
+    width = (t1 - t0) / buckets
+    return [range_extrema(curve, t0 + j*width, t0 + (j+1)*width if j+1 < buckets else t1) for j in range(buckets)]
+
+
+class InverseCurve(_DerivedCurve):
+    """
+    The inverse of a monotone Curve: `inverse[v]` is the earliest time in [0, curve.duration] at which the curve
+    reaches `v`, i.e. its value is at least `v` for a non-decreasing curve, or at most `v` for a non-increasing
+    one. Raises ValueError for values the curve never reaches.
+
+    Lookups bisect over the segments' end values, then invert within the segment found: in closed form for
+    'previous', 'next', 'linear', 'eased_lerp', easing and 'exp_decay' segments, by bisection otherwise.
+    Monotonicity is checked when the curve is first inverted and after every edit; segments without a closed form
+    are checked by sampling.
+    """
+    _prefix = 'inverse'
+
+    def __init__(self, curve:Curve, label:str=None):
+        if curve.loop or curve.bounce:
+            raise ValueError("Looping and bouncing curves aren't monotone, so they can't be inverted.")
+        super().__init__(curve, label)
+        self._table()
+
+    def _build(self):
+        segments = _segments(self.curve, self.curve.duration)
+        checkpoints = []
+        for seg in segments:
+            checkpoints.append(seg.y)
+            if seg.a == seg.b:
+                continue
+            checkpoints.append(seg.start)
+            if seg.inverse is None:
+                checkpoints.extend(
+                    seg.f(seg.a + (seg.b - seg.a) * j / _ROOT_SAMPLES) for j in range(1, _ROOT_SAMPLES)
+                )
+            checkpoints.append(seg.end if seg.end is not None else seg.f(seg.b))
+        direction = 1
+        for v0, v1 in zip(checkpoints[:-1], checkpoints[1:]):
+            if v1 != v0:
+                direction = 1 if v1 > v0 else -1
+                break
+        if any(direction * (v1 - v0) < 0 for v0, v1 in zip(checkpoints[:-1], checkpoints[1:])):
+            raise ValueError(f"Curve {self.curve.label} isn't monotone, so it can't be inverted.")
+        tops = [direction * (seg.y if seg.a == seg.b else seg.end) for seg in segments]
+        return segments, direction, tops
+
+    def _table(self):
+        return self._cached(self._build)
+
+    def __getitem__(self, v) -> Number:
+        if isinstance(v, slice):
+            raise TypeError("InverseCurve doesn't support slicing.")
+        segments, direction, tops = self._table()
+        i = bisect_left(tops, direction * v)
+        if i == len(segments):
+            raise ValueError(f"Curve {self.curve.label} never reaches {v}")
+        seg = segments[i]
+        if (direction * seg.y >= direction * v) or (direction * seg.start >= direction * v):
+            return seg.a
+        if seg.inverse is not None:
+            t = seg.inverse(v)
+            if t is not None:
+                return t
+        return _bisect(seg.f, v, seg.a, seg.b, seg.start)
+
+    @property
+    def keyframes(self) -> list:
+        return sorted(self.curve.values)
+
+    @property
+    def values(self) -> list:
+        return [self[v] for v in self.keyframes]
+
+    @property
+    def duration(self) -> Number:
+        return self.keyframes[-1]
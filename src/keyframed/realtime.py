@@ -0,0 +1,167 @@
+"""
+Real-time playback of curves: streaming values at a fixed frame rate from inside an asyncio app,
+or evaluating "the value now" against an external clock.
+"""
+import asyncio
+import time
+from typing import Callable
+
+from .utils import Histogram
+
+def _is_endless(obj) -> bool:
+    return bool(getattr(obj, 'loop', False) or getattr(obj, 'bounce', False))
+
+async def astream(
+    obj,
+    fps:float=60,
+    start:float=0,
+    end:float=None,
+    on_late:Callable=None,
+    drop_late:bool=False,
+    executor=None,
+    clock:Callable=time.monotonic,
+):
+    """
+    Async generator yielding `(frame, value)` pairs for frames `start, start+1, ...` at `fps` frames per second,
+    where `value` is `obj[frame]`.
+
+    Frames are paced against `clock` (monotonic by default) rather than by sleeping a fixed period between frames,
+    so the stream doesn't drift. Looping and bouncing curves stream forever; otherwise the stream ends after `end`,
+    which defaults to the curve's duration.
+
+    A frame is late if its value isn't ready by the end of its slot. Late frames are still yielded, and reported
+    to `on_late(frame, lateness_in_seconds)` if given. If `drop_late` is set, frames whose slot has already passed
+    are skipped to catch back up with the clock.
+
+    If `executor` is given (e.g. a ThreadPoolExecutor) each frame is evaluated in it, so an expensive
+    curve doesn't block the event loop.
+    """
+    if fps <= 0:
+        raise ValueError(f"fps must be positive, got {fps}")
+    period = 1 / fps
+    if (end is None) and not _is_endless(obj):
+        end = obj.duration
+    loop = asyncio.get_running_loop()
+    t0 = clock()
+    i = 0
+    while True:
+        frame = start + i
+        if (end is not None) and (frame > end):
+            return
+        deadline = t0 + i*period
+        now = clock()
+        if now < deadline:
+            await asyncio.sleep(deadline - now)
+        if executor is None:
+            value = obj[frame]
+        else:
+            value = await loop.run_in_executor(executor, obj.__getitem__, frame)
+        lateness = clock() - (deadline + period)
+        if lateness > 0:
+            if on_late is not None:
+                on_late(frame, lateness)
+            if drop_late:
+                i += int(lateness // period)
+        yield frame, value
+        i += 1
+
+
+class Scheduler:
+    """
+    Maps clock time to curve time and evaluates a curve or ParameterGroup at "now", for driving parameters
+    from a callback such as an audio buffer request.
+
+    Curve time is `frame = anchor_frame + (now - anchor_clock) / clock_rate * fps * rate`, recomputed from the
+    last anchor on every call rather than accumulated tick by tick, so it doesn't drift. Pausing, seeking and
+    changing the rate just move the anchor.
+
+    Arguments
+      obj: The curve or ParameterGroup to evaluate.
+      fps (float): Curve frames per second of clock time.
+      rate (float): Playback rate multiplier, e.g. 0.5 for half speed or -1 to play backwards.
+      offset (float): Curve frame at the moment the scheduler is created.
+      clock (Callable): Returns the current clock reading. Defaults to `time.monotonic`.
+      clock_rate (float): Clock units per second, e.g. the sample rate when `clock` counts samples.
+      deadline (float): Optional evaluation budget in seconds. Ticks that take longer are counted in `missed`.
+    """
+    def __init__(
+        self,
+        obj,
+        fps:float=1,
+        rate:float=1,
+        offset:float=0,
+        clock:Callable=time.monotonic,
+        clock_rate:float=1,
+        deadline:float=None,
+    ):
+        self.obj = obj
+        self.fps = fps
+        self.clock = clock
+        self.clock_rate = clock_rate
+        self.deadline = deadline
+        self._rate = rate
+        self._paused = False
+        self._anchor_frame = offset
+        self._anchor_clock = clock()
+        self.latency = Histogram()
+        self.missed = 0
+
+    def _now(self, now):
+        return self.clock() if now is None else now
+
+    def time(self, now:float=None) -> float:
+        """Curve time (a possibly fractional frame) at clock reading `now`, defaulting to the current reading."""
+        if self._paused:
+            return self._anchor_frame
+        elapsed = (self._now(now) - self._anchor_clock) / self.clock_rate
+        return self._anchor_frame + elapsed * self.fps * self._rate
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate:float):
+        self.seek(self.time())
+        self._rate = rate
+
+    def seek(self, frame:float, now:float=None):
+        self._anchor_frame = frame
+        self._anchor_clock = self._now(now)
+
+    def pause(self, now:float=None):
+        if not self._paused:
+            self.seek(self.time(now), now)
+            self._paused = True
+
+    def resume(self, now:float=None):
+        if self._paused:
+            self._anchor_clock = self._now(now)
+            self._paused = False
+
+    def tick(self, now:float=None):
+        """
+        Evaluates the curve at the curve time corresponding to clock reading `now` (defaulting to the current
+        reading), recording how long the evaluation took in `latency`.
+        """
+        k = self.time(now)
+        t0 = time.perf_counter()
+        value = self.obj[k]
+        elapsed = time.perf_counter() - t0
+        self.latency.add(elapsed)
+        if (self.deadline is not None) and (elapsed > self.deadline):
+            self.missed += 1
+        return value
+
+    def stats(self) -> dict:
+        outv = self.latency.to_dict()
+        outv['missed'] = self.missed
+        return outv
+
+    def reset_stats(self):
+        self.latency.reset()
+        self.missed = 0
@@ -0,0 +1,60 @@
+"""
+Batch rendering of curves over frame ranges, optionally split across a pool of worker processes.
+"""
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+import pickle
+
+# the curve being rendered, unpickled once per worker process by `_init_worker`
+_worker_obj = None
+
+def _init_worker(payload:bytes):
+    global _worker_obj
+    _worker_obj = pickle.loads(payload)
+
+def _render_chunk(frames:list):
+    return _columns(_worker_obj.evaluate(frames))
+
+def _columns(values:list):
+    """Transposes per-frame dicts (from a ParameterGroup) into a dict of per-parameter lists."""
+    if values and isinstance(values[0], Mapping):
+        return {name: [v[name] for v in values] for name in values[0]}
+    return list(values)
+
+def _extend(outv, chunk):
+    if isinstance(outv, dict):
+        for name, column in chunk.items():
+            outv.setdefault(name, []).extend(column)
+    else:
+        outv.extend(chunk)
+    return outv
+
+def render(obj, frames, workers:int=None, chunksize:int=None):
+    """
+    Evaluates `obj` at every frame in `frames`. Returns a list of values for a Curve or Composition,
+    or a dict mapping each parameter name to its list of values for a ParameterGroup.
+
+    If `workers` > 1, frames are split into contiguous chunks and evaluated by a ProcessPoolExecutor.
+    The curve is pickled once up front and unpickled once per worker, and chunks are reassembled in order,
+    so the result is identical to rendering serially.
+    """
+    frames = list(frames)
+    if (not workers) or (workers <= 1) or (len(frames) < 2):
+        return _columns(obj.evaluate(frames))
+
+    try:
+        payload = pickle.dumps(obj)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        # which of these pickle raises for e.g. a lambda depends on the Python version
+        raise TypeError(f"Rendering with workers needs a picklable curve: {e}") from e
+    if chunksize is None:
+        # a few chunks per worker smooths out uneven per-frame costs
+        chunksize = max(1, -(-len(frames) // (4 * workers)))
+    chunks = [frames[i:i+chunksize] for i in range(0, len(frames), chunksize)]
+    outv = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(payload,)) as executor:
+        for chunk in executor.map(_render_chunk, chunks):
+            if outv is None:
+                outv = {} if isinstance(chunk, dict) else []
+            outv = _extend(outv, chunk)
+    return outv
@@ -1,12 +1,27 @@
 from .curve import Keyframe, Curve, CurveBase, ParameterGroup, Composition
+from .interpolation import interpolation_method_name
 
+import base64
+from functools import partial
+import importlib
 from numbers import Number
+import pickle
+from typing import Callable
 
 # can probably use a simpler yaml library
 from omegaconf import OmegaConf
 
 #from loguru import logger
 
+# documents written with `tagged=True` carry a schema version at the top level and a type tag on every node
+SCHEMA_VERSION = 1
+VERSION_KEY = '__version__'
+TYPE_KEY = '__type__'
+
+# unregistered callable interpolators can be serialized with an explicit opt-in, see `to_dict`
+IMPORT_PREFIX = 'import:'
+PICKLE_PREFIX = 'pickle:'
+
 def _test_type_by_keys(d:dict, keys):
     assert isinstance(d, dict)
     if len(d) != len(keys):
@@ -40,15 +55,12 @@ def _is_keyframe_tuple(d:tuple):
         return False
     if len(d) == 3:
         if not isinstance(d[2], str):
-            print(d)
             raise TypeError(
                 "length 3 tuple, assuming it's a keyframe. "
                 "third element of tuple must be a string for simple serialization. "
-                "just use pickle. "
-                "\n...or if this error wasn't thrown because you were trying to serialize a curve "
-                "that has a callable function for an interpolation method on one of its keyframes, "
-                "please report the circumstances under which you received this error to "
-                "https://github.com/dmarx/keyframed/issues/new"
+                "If the keyframe uses a callable interpolation method, register it with "
+                "`register_interpolation_method` so it serializes by name, or pass "
+                "callables='import' or callables='pickle' to `to_dict`/`to_yaml`."
             )
     return True
 
@@ -66,46 +78,274 @@ def _is_pgroup(d:dict):
 def _is_comp(d:dict):
     return ( ('parameters') in d and ('reduction' in d) )
 
-def from_dict(d:dict):
+def _is_ref(d):
+    return isinstance(d, dict) and (len(d) == 1) and ('$ref' in d)
+
+class _LoadContext:
+    """
+    State shared across a single `from_dict` call: lazily rebuilds the shared sub-curves listed under
+    the '$refs' key of a document, so that every reference to the same name resolves to the same object,
+    and records whether the caller opted in to resolving import-path or pickled interpolators.
+    """
+    def __init__(self, table:dict=None, allow_import=False, allow_pickle=False):
+        self.table = table
+        self.objects = {}
+        self.allow_import = allow_import
+        self.allow_pickle = allow_pickle
+
+    def resolve(self, name):
+        if self.table is None:
+            raise KeyError(f"Document contains a reference to {name} but no '$refs' table")
+        if name not in self.objects:
+            if name not in self.table:
+                raise KeyError(f"Unresolved reference: {name}")
+            self.objects[name] = _from_dict(self.table[name], self)
+        return self.objects[name]
+
+def _encode_callable(f:Callable, callables:str=None) -> str:
+    name = interpolation_method_name(f)
+    if name is not None:
+        return name
+    if callables == 'import':
+        module, qualname = getattr(f, '__module__', None), getattr(f, '__qualname__', '')
+        if (module is None) or ('<' in qualname):
+            raise TypeError(f"{f} can't be serialized by import path, it isn't a module-level object. Try callables='pickle'.")
+        return f"{IMPORT_PREFIX}{module}:{qualname}"
+    if callables == 'pickle':
+        return PICKLE_PREFIX + base64.b64encode(pickle.dumps(f)).decode('ascii')
+    raise TypeError(
+        f"Interpolation method {f} is not registered. Register it with `register_interpolation_method` "
+        "to serialize it by name, or pass callables='import' or callables='pickle' to serialize it anyway."
+    )
+
+def _decode_callable(name:str, ctx:_LoadContext) -> Callable:
+    if name.startswith(IMPORT_PREFIX):
+        if not ctx.allow_import:
+            raise ValueError(f"Document references interpolator {name}. Pass allow_import=True if you trust it.")
+        module, qualname = name[len(IMPORT_PREFIX):].split(':')
+        f = importlib.import_module(module)
+        for attr in qualname.split('.'):
+            f = getattr(f, attr)
+        return f
+    if not ctx.allow_pickle:
+        raise ValueError("Document contains a pickled interpolator. Pass allow_pickle=True if you trust it.")
+    return pickle.loads(base64.b64decode(name[len(PICKLE_PREFIX):]))
+
+def _is_encoded_callable(v) -> bool:
+    return isinstance(v, str) and (v.startswith(IMPORT_PREFIX) or v.startswith(PICKLE_PREFIX))
+
+def _map_interpolation_methods(records, f:Callable, test:Callable):
+    """
+    Applies `f` to the interpolation method slot of each keyframe record in a serialized curve,
+    wherever `test` returns True. Handles both the tuple (for_yaml) and dict layouts.
+    """
+    if isinstance(records, dict):
+        outv = {}
+        for t, rec in records.items():
+            if isinstance(rec, dict) and test(rec.get('interpolation_method')):
+                rec = dict(rec)
+                rec['interpolation_method'] = f(rec['interpolation_method'])
+            outv[t] = rec
+        return outv
+    outv = []
+    for rec in records:
+        if isinstance(rec, (list, tuple)):
+            rec = type(rec)(f(v) if test(v) else v for v in rec)
+        outv.append(rec)
+    return type(records)(outv)
+
+def _load_keyframe(d:dict, ctx:_LoadContext):
+    if _is_encoded_callable(d.get('interpolation_method')):
+        d = dict(d)
+        d['interpolation_method'] = _decode_callable(d['interpolation_method'], ctx)
+    return Keyframe(**d)
+
+def _load_curve(d:dict, ctx:_LoadContext):
+    d = dict(d)
+    d['curve'] = _map_interpolation_methods(d['curve'], partial(_decode_callable, ctx=ctx), _is_encoded_callable)
+    return Curve(**d)
+
+def _load_group(d:dict, ctx:_LoadContext, cls=ParameterGroup):
+    d_ = {}
+    if d.get('label') is not None:
+        d_['label'] = d['label']
+    if d.get('weight') is not None:
+        d_['weight'] = _from_dict(d['weight'], ctx)
+
+    curves = {}
+    for k,v in d['parameters'].items():
+        if isinstance(v, Number):
+            param = v
+        elif isinstance(v, dict):
+            param = _from_dict(v, ctx)
+        else:
+            raise NotImplementedError(f"expected number of dict, got {v} of type {type(v)}")
+        curves[k] = param
+    d_['parameters'] = curves
+
+    if cls is Composition:
+        d_['reduction'] = d['reduction']
+    return cls(**d_)
+
+# dispatch table for documents written with tagged=True
+LOADERS = {
+    'Keyframe': _load_keyframe,
+    'Curve': _load_curve,
+    'ParameterGroup': partial(_load_group, cls=ParameterGroup),
+    'Composition': partial(_load_group, cls=Composition),
+}
+
+def _from_dict(d:dict, ctx:_LoadContext):
+    if isinstance(d, dict) and (TYPE_KEY in d):
+        d = dict(d)
+        tag = d.pop(TYPE_KEY)
+        loader = LOADERS.get(tag)
+        if loader is None:
+            raise ValueError(f"Unsupported node type: {tag}")
+        return loader(d, ctx)
+    if _is_ref(d):
+        return ctx.resolve(d['$ref'])
+
+    # untagged documents: infer the node type from its keys
     if _is_keyframe_dict(d):
-        return Keyframe(**d)
+        return _load_keyframe(d, ctx)
     if _is_keyframe_tuple(d):
         return Keyframe(*d)
     if _is_curve(d):
-        return Curve(**d)
-    
-    if _is_pgroup(d) or _is_comp(d):
-        d_ = {}
-        if d.get('label') is not None:
-            d_['label'] = d['label']
-        if d.get('weight') is not None:
-            d_['weight'] = from_dict(d['weight'])
-
-        curves = {}
-        for k,v in d['parameters'].items():
-            if isinstance(v, Number):
-                param = v
-            elif isinstance(v, dict):
-                param = from_dict(v)
-            else:
-                raise NotImplementedError(f"expected number of dict, got {v} of type {type(v)}")
-            curves[k] = param
-        d_['parameters'] = curves
-
-        if not _is_comp(d):
-            return ParameterGroup(**d_)
-        else:
-            d_['reduction'] = d['reduction']
-            return Composition(**d_)
+        return _load_curve(d, ctx)
+    if _is_comp(d):
+        return _load_group(d, ctx, cls=Composition)
+    if _is_pgroup(d):
+        return _load_group(d, ctx, cls=ParameterGroup)
 
     raise NotImplementedError
 
-def to_yaml(obj:CurveBase, simplify=True, ignore_labels=False):
-    d = obj.to_dict(simplify=simplify, for_yaml=True, ignore_labels=ignore_labels)
+def from_dict(d:dict, allow_import=False, allow_pickle=False):
+    """
+    Rebuilds a Keyframe, Curve, ParameterGroup or Composition from a dict.
+    Interpolators serialized by import path or by pickle are only resolved if the
+    corresponding `allow_import`/`allow_pickle` flag is set, since both can run arbitrary code.
+    """
+    ctx = _LoadContext(allow_import=allow_import, allow_pickle=allow_pickle)
+    if isinstance(d, dict) and ((VERSION_KEY in d) or ('$refs' in d)):
+        d = dict(d)
+        version = d.pop(VERSION_KEY, None)
+        if (version is not None) and (version > SCHEMA_VERSION):
+            raise ValueError(
+                f"Document was written with schema version {version}, "
+                f"this version of keyframed only reads up to version {SCHEMA_VERSION}."
+            )
+        if '$refs' in d:
+            ctx.table = d.pop('$refs')
+    return _from_dict(d, ctx)
+
+def _type_tag(obj) -> str:
+    # subclasses like SinusoidalCurve serialize as their nearest supported base type
+    for cls in type(obj).__mro__:
+        if cls.__name__ in LOADERS:
+            return cls.__name__
+    raise TypeError(f"Don't know how to tag objects of type {type(obj)}")
+
+def _nodes(obj, d:dict):
+    """
+    Yields (object, serialized dict) pairs for `obj` and, for groups, each of its serialized children.
+    Walks `obj` alongside `d` since the untagged dicts don't carry their types.
+    """
+    yield obj, d
+    if isinstance(obj, ParameterGroup):
+        for name, curve in obj.parameters.items():
+            d_ = d['parameters'].get(name)
+            if isinstance(d_, dict) and not _is_ref(d_):
+                yield from _nodes(curve, d_)
+        if isinstance(d.get('weight'), dict):
+            yield from _nodes(obj.weight, d['weight'])
+
+def _is_callable_method(v) -> bool:
+    # interpolator_arguments dicts share the record with the method, but they're not callable
+    return callable(v) and not isinstance(v, (str, dict))
+
+def _finalize(obj, d:dict, tagged=False, callables=None):
+    """Tags each node of a serialized document and swaps callable interpolation methods for names."""
+    encode = partial(_encode_callable, callables=callables)
+    for node, d_ in _nodes(obj, d):
+        if tagged:
+            d_[TYPE_KEY] = _type_tag(node)
+        if isinstance(node, Keyframe):
+            if _is_callable_method(d_.get('interpolation_method')):
+                d_['interpolation_method'] = encode(d_['interpolation_method'])
+        elif 'curve' in d_:
+            d_['curve'] = _map_interpolation_methods(d_['curve'], encode, _is_callable_method)
+
+def _shared_curves(obj:CurveBase) -> dict:
+    """
+    Finds the sub-curves that are reachable through more than one parameter of `obj`,
+    by identity. Returns a dict mapping id(curve) -> a unique name derived from the curve's label,
+    and a dict mapping id(curve) -> curve.
+    Weights are tied to the label of the group that owns them, so they are never shared.
+    """
+    counts, objects = {}, {}
+    def visit(node):
+        for curve in node.parameters.values():
+            i = id(curve)
+            counts[i] = counts.get(i, 0) + 1
+            objects[i] = curve
+            # only descend the first time we see a node, its subtree is already accounted for
+            if counts[i] == 1 and isinstance(curve, ParameterGroup):
+                visit(curve)
+    if isinstance(obj, ParameterGroup):
+        visit(obj)
+
+    names, taken = {}, set()
+    for i, n in counts.items():
+        if n < 2:
+            continue
+        name, j = objects[i].label, 0
+        while name in taken:
+            j += 1
+            name = f"{objects[i].label}_{j}"
+        taken.add(name)
+        names[i] = name
+    return names, objects
+
+def to_dict(obj:CurveBase, simplify=False, for_yaml=False, ignore_labels=False, dedupe=False, tagged=False, callables=None):
+    """
+    Serializes `obj` to a dict. If `dedupe` is True, sub-curves shared by several parameters
+    are written once to a top-level '$refs' table and referenced as {'$ref': name}.
+    `from_dict` rebuilds them as a single shared object.
+    If `tagged` is True, every node gets a '__type__' tag and the document gets a '__version__',
+    which lets `from_dict` dispatch on the tag instead of inferring node types from their keys.
+
+    Callable interpolation methods are written by the name they were registered under with
+    `register_interpolation_method`. Unregistered callables raise a TypeError unless `callables` is
+    'import' (written as an import path) or 'pickle' (written as a base64 pickle); loading those
+    requires a matching opt-in on `from_dict`.
+    """
+    kargs = dict(simplify=simplify, for_yaml=for_yaml, ignore_labels=ignore_labels)
+    refs, objects = {}, {}
+    if dedupe and isinstance(obj, ParameterGroup):
+        refs, objects = _shared_curves(obj)
+    if refs:
+        outv = obj.to_dict(refs=refs, **kargs)
+    else:
+        outv = obj.to_dict(**kargs)
+    _finalize(obj, outv, tagged=tagged, callables=callables)
+    if refs:
+        table = {}
+        for i, name in refs.items():
+            # a shared node can't reference itself, but its own shared children still get referenced
+            table[name] = obj._parameter_to_dict(objects[i], refs={k:v for k,v in refs.items() if k != i}, **kargs)
+            _finalize(objects[i], table[name], tagged=tagged, callables=callables)
+        outv['$refs'] = table
+    if tagged:
+        outv[VERSION_KEY] = SCHEMA_VERSION
+    return outv
+
+def to_yaml(obj:CurveBase, simplify=True, ignore_labels=False, dedupe=False, tagged=False, callables=None):
+    d = to_dict(obj, simplify=simplify, for_yaml=True, ignore_labels=ignore_labels, dedupe=dedupe, tagged=tagged, callables=callables)
     cfg = OmegaConf.create(d)
     return OmegaConf.to_yaml(cfg)
 
-def from_yaml(yaml_str:str):
+def from_yaml(yaml_str:str, allow_import=False, allow_pickle=False):
     cfg = OmegaConf.create(yaml_str)
     d = OmegaConf.to_container(cfg)
-    return from_dict(d)
\ No newline at end of file
+    return from_dict(d, allow_import=allow_import, allow_pickle=allow_pickle)
@@ -1,25 +1,36 @@
+from bisect import bisect_left
 from collections import UserDict
 import operator
 from copy import deepcopy
 import random, string
 
+from sortedcontainers import SortedDict
+
+def _same_keyframe(a, b) -> bool:
+    return (
+        (a.value == b.value)
+        and (a.interpolation_method == b.interpolation_method)
+        and (a._interpolator_arguments == b._interpolator_arguments)
+    )
+
 def simplify(curve):
-    j=1
-    while j < (len(curve._data)-1):
-        kf_prev = curve._data.peekitem(j-1)[1]
-        kf_this = curve._data.peekitem(j)[1]
-        kf_next = curve._data.peekitem(j+1)[1]
-        
-        if not (kf_prev.value == kf_this.value == kf_next.value):
-            j+=1
-            continue
-        if not (kf_prev.interpolation_method == kf_this.interpolation_method == kf_next.interpolation_method):
-            j+=1
-            continue
-        if not (kf_prev._interpolator_arguments == kf_this._interpolator_arguments == kf_next._interpolator_arguments):
-            j+=1
-            continue
-        curve._data.popitem(j)
+    """
+    Removes every keyframe that is identical (value, interpolation method and arguments) to both the last
+    keyframe kept before it and the keyframe after it, since it doesn't change the curve. Runs in a single
+    pass and replaces the curve's keyframes in one step. For error-bounded reduction see `keyframed.approx.decimate`.
+    """
+    from .curve import _WRITE_LOCK  # curve imports this module
+    with _WRITE_LOCK:
+        items = list(curve._writable_data().items())
+        kept = items[:1]
+        for j in range(1, len(items)-1):
+            kf_this, kf_next = items[j][1], items[j+1][1]
+            if not (_same_keyframe(kept[-1][1], kf_this) and _same_keyframe(kf_this, kf_next)):
+                kept.append(items[j])
+        if len(items) > 1:
+            kept.append(items[-1])
+        curve._data = SortedDict(kept)
+        curve._version += 1
     return curve
 
 
@@ -60,3 +71,60 @@ class DictValuesArithmeticFriendly(UserDict):
         return (self * (-1)) + other
     def __sub__(self, other):
         return self.__arithmetic_helper(operator.sub, other)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations in seconds. Bucket upper bounds double from 1us up to ~1s,
+    with a final overflow bucket, so recording is O(log buckets) and memory is constant.
+    """
+    BOUNDS = tuple(1e-6 * 2**i for i in range(21))
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x:float):
+        self.counts[bisect_left(self.BOUNDS, x)] += 1
+        self.count += 1
+        self.total += x
+        if (self.min is None) or (x < self.min):
+            self.min = x
+        if (self.max is None) or (x > self.max):
+            self.max = x
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q:float) -> float:
+        """Upper bound of the bucket holding the q-th quantile, clipped to the largest value seen."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and (seen >= target):
+                if i < len(self.BOUNDS):
+                    return min(self.BOUNDS[i], self.max)
+                break
+        return self.max
+
+    def to_dict(self) -> dict:
+        return dict(
+            count=self.count,
+            total=self.total,
+            mean=self.mean,
+            min=self.min,
+            max=self.max,
+            p50=self.quantile(0.5),
+            p99=self.quantile(0.99),
+            buckets={bound:n for bound, n in zip(self.BOUNDS + (float('inf'),), self.counts) if n},
+        )
@@ -0,0 +1,126 @@
+import pytest
+
+from keyframed import Curve, Composition, ParameterGroup, fold
+
+
+def frames(n, step=0.25):
+    return [i*step for i in range(int(n/step) + 1)]
+
+def assert_same(a, b, n):
+    for k in frames(n):
+        assert a[k] == pytest.approx(b[k]), k
+
+def test_fold_sum_of_linear():
+    a = Curve({0:0, 4:8, 10:2}, default_interpolation='linear')
+    b = Curve({0:1, 3:5, 7:-2}, default_interpolation='linear')
+    comp = a + b
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert list(folded.keyframes) == [0, 3, 4, 7, 10]
+    assert_same(folded, comp, 12)
+
+def test_fold_sum_of_steps():
+    a = Curve({0:0, 4:8, 10:2})
+    b = Curve({0:1, 3:5, 7:-2})
+    folded = fold(a + b)
+    assert isinstance(folded, Curve)
+    assert_same(folded, a + b, 12)
+
+def test_fold_steps_onto_flat_linear_segments():
+    a = Curve(((0,0,'linear'), (4,8,'previous'), (8,8,'linear'), (10,2)))
+    b = Curve({0:1, 5:3})
+    folded = fold(a + b)
+    assert isinstance(folded, Curve)
+    assert_same(folded, a + b, 12)
+
+def test_fold_sub_mean_and_scalars():
+    a = Curve({0:0, 10:10}, default_interpolation='linear')
+    b = Curve({0:2, 5:4, 10:0}, default_interpolation='linear')
+    comp = (a - b) * 2 + 1
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert_same(folded, comp, 12)
+    mean = Composition({'a':a, 'b':b}, reduction='mean')
+    assert_same(fold(mean), mean, 12)
+
+def test_fold_min_max_crossings():
+    a = Curve({0:0, 10:10}, default_interpolation='linear')
+    b = Curve({0:10, 10:0}, default_interpolation='linear')
+    for reduction in ('min', 'max'):
+        comp = Composition({'a':a, 'b':b}, reduction=reduction)
+        folded = fold(comp)
+        assert isinstance(folded, Curve)
+        assert 5 in folded.keyframes
+        assert_same(folded, comp, 12)
+
+def test_fold_product_with_constant_segments():
+    a = Curve({0:0, 5:5, 10:5}, default_interpolation='linear')
+    b = Curve({0:2, 7:3})
+    comp = a * b
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert_same(folded, comp, 12)
+
+def test_fold_weight():
+    a = Curve({0:0, 5:5}, default_interpolation='linear')
+    comp = Composition({'a':a, 'b':Curve({0:1})}, reduction='add', weight=Curve({0:1, 7:0.5}))
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert_same(folded, comp, 12)
+
+def test_fold_bails_when_not_exact():
+    a = Curve({0:0, 10:10}, default_interpolation='linear', label='a')
+    c = Curve({0:0, 5:5}, default_interpolation='linear', label='c')
+    # product of two sloped segments is quadratic
+    assert isinstance(fold(a * c), Composition)
+    # sloped segment ending in a jump
+    b = Curve({0:0, 5:3})
+    assert isinstance(fold(a + b), Composition)
+    # looping and other interpolators
+    assert isinstance(fold(Curve({0:0, 3:1}, loop=True) + c), Composition)
+    assert isinstance(fold(Curve({0:0, 3:1}, default_interpolation='eased_lerp') + c), Composition)
+
+def test_fold_partial_tree():
+    a = Curve({0:0, 10:10}, default_interpolation='linear')
+    b = Curve({0:1, 5:2}, default_interpolation='linear')
+    smooth = Curve({0:0, 10:1}, default_interpolation='eased_lerp')
+    comp = Composition({'ab':a + b, 'smooth':smooth}, reduction='multiply')
+    folded = fold(comp)
+    assert isinstance(folded, Composition)
+    assert isinstance(folded.parameters['ab'], Curve)
+    assert folded.parameters['smooth'] is smooth
+    assert isinstance(comp.parameters['ab'], Composition)
+    assert_same(folded, comp, 12)
+
+def test_fold_pgroup():
+    a = Curve({0:0, 10:10}, default_interpolation='linear')
+    pg = ParameterGroup({'x':a + 1, 'y':a})
+    folded = fold(pg)
+    assert isinstance(folded.parameters['x'], Curve)
+    for k in frames(12):
+        assert folded[k]['x'] == pytest.approx(pg[k]['x'])
+    untouched = ParameterGroup({'y':a})
+    assert fold(untouched) is untouched
+
+def test_fold_affine_chain():
+    c = Curve({0:0, 4:3, 10:-2}, default_interpolation='eased_lerp', label='c')
+    comp = c * 2 + 1 - 0.5
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert list(folded.keyframes) == [0, 4, 10]
+    assert_same(folded, comp, 12)
+    assert c[4] == 3
+
+def test_fold_affine_keeps_looping_and_weights():
+    c = Curve(((0,0,'sin'), (3,2,'next'), (5,1)), bounce=True, label='c')
+    comp = Composition({'c':3 - c, 'k':Curve(1)}, reduction='mean', weight=Curve(4))
+    folded = fold(comp)
+    assert isinstance(folded, Curve)
+    assert folded.bounce
+    assert_same(folded, comp, 25)
+
+def test_fold_affine_bails_when_not_exact():
+    f = Curve.from_function(lambda k: k**2)
+    assert isinstance(fold(f * 2 + 1), Composition)
+    decay = Curve({0:1, 5:0}, default_interpolation='exp_decay', default_interpolator_args={'decay_rate':0.5})
+    assert isinstance(fold(decay + 1), Composition)
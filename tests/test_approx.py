@@ -0,0 +1,129 @@
+import math
+import random
+
+import pytest
+
+from keyframed import Curve, ParameterGroup, bake, decimate, simplify
+
+
+def test_simplify_keeps_semantics():
+    c = Curve({0:1, 1:1, 2:1, 3:1, 4:2, 5:2, 6:2, 7:3})
+    c2 = simplify(c.copy())
+    assert list(c2.keyframes) == [0, 3, 4, 6, 7]
+    for i in range(8):
+        assert c2[i] == c[i]
+
+def test_simplify_long_curve():
+    n = 5000
+    c = Curve({t:(t//500) for t in range(n)})
+    c2 = simplify(c.copy())
+    assert len(c2.keyframes) == 2 * (n // 500)
+    for i in range(0, n, 37):
+        assert c2[i] == c[i]
+
+def test_decimate_linear_exact():
+    c = Curve({t:2*t + 1 for t in range(100)}, default_interpolation='linear')
+    c2, err = decimate(c)
+    assert list(c2.keyframes) == [0, 99]
+    assert err == pytest.approx(0, abs=1e-12)
+    assert c2[50.5] == pytest.approx(c[50.5])
+
+def test_decimate_linear_tolerance():
+    random.seed(0)
+    c = Curve({t:math.sin(t/10) + random.uniform(-0.01, 0.01) for t in range(500)}, default_interpolation='linear')
+    tol = 0.05
+    c2, err = decimate(c, tolerance=tol)
+    assert len(c2.keyframes) < len(c.keyframes) / 5
+    assert err <= tol
+    actual = max(abs(c2[t/4] - c[t/4]) for t in range(4*499))
+    assert actual <= err + 1e-9
+
+def test_decimate_steps():
+    c = Curve({0:0, 1:0.01, 2:-0.01, 3:1, 4:1.02, 5:2})
+    c2, err = decimate(c, tolerance=0.05)
+    assert list(c2.keyframes) == [0, 3, 5]
+    assert err == pytest.approx(0.02)
+    c3, err = decimate(c, tolerance=0)
+    assert list(c3.keyframes) == list(c.keyframes)
+    assert err == 0
+
+def test_decimate_leaves_other_methods_alone():
+    c = Curve((
+        (0,0,'linear'), (1,1), (2,2),
+        (3,3,'eased_lerp'), (4,3), (5,3),
+        (6,3,'previous'), (7,3), (8,3),
+    ))
+    c2, err = decimate(c)
+    assert list(c2.keyframes) == [0, 3, 4, 5, 6, 8]
+    for i in range(17):
+        assert c2[i/2] == pytest.approx(c[i/2])
+
+def test_decimate_returns_copy():
+    c = Curve({0:0, 1:0, 2:0}, loop=True, label='foo')
+    c2, _ = decimate(c)
+    assert c2.loop
+    assert c2.label == 'foo'
+    c2[1] = 5
+    assert c[1] == 0
+
+
+def test_bake_frames():
+    a = Curve({0:0, 10:10}, default_interpolation='linear')
+    f = Curve.from_function(lambda k: k**2)
+    comp = a + f
+    baked, err = bake(comp, frames=range(11))
+    assert err == 0
+    assert isinstance(baked, Curve)
+    assert list(baked.keyframes) == list(range(11))
+    for i in range(11):
+        assert baked[i] == comp[i]
+
+def test_bake_frames_not_starting_at_zero():
+    comp = Curve({0:5, 20:25}, default_interpolation='linear') * 1
+    baked, err = bake(comp, frames=range(10, 21))
+    assert err == 0
+    assert list(baked.keyframes) == [0] + list(range(10, 21))
+    assert baked[0] == 5
+    assert baked[5] == pytest.approx(comp[5])
+    for i in range(10, 21):
+        assert baked[i] == comp[i]
+
+def test_bake_default_frames_and_decimate():
+    comp = Curve({0:0, 20:20}, default_interpolation='linear') * 2
+    baked, err = bake(comp, tolerance=1e-9, frames=range(21))
+    assert list(baked.keyframes) == [0, 20]
+    assert baked[7.5] == pytest.approx(15)
+    baked, _ = bake(comp)
+    assert len(baked.keyframes) == 21
+
+def test_bake_adaptive():
+    wave = Curve.from_function(lambda k: math.sin(k / 5))
+    ramp = Curve({0:0, 30:3, 60:0}, default_interpolation='linear')
+    comp = wave + ramp
+    tol = 1e-3
+    baked, err = bake(comp, tolerance=tol)
+    assert err <= tol
+    assert 0 in baked.keyframes and 30 in baked.keyframes and 60 in baked.keyframes
+    assert len(baked.keyframes) < 200
+    actual = max(abs(baked[t/7] - comp[t/7]) for t in range(7*60))
+    assert actual < 2 * tol
+
+def test_bake_adaptive_keeps_steps_sharp():
+    steps = Curve({0:0, 10:5, 20:2})
+    comp = steps + Curve({0:1, 20:1})
+    baked, err = bake(comp, tolerance=1e-6)
+    assert err == 0
+    assert list(baked.keyframes) == [0, 10, 20]
+    for t in range(41):
+        assert baked[t/2] == comp[t/2]
+
+def test_bake_pgroup():
+    pg = ParameterGroup({
+        'a':Curve({0:0, 10:10}, default_interpolation='linear'),
+        'b':Curve.from_function(lambda k: 2*k),
+    })
+    baked, err = bake(pg, frames=range(11))
+    assert isinstance(baked, ParameterGroup)
+    assert set(baked.parameters) == {'a', 'b'}
+    for i in range(11):
+        assert baked[i] == pg[i]
@@ -0,0 +1,80 @@
+import pickle
+
+from keyframed import Curve, ParameterGroup, simplify
+
+
+def test_curve_duration_is_last_keyframe():
+    c = Curve({0:0, 5:1, 3:2})
+    assert c.duration == 5
+    c[9] = 1
+    assert c.duration == 9
+    assert Curve({0:0, 5:1}, duration=20).duration == 20
+
+def test_group_duration_follows_child_edits():
+    a, b = Curve({0:0, 5:1}), Curve({0:0, 3:1})
+    pg = ParameterGroup({'a':a, 'b':b})
+    assert pg.duration == 5
+    # parameters are shared by reference, so edits to the originals reach the group
+    pg.parameters['b'][10] = 2
+    assert pg.duration == 10
+    with pg.parameters['a'].edit() as draft:
+        draft[20] = 0
+    assert pg.duration == 20
+    pg.parameters['a'].append(Curve({0:1, 4:2}))
+    assert pg.duration == 25
+
+def test_group_duration_follows_simplify():
+    c = Curve({0:1, 5:1, 10:1})
+    pg = ParameterGroup({'c':c})
+    assert pg.duration == 10
+    simplify(pg.parameters['c'])
+    assert pg.duration == 10
+
+def test_group_duration_follows_parameter_changes():
+    pg = ParameterGroup({'a':Curve({0:0, 5:1})})
+    assert pg.duration == 5
+    pg.parameters['a'] = Curve({0:0, 7:1})
+    assert pg.duration == 7
+    pg.parameters['b'] = Curve({0:0, 9:1})
+    assert pg.duration == 9
+
+def test_nested_group_duration():
+    inner = ParameterGroup({'a':Curve({0:0, 5:1})})
+    outer = ParameterGroup({'inner':inner, 'b':Curve({0:0, 2:1})})
+    assert outer.duration == 5
+    inner.parameters['a'][12] = 3
+    assert outer.duration == 12
+
+def test_nested_group_duration_follows_replaced_curves():
+    inner = ParameterGroup({'x':Curve({0:0, 5:1})})
+    outer = ParameterGroup({'inner':inner, 'b':Curve({0:0, 10:1})})
+    assert outer.duration == 10
+    inner.parameters['x'] = Curve({0:0, 100:1})
+    assert inner.duration == 100
+    assert outer.duration == 100
+
+def test_group_cache_survives_unrelated_edits():
+    pg = ParameterGroup({'a':Curve({0:0, 5:1})})
+    assert pg.duration == 5
+    stamp = pg._bounds_cache[0]
+    other = Curve({0:0})
+    other[3] = 1
+    assert pg.duration == 5
+    assert pg._bounds_cache[0] is stamp
+
+def test_looping_group_lookup():
+    pg = ParameterGroup({'a':Curve({0:0, 4:4}, default_interpolation='linear'), 'b':Curve({0:1, 2:3})}, loop=True)
+    assert pg[6] == pg[1]
+    pg.parameters['a'][6] = 6
+    assert pg[8] == pg[1]
+
+def test_group_copies_and_pickles():
+    pg = ParameterGroup({'a':Curve({0:0, 5:1})})
+    assert pg.duration == 5
+    pg2 = pickle.loads(pickle.dumps(pg))
+    pg2.parameters['a'][8] = 0
+    assert pg2.duration == 8
+    pg3 = pg.copy()
+    pg3.parameters['a'][9] = 0
+    assert pg3.duration == 9
+    assert pg.duration == 5
@@ -0,0 +1,143 @@
+import math
+
+import pytest
+
+from keyframed import Curve, DerivativeCurve, IntegralCurve, bake
+
+
+def brute(curve, t0, t1, n=20000):
+    # midpoint rule
+    h = (t1 - t0) / n
+    return h * sum(curve[t0 + (i + 0.5)*h] for i in range(n))
+
+@pytest.mark.parametrize('method', ['previous', 'next', 'linear', 'eased_lerp', 'sin', 'sin^2'])
+def test_integral_matches_brute_force(method):
+    c = Curve({0:1, 3:4, 7:-2, 10:5}, default_interpolation=method)
+    I = c.integral()
+    assert isinstance(I, IntegralCurve)
+    for t in (0, 1.5, 3, 5.25, 9.9, 12):
+        # the midpoint rule is off by up to h*jump wherever the curve steps
+        assert I[t] == pytest.approx(brute(c, 0, t), abs=1e-2)
+
+def test_integral_step_exact():
+    c = Curve({0:2, 4:-1})
+    I = c.integral()
+    assert I[3] == 6
+    assert I[10] == 8 - 6
+
+def test_integral_exp_decay_and_sine_wave():
+    c = Curve(((0, 2, 'exp_decay', {'decay_rate':0.5}), (4, 1, 'sine_wave', {'wavelength':3}), (8, 0)))
+    I = c.integral()
+    for t in (2, 4, 6.5, 8, 11):
+        assert I[t] == pytest.approx(brute(c, 0, t), abs=1e-3)
+
+def test_integral_from_function_falls_back_to_quadrature():
+    c = Curve.from_function(lambda k: k*k)
+    I = c.integral()
+    assert I[3] == pytest.approx(9)
+
+def test_integral_long_function_span():
+    calls = []
+    def f(k):
+        calls.append(k)
+        return math.sin(k)
+    I = Curve.from_function(f).integral()
+    assert I[200] == pytest.approx(1 - math.cos(200), abs=1e-8)
+    assert I[1000] == pytest.approx(1 - math.cos(1000), abs=1e-8)
+    # the running totals are kept, so only the last partial piece is integrated again
+    n = len(calls)
+    assert I[999.5] == pytest.approx(1 - math.cos(999.5), abs=1e-8)
+    assert len(calls) - n < 100
+
+def test_definite():
+    c = Curve({0:0, 10:10}, default_interpolation='linear')
+    assert c.integral().definite(2, 4) == pytest.approx(6)
+
+def test_integral_loop():
+    c = Curve({0:1, 2:3}, loop=True, default_interpolation='linear')
+    I = c.integral()
+    for t in (2.5, 3, 7.25, 20):
+        assert I[t] == pytest.approx(brute(c, 0, t), abs=1e-3)
+
+def test_integral_bounce():
+    c = Curve({0:0, 4:4}, bounce=True, default_interpolation='linear')
+    I = c.integral()
+    for t in (3, 5.5, 9, 17.5):
+        assert I[t] == pytest.approx(brute(c, 0, t), abs=1e-3)
+
+def test_integral_tracks_edits():
+    c = Curve({0:1})
+    I = c.integral()
+    assert I[10] == 10
+    c[5] = 3
+    assert I[10] == 5 + 15
+    with c.edit() as draft:
+        draft[5] = 0
+    assert I[10] == 5
+
+def test_integral_to_dict_suggests_bake():
+    c = Curve({0:1, 10:2}, default_interpolation='linear')
+    with pytest.raises(TypeError, match="can't be serialized.*bake"):
+        c.integral().to_dict()
+    baked, err = bake(c.integral(), tolerance=1e-3)
+    assert baked[5] == pytest.approx(c.integral()[5], abs=1e-3)
+    assert baked.to_dict()
+
+
+def diff(curve, t, h=1e-6):
+    return (curve[t+h] - curve[t-h]) / (2*h)
+
+@pytest.mark.parametrize('method', ['previous', 'next', 'linear', 'eased_lerp', 'sin', 'sin^2'])
+def test_derivative_matches_differencing(method):
+    c = Curve({0:1, 3:4, 7:-2, 10:5}, default_interpolation=method)
+    d = c.derivative()
+    assert isinstance(d, DerivativeCurve)
+    ks = [0.5, 1.5, 4.25, 6.9, 8, 12]
+    expected = [diff(c, t) for t in ks]
+    assert [d[t] for t in ks] == pytest.approx(expected, abs=1e-4)
+    assert d.evaluate(ks) == pytest.approx(expected, abs=1e-4)
+
+def test_derivative_exp_decay_and_sine_wave():
+    c = Curve(((0, 2, 'exp_decay', {'decay_rate':0.5}), (4, 1, 'sine_wave', {'wavelength':3}), (8, 0)))
+    d = c.derivative()
+    ks = [1, 3.5, 5, 7.75, 9]
+    expected = [diff(c, t) for t in ks]
+    assert [d[t] for t in ks] == pytest.approx(expected, abs=1e-4)
+    assert d.evaluate(ks) == pytest.approx(expected, abs=1e-4)
+
+def test_derivative_at_keyframe_is_one_sided():
+    c = Curve({0:0, 2:4, 4:0}, default_interpolation='linear')
+    d = c.derivative()
+    assert d[2] == pytest.approx(-2)
+    assert d.evaluate([0, 2]) == pytest.approx([2, -2])
+
+def test_derivative_from_function_is_numeric():
+    c = Curve.from_function(lambda k: k*k)
+    d = c.derivative()
+    assert d[3] == pytest.approx(6, abs=1e-4)
+    assert d.evaluate([0, 3]) == pytest.approx([0, 6], abs=1e-4)
+
+def test_derivative_loop_and_bounce():
+    c = Curve({0:0, 4:4}, loop=True, default_interpolation='linear')
+    ks = [1, 4.5, 6, 9.5]
+    assert c.derivative().evaluate(ks) == pytest.approx([diff(c, t) for t in ks], abs=1e-4)
+    c = Curve({0:0, 4:4}, bounce=True, default_interpolation='linear')
+    ks = [1, 5.5, 6, 9.5]
+    expected = [diff(c, t) for t in ks]
+    assert expected[1] < 0
+    assert [c.derivative()[t] for t in ks] == pytest.approx(expected, abs=1e-4)
+    assert c.derivative().evaluate(ks) == pytest.approx(expected, abs=1e-4)
+
+def test_derivative_tracks_edits():
+    c = Curve({0:0, 10:10}, default_interpolation='linear')
+    d = c.derivative()
+    assert d[5] == pytest.approx(1)
+    c[10] = 20
+    assert d[5] == pytest.approx(2)
+
+def test_derivative_vector_values():
+    np = pytest.importorskip('numpy')
+    c = Curve({0:np.array([0., 1.]), 2:np.array([4., 1.])}, default_interpolation='linear')
+    d = c.derivative()
+    assert np.allclose(d[1], [2, 0])
+    assert np.allclose(d.evaluate([1])[0], [2, 0])
@@ -0,0 +1,54 @@
+import pytest
+
+from keyframed import Curve, Composition
+from keyframed.serialization import from_dict
+
+
+def test_scalar_chain_folds():
+    c = Curve({0:0, 10:10}, default_interpolation='linear', label='c')
+    comp = c * 2 + 1 - 0.5
+    # (c * 2) + constant, with 1 and -0.5 folded into one constant
+    assert len(comp.parameters) == 2
+    inner = [p for p in comp.parameters.values() if isinstance(p, Composition)][0]
+    assert len(inner.parameters) == 2
+    for k in range(11):
+        assert comp[k] == pytest.approx(2*k + 0.5)
+
+def test_scalar_products_fold():
+    c = Curve({0:1, 10:2}, default_interpolation='linear', label='c')
+    comp = c * 2 * 3 * 0.5
+    assert len(comp.parameters) == 2
+    for k in range(11):
+        assert comp[k] == pytest.approx(3 * c[k])
+
+def test_user_curves_not_folded():
+    c = Curve({0:0, 10:10}, default_interpolation='linear', label='c')
+    k = Curve(1, label='k')
+    comp = c + k
+    comp2 = comp + 2
+    assert len(comp2.parameters) == 3
+    assert k[0] == 1
+    assert comp2[5] == 8
+
+def test_folded_round_trip():
+    c = Curve({0:0, 10:10}, default_interpolation='linear', label='c')
+    comp = c + 1 + 2
+    comp2 = from_dict(comp.to_dict(simplify=False, for_yaml=True))
+    for k in range(11):
+        assert comp2[k] == comp[k] == k + 3
+
+def test_constant_curve_lookup():
+    c = Curve(5)
+    assert c[0] == 5
+    assert c[123.4] == 5
+    assert Curve(5, loop=True)[17] == 5
+    f = Curve.from_function(lambda k: 2*k)
+    assert f[3] == 6
+
+def test_weighted_composition():
+    a = Curve({0:1}, label='a')
+    comp = Composition({'a':a, 'b':Curve({0:2}, label='b')}, reduction='add', weight=Curve({0:1, 5:2}))
+    assert comp[0] == 3
+    assert comp[5] == 6
+    comp = Composition({'a':a}, reduction='add', weight=Curve(1, default_interpolation='linear'))
+    assert comp[3] == 1
@@ -0,0 +1,275 @@
+import json
+import math
+import pickle
+
+import pytest
+
+from keyframed import Curve, ParameterGroup, SmoothCurve
+from keyframed.dsl import (
+    Expression,
+    clear_parse_cache,
+    compile_expression,
+    curve_from_cn_string,
+    curve_to_cn_string,
+    deforum_parse,
+    disable_parse_cache,
+    enable_parse_cache,
+    parameter_group_from_deforum_settings,
+    parse_cache_info,
+)
+
+
+def test_deforum_parse():
+    assert deforum_parse("0:(1), 10:(2)") == {0:'1', 10:'2'}
+
+def test_numeric_schedule():
+    c = curve_from_cn_string("0:(0), 10:(1)")
+    assert c[0] == 0
+    assert c[5] == 0.5
+    assert c[20] == 1
+
+def test_expression_schedule():
+    c = curve_from_cn_string("0:(1 + 0.5*sin(2*3.14*t/24))")
+    for t in range(48):
+        assert math.isclose(c[t], 1 + 0.5*math.sin(2*3.14*t/24))
+
+def test_mixed_schedule():
+    c = curve_from_cn_string("0:(0), 10:(t/10), 20:(5)")
+    assert c[5] == 0.5
+    assert c[10] == 1
+    assert c[15] == 1.5
+    assert c[20] == 5
+
+def test_vectorized_evaluate():
+    pytest.importorskip('numpy')
+    c = curve_from_cn_string("0:(0), 10:(cos(t/5) * pi), 30:(2)")
+    ks = [i/4 for i in range(160)]
+    for k, v in zip(ks, c.evaluate(ks)):
+        assert math.isclose(v, c[k], abs_tol=1e-12)
+
+def test_expression_evaluate_constant():
+    assert Expression("2*pi").evaluate([0, 1, 2]) == [2*math.pi]*3
+
+def test_expression_variables():
+    f = compile_expression("t / max_f", variables={'max_f':100})
+    assert f(50) == 0.5
+
+@pytest.mark.parametrize('source', [
+    "__import__('os')",
+    "t.__class__",
+    "open('x')",
+    "[t for t in range(3)]",
+    "'abc'",
+    "lambda: 1",
+    "sin(x=t)",
+    "foo",
+    "2j * t",
+])
+def test_expression_whitelist(source):
+    with pytest.raises((ValueError, SyntaxError)):
+        Expression(source)
+
+def test_expression_power_overflows():
+    e = Expression("9**9**9")
+    with pytest.raises(OverflowError):
+        e(0)
+    with pytest.raises(OverflowError):
+        e.evaluate([0, 1])
+    assert Expression("t**2")(3) == 9
+
+@pytest.mark.parametrize('source, error', [
+    ("sqrt(t - 10)", ValueError),
+    ("log(t - 5)", ValueError),
+    ("(t - 10) ** 0.5", ValueError),
+    ("1 / (t - 5)", ZeroDivisionError),
+    ("exp(t * 1000)", OverflowError),
+])
+def test_expression_errors_match_between_paths(source, error):
+    pytest.importorskip('numpy')
+    e = Expression(source)
+    with pytest.raises(error):
+        e(5)
+    with pytest.raises(error):
+        e.evaluate([20, 5])
+
+def test_expression_pickles():
+    c = curve_from_cn_string("0:(sin(t))")
+    c2 = pickle.loads(pickle.dumps(c))
+    assert c2[3] == c[3]
+
+def test_to_cn_string_linear():
+    c = Curve({0:0, 10:1.5, 20:-2}, default_interpolation='linear')
+    assert curve_to_cn_string(c) == "0:(0), 10:(1.5), 20:(-2)"
+
+def test_to_cn_string_step():
+    c = Curve({0:1, 10:2, 11:5})
+    txt = curve_to_cn_string(c)
+    assert txt == "0:(1), 9:(1), 10:(2), 11:(5)"
+    c2 = curve_from_cn_string(txt)
+    for t in range(15):
+        assert c2[t] == c[t]
+
+def test_to_cn_string_resampled_roundtrip():
+    c = SmoothCurve({0:0, 20:1, 40:0})
+    txt = curve_to_cn_string(c, tolerance=1e-3)
+    c2 = curve_from_cn_string(txt)
+    assert len(c2._data) < 41
+    for t in range(41):
+        assert abs(c2[t] - c[t]) <= 1e-3 + 1e-12
+
+def test_to_cn_string_exact_resample_drops_collinear():
+    c = Curve.from_function(lambda k: 2*k)
+    assert curve_to_cn_string(c, frames=range(11)) == "0:(0), 10:(20)"
+
+def test_to_cn_string_composition():
+    comp = Curve({0:0, 10:10}, default_interpolation='linear') + Curve({0:1, 5:2})
+    txt = curve_to_cn_string(comp)
+    c2 = curve_from_cn_string(txt)
+    for t in range(11):
+        assert c2[t] == pytest.approx(comp[t])
+
+def test_cn_string_roundtrip_expression():
+    c = curve_from_cn_string("0:(sin(t/5))")
+    txt = curve_to_cn_string(c, frames=range(50), tolerance=0.01)
+    c2 = curve_from_cn_string(txt)
+    for t in range(50):
+        assert abs(c2[t] - c[t]) <= 0.01 + 1e-12
+
+SETTINGS = {
+    "animation_mode": "2D",
+    "max_frames": 100,
+    "zoom": "0: (1.04)",
+    "angle": "0:(0), 50:(10)",
+    "translation_x": "0:(10*sin(2*3.14*t/10))",
+    "prompts": {"0": "a cat"},
+}
+
+def test_settings_to_pgroup():
+    pg = parameter_group_from_deforum_settings(SETTINGS)
+    assert isinstance(pg, ParameterGroup)
+    assert set(pg.parameters) == {'zoom', 'angle', 'translation_x'}
+    assert pg[25]['zoom'] == 1.04
+    assert pg[25]['angle'] == 5
+    assert math.isclose(pg[3]['translation_x'], 10*math.sin(2*3.14*3/10))
+
+def test_settings_from_json_and_keys():
+    pg = parameter_group_from_deforum_settings(json.dumps(SETTINGS), keys=['zoom'])
+    assert list(pg.parameters) == ['zoom']
+
+def test_settings_errors_reported_per_schedule():
+    settings = dict(SETTINGS, strength="0:(0.65)", seed_schedule="0:(s), 1:(-1)", bad="0:(import os)")
+    with pytest.raises(ValueError) as e:
+        parameter_group_from_deforum_settings(settings, errors='raise')
+    assert 'seed_schedule' in str(e.value)
+    assert 'bad' in str(e.value)
+    assert 'zoom' not in str(e.value)
+
+    with pytest.warns(UserWarning):
+        pg = parameter_group_from_deforum_settings(settings)
+    assert 'strength' in pg.parameters
+    assert 'seed_schedule' not in pg.parameters
+
+    settings.pop('bad')
+    pg = parameter_group_from_deforum_settings(settings, variables={'s':42}, errors='raise')
+    assert pg[0]['seed_schedule'] == 42
+
+# abridged from a settings file saved by the Deforum webui extension
+DEFORUM_SETTINGS = {
+    "W": 512,
+    "H": 512,
+    "seed": 2662314950,
+    "sampler": "euler_ancestral",
+    "steps": 25,
+    "prompts": {"0": "a beautiful lake by Asher Brown Durand, trending on Artstation", "100": "a beautiful portrait"},
+    "animation_mode": "3D",
+    "max_frames": 120,
+    "border": "replicate",
+    "angle": "0:(0)",
+    "zoom": "0:(1.0025+0.002*sin(1.25*3.14*t/30))",
+    "translation_x": "0:(0)",
+    "translation_z": "0:(1.75)",
+    "rotation_3d_y": "0:(0), 60:(2.5), 120:(0)",
+    "noise_schedule": "0: (0.065)",
+    "strength_schedule": "0: (0.65)",
+    "contrast_schedule": "0: (1.0)",
+    "cfg_scale_schedule": "0: (7)",
+    "fov_schedule": "0: (70)",
+    "seed_schedule": '0:(s), 1:(-1), "max_f-2":(-1), "max_f-1":(s)',
+    "enable_sampler_scheduling": False,
+    "sampler_schedule": '0: ("Euler a")',
+    "use_noise_mask": False,
+    "mask_schedule": '0: ("{video_mask}")',
+    "noise_mask_schedule": '0: ("{video_mask}")',
+    "kernel_schedule": "0: (5)",
+    "sigma_schedule": "0: (1.0)",
+    "diffusion_cadence": "2",
+    "outdir": "/content/drive/MyDrive/AI/StableDiffusion/2023-03",
+}
+
+def test_full_deforum_settings_file():
+    with pytest.warns(UserWarning, match='seed_schedule'):
+        pg = parameter_group_from_deforum_settings(json.dumps(DEFORUM_SETTINGS))
+    assert 'sampler_schedule' not in pg.parameters
+    assert 'mask_schedule' not in pg.parameters
+    assert 'seed_schedule' not in pg.parameters
+    assert pg[60]['rotation_3d_y'] == 2.5
+    assert pg[10]['strength_schedule'] == 0.65
+    assert len(pg.parameters) == 12
+
+    pg = parameter_group_from_deforum_settings(DEFORUM_SETTINGS, variables={'s':7}, errors='raise')
+    assert pg[0]['seed_schedule'] == 7
+    assert pg[5]['seed_schedule'] == -1
+
+def test_parse_cache():
+    assert parse_cache_info() is None
+    enable_parse_cache(maxsize=2)
+    try:
+        c1 = curve_from_cn_string("0:(0), 10:(1)")
+        c2 = curve_from_cn_string("0: (0),  10: (1)")
+        assert parse_cache_info() == {'hits':1, 'misses':1, 'size':1, 'maxsize':2}
+        assert c1 is not c2
+        assert c1 == c2
+        # mutating a returned curve doesn't leak into the cache
+        c1[5] = 100
+        assert curve_from_cn_string("0:(0), 10:(1)")[5] == 0.5
+
+        curve_from_cn_string("0:(t)", variables={'a':1})
+        curve_from_cn_string("0:(t)", variables={'a':2})
+        assert parse_cache_info()['size'] == 2
+        assert parse_cache_info()['misses'] == 3
+        clear_parse_cache()
+        assert parse_cache_info()['size'] == 0
+    finally:
+        disable_parse_cache()
+
+@pytest.mark.parametrize('cn_string', [
+    "1 0:(5), 20:(7)",
+    "10:(5), 20:(7)",
+    "0 :(1), 10:(2)",
+    "0:(1) , 10:(2)",
+    " 10 : ( 5 ) ,  20:(7) ",
+    "0:   (1), 10:(2)",
+])
+def test_parse_cache_matches_uncached_parse(cn_string):
+    def parse():
+        try:
+            return curve_from_cn_string(cn_string).to_dict(simplify=False, ignore_labels=True)
+        except Exception as e:
+            return type(e)
+    expected = parse()
+    enable_parse_cache()
+    try:
+        # a miss, then a hit
+        assert parse() == expected
+        assert parse() == expected
+    finally:
+        disable_parse_cache()
+
+def test_parse_cache_shares_ignored_whitespace():
+    enable_parse_cache()
+    try:
+        curve_from_cn_string("0:(0), 10:(1)")
+        curve_from_cn_string("0:  (0),10:(1)")
+        assert parse_cache_info()['hits'] == 1
+    finally:
+        disable_parse_cache()
@@ -0,0 +1,47 @@
+from keyframed import Curve, ParameterGroup, Composition
+from keyframed.dsl import curve_from_cn_string
+
+
+def test_explain_curve():
+    c = Curve(((0,0,'linear'), (5,1,'eased_lerp'), (10,0)), label='c')
+    r = c.explain()
+    assert r['nodes'] == 1
+    assert r['depth'] == 1
+    assert r['methods'] == {'linear':1, 'eased_lerp':2}
+    assert r['leaves'][0]['keyframes'] == 3
+    assert r['leaves'][0]['vectorizable'] is None
+    assert r['cost_per_frame'] > 0
+    assert not r['opaque']
+
+def test_explain_vectorizable():
+    c = Curve({0:0, 5:1}, default_interpolation='linear')
+    assert c.explain()['leaves'][0]['vectorizable'] == 'numpy'
+    e = curve_from_cn_string("0:(sin(t)), 10:(1)")
+    r = e.explain()
+    assert not r['opaque']
+
+def test_explain_tree():
+    a = Curve({0:0, 10:10}, default_interpolation='linear', label='a')
+    b = Curve({0:1, 10:1}, label='b')
+    f = Curve.from_function(lambda k: k**2)
+    inner = Composition({'a':a, 'b':b}, reduction='add')
+    comp = Composition({'inner':inner, 'f':f, 'again':a}, reduction='multiply', weight=Curve({0:1, 5:2}))
+    r = comp.explain()
+    assert r['depth'] == 3
+    # comp, inner, a, b, f, again, weight
+    assert r['nodes'] == 7
+    assert len(r['leaves']) == 5
+    assert len(r['opaque']) == 1
+    assert r['opaque'][0][1].startswith('from_function')
+    assert r['weights'] == [comp.label]
+    paths = [sorted(p.split('/')[-1] for p in paths) for paths in r['duplicates']]
+    assert ['a', 'again'] in paths
+    leaf_costs = sum(leaf['cost_per_frame'] for leaf in r['leaves'])
+    assert r['cost_per_frame'] >= leaf_costs
+    assert 'opaque callables' in str(r)
+
+def test_explain_duplicate_content():
+    pg = ParameterGroup({'x':Curve({0:0, 1:1}), 'y':Curve({0:0, 1:1}), 'z':Curve({0:2})})
+    r = pg.explain()
+    assert [sorted(p.split('/')[-1] for p in paths) for paths in r['duplicates']] == [['x', 'y']]
+    assert r['weights'] == []
@@ -0,0 +1,82 @@
+import pytest
+
+import keyframed
+from keyframed import Curve, ParameterGroup, Composition
+
+
+@pytest.fixture
+def instrumented():
+    keyframed.reset_stats()
+    keyframed.enable_instrumentation()
+    yield
+    keyframed.disable_instrumentation()
+    keyframed.reset_stats()
+
+def test_enable_disable_restores_methods():
+    original = Curve.__dict__['__getitem__']
+    keyframed.enable_instrumentation()
+    assert Curve.__dict__['__getitem__'] is not original
+    keyframed.disable_instrumentation()
+    assert Curve.__dict__['__getitem__'] is original
+    assert Composition.__dict__['__getitem__'] is not Curve.__dict__['__getitem__']
+
+def test_counts_per_label(instrumented):
+    a = Curve({0:0, 10:10}, default_interpolation='linear', label='a')
+    b = Curve({0:1}, label='b')
+    for i in range(5):
+        a[i]
+    b[3]
+    s = keyframed.stats()
+    assert s['calls']['a'] == 5
+    assert s['calls']['b'] == 1
+
+def test_interpolation_timing(instrumented):
+    c = Curve(((0,0,'linear'), (10,10,'eased_lerp'), (20,0)), label='c')
+    c[0]; c[5]; c[6]; c[15]
+    s = keyframed.stats()['interpolation']
+    assert s['keyframe']['count'] == 1
+    assert s['linear']['count'] == 2
+    assert s['eased_lerp']['count'] == 1
+    assert s['linear']['total'] > 0
+    assert sum(s['linear']['buckets'].values()) == 2
+
+def test_callable_interpolator_named(instrumented):
+    def wobble(k, curve):
+        return k
+    c = Curve(((0,0,wobble), (10,1)))
+    assert c[3] == 3
+    assert keyframed.stats()['interpolation']['wobble']['count'] == 1
+
+def test_lookups_behave_the_same(instrumented):
+    assert Curve(5)[-1] == 5
+    looped = Curve({0:0, 4:4}, default_interpolation='linear', loop=True)
+    assert looped[6.5] == 1.5
+    with pytest.raises(ValueError):
+        Curve(((0,0,'no_such_method'), (5,1)))[2]
+    s = keyframed.stats()['interpolation']
+    assert s['previous']['count'] == 1
+    assert s['linear']['count'] == 1
+    assert s['no_such_method']['count'] == 1
+
+def test_composition_reduction(instrumented):
+    a = Curve({0:1}, label='a')
+    b = Curve({0:2}, label='b')
+    comp = Composition({'a':a, 'b':b}, reduction='multiply')
+    assert comp[0] == 2
+    s = keyframed.stats()
+    assert s['reduction']['multiply']['count'] == 1
+    assert s['calls'][comp.label] == 1
+    assert s['calls']['a'] == 1
+
+def test_pgroup_and_reset(instrumented):
+    pg = ParameterGroup({'x':Curve({0:0}), 'y':Curve({0:1})}, label='pg')
+    assert pg[0] == {'x':0, 'y':1}
+    s = keyframed.stats()
+    assert s['calls']['pg'] == 1
+    assert s['calls']['x'] == 1
+    keyframed.reset_stats()
+    assert keyframed.stats()['calls'] == {}
+
+def test_slicing_still_works(instrumented):
+    c = Curve({0:0, 10:10}, default_interpolation='linear')
+    assert c[2:4][0] == 2
@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from keyframed import Curve, SmoothCurve, ParameterGroup, MappedCurve, save_curve, open_curve
+
+
+def test_mapped_matches_curve(tmp_path):
+    c = Curve({0:0, 3:3, 7:-1, 10:5}, default_interpolation='linear', label='foo')
+    c[5] = 2
+    c._data[5].interpolation_method = 'eased_lerp'
+    path = tmp_path / 'foo.kfc'
+    save_curve(c, path)
+    with open_curve(path) as m:
+        assert m.label == 'foo'
+        assert list(m.keyframes) == list(c.keyframes)
+        assert m.duration == c.duration
+        for i in range(30):
+            assert m[i/2] == c[i/2]
+        assert m.evaluate([0, 1.5, 4, 12]) == [c[0], c[1.5], c[4], c[12]]
+
+def test_mapped_interpolator_args(tmp_path):
+    c = Curve({0:1, 4:2}, default_interpolation='exp_decay', default_interpolator_args={'decay_rate':0.5}, loop=True)
+    path = tmp_path / 'decay.kfc'
+    save_curve(c, path)
+    m = open_curve(path)
+    assert m.loop
+    for i in range(20):
+        assert m[i] == c[i]
+    m.close()
+
+def test_mapped_vectorized_evaluate(tmp_path):
+    np = pytest.importorskip('numpy')
+    c = Curve({0:1, 2:4, 5:2, 9:9}, default_interpolation='linear')
+    c[6] = 3
+    c._data[6].interpolation_method = 'previous'
+    path = tmp_path / 'vec.kfc'
+    save_curve(c, path)
+    m = open_curve(path)
+    ks = np.linspace(0, 12, 97)
+    assert m.evaluate(ks) == [c[k] for k in ks]
+
+def test_mapped_is_read_only(tmp_path):
+    path = tmp_path / 'ro.kfc'
+    save_curve(Curve({0:1, 2:2}), path)
+    m = open_curve(path)
+    with pytest.raises(TypeError):
+        m[1] = 5
+    c = m.copy()
+    c[1] = 5
+    assert c[1] == 5
+    assert m[1] == 1
+
+def test_mapped_pickles_by_path(tmp_path):
+    path = tmp_path / 'p.kfc'
+    save_curve(Curve({0:1, 100:2}, default_interpolation='linear'), path)
+    m = open_curve(path, label='bar')
+    payload = pickle.dumps(m)
+    assert len(payload) < 200
+    m2 = pickle.loads(payload)
+    assert m2.label == 'bar'
+    assert m2[50] == m[50]
+
+def test_mapped_in_pgroup(tmp_path):
+    path = tmp_path / 's.kfc'
+    c = SmoothCurve({0:0, 10:1})
+    save_curve(c, path)
+    pg = ParameterGroup({'a':open_curve(path), 'b':Curve(2)})
+    pg2 = pg * 2
+    for i in range(12):
+        assert pg2[i]['a'] == 2 * c[i]
+
+def test_callable_interpolation_rejected(tmp_path):
+    c = Curve.from_function(lambda k: k)
+    with pytest.raises(TypeError):
+        save_curve(c, tmp_path / 'f.kfc')
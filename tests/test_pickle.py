@@ -0,0 +1,66 @@
+import math
+import pickle
+
+from keyframed import Curve, SmoothCurve, ParameterGroup, Composition, SinusoidalCurve, HawkesProcessIntensity
+
+
+def roundtrip(obj):
+    return pickle.loads(pickle.dumps(obj))
+
+def square(k):
+    return k**2
+
+def test_pickle_curve():
+    c = Curve({0:0, 1:1.5, 5:2, 9:-3}, default_interpolation='linear', loop=True, label='foo')
+    c[3] = 7
+    c2 = roundtrip(c)
+    assert c2 == c
+    assert c2.label == 'foo'
+    assert c2.loop
+    assert list(c2.keyframes) == list(c.keyframes)
+    assert all(type(t) is int for t in c2.keyframes)
+    for i in range(20):
+        assert c2[i/2] == c[i/2]
+
+def test_pickle_mixed_interpolation_and_args():
+    c = Curve(((0,1,'exp_decay',{'decay_rate':0.1}), (4,2,'linear'), (6,3,'eased_lerp'), (9,1)))
+    c2 = roundtrip(c)
+    assert c2 == c
+    assert c2._data[0].interpolator_arguments == {'decay_rate':0.1}
+    for i in range(20):
+        assert c2[i/2] == c[i/2]
+
+def test_pickle_keyframes_dont_share_arguments():
+    c = Curve({0:1, 3:2, 6:3}, default_interpolation='exp_decay', default_interpolator_args={'decay_rate':0.1})
+    c2 = roundtrip(c)
+    c2._data[0].interpolator_arguments['decay_rate'] = 5
+    assert c2._data[3].interpolator_arguments == {'decay_rate':0.1}
+    assert c2[4] == c[4]
+
+def test_pickle_from_function():
+    c = Curve.from_function(square)
+    c2 = roundtrip(c)
+    assert c2[3] == 9
+    assert c2 == c
+
+def test_pickle_subclasses():
+    s = SinusoidalCurve(wavelength=10)
+    s2 = roundtrip(s)
+    assert s2.wavelength == 10
+    assert s2[3] == s[3]
+    h = HawkesProcessIntensity(decay=0.5, events=[1, 3])
+    h2 = roundtrip(h)
+    assert h2[4] == h[4]
+
+def test_pickle_composition():
+    c1 = SmoothCurve({0:0, 10:1}, label='a')
+    c2 = Curve({0:2, 5:3}, label='b')
+    comp = Composition({'a':c1, 'b':c2}, reduction='multiply')
+    pg = ParameterGroup({'comp':comp + 1, 'b':c2})
+    pg2 = roundtrip(pg)
+    for i in range(12):
+        assert pg2[i] == pg[i]
+
+def test_pickle_smaller_than_sorteddict():
+    c = Curve({i:math.sin(i) for i in range(1000)}, default_interpolation='linear')
+    assert len(pickle.dumps(c)) < 0.6 * len(pickle.dumps(c._data))
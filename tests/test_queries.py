@@ -0,0 +1,174 @@
+import math
+
+import pytest
+
+from keyframed import Curve, InverseCurve
+
+
+def test_crossings_linear():
+    c = Curve({0:0, 10:10, 20:0}, default_interpolation='linear')
+    assert c.crossings(2.5) == pytest.approx([2.5, 17.5])
+    assert c.crossings(2.5, 5, 20) == pytest.approx([17.5])
+    assert c.crossings(11) == []
+
+def test_crossings_step_jumps():
+    c = Curve({0:0, 3:5, 6:1})
+    assert c.crossings(2) == [3, 6]
+    assert c.crossings(5) == [3]
+    # holding the value counts once, where the hold starts
+    assert c.crossings(0) == [0]
+
+def test_crossings_eased():
+    c = Curve({0:0, 4:4, 8:0}, default_interpolation='sin^2')
+    ts = c.crossings(1)
+    assert len(ts) == 2
+    for t in ts:
+        assert c[t] == pytest.approx(1)
+
+def test_crossings_sine_wave():
+    c = Curve(((0, 0, 'sine_wave', {'wavelength':4}), (12, 0)))
+    ts = c.crossings(0.5, 0, 12)
+    assert len(ts) == 6
+    for t in ts:
+        assert c[t] == pytest.approx(0.5)
+
+def test_crossings_from_function():
+    c = Curve.from_function(math.cos)
+    assert c.crossings(0, 0, 10) == pytest.approx([math.pi/2, 3*math.pi/2, 5*math.pi/2])
+
+def test_crossings_loop_and_bounce():
+    c = Curve({0:0, 4:4}, loop=True, default_interpolation='linear')
+    # the wrap back to 0 at t=5 jumps across 2 as well
+    assert c.crossings(2, 0, 20) == pytest.approx([2, 5, 7, 10, 12, 15, 17, 20])
+    c = Curve({0:0, 4:4}, bounce=True, default_interpolation='linear')
+    ts = c.crossings(2, 0, 20)
+    assert ts == pytest.approx([2, 6, 10, 14, 18])
+    for t in ts:
+        assert c[t] == pytest.approx(2)
+
+def brute_crossings(c, value, t0, t1, n=20000):
+    """Times just after the sampled curve changes sides of `value`."""
+    xs = [t0 + (t1 - t0)*j/n for j in range(n + 1)]
+    vs = [c[x] - value for x in xs]
+    return [xs[j+1] for j in range(n) if (vs[j] < 0) != (vs[j+1] < 0) and vs[j+1] != 0]
+
+@pytest.mark.parametrize('keyframes, value, t0, t1, expected', [
+    (((0, -1, 'previous'), (4, -4, 'next'), (17, 4, 'eased_lerp'), (18, -5, 'linear')), 2.5, 18.08, 45.86, 19),
+    (((0, 0, 'previous'), (23, -2, 'previous'), (26, -5, 'sin')), -3.5, 0, None, 27),
+])
+def test_crossings_bounce_turnaround(keyframes, value, t0, t1, expected):
+    c = Curve(keyframes, bounce=True)
+    ts = c.crossings(value, t0, t1)
+    assert expected in ts
+    t1 = 2 * c.duration if t1 is None else t1
+    for t in brute_crossings(c, value, t0, t1):
+        assert min(abs(t - x) for x in ts) < 0.01
+
+def test_crossings_only_builds_segments_near_the_range():
+    c = Curve({t:(t % 7) / 7 for t in range(20000)}, default_interpolation='linear')
+    ts = c.crossings(0.55, 500, 510)
+    assert ts == pytest.approx(brute_crossings(c, 0.55, 500, 510), abs=1e-3)
+    assert len(c._segment_cache[2]) < 20
+    c[505] = 10
+    ts = c.crossings(0.55, 500, 510)
+    assert ts == pytest.approx(brute_crossings(c, 0.55, 500, 510), abs=1e-3)
+
+@pytest.mark.parametrize('method', ['previous', 'next', 'linear', 'sin', 'exp_decay'])
+def test_crossings_skips_segments_without_missing_jumps(method):
+    args = {'decay_rate':0.5} if method == 'exp_decay' else None
+    c = Curve(
+        {0:0, 3:1, 6:5, 9:6, 12:0, 15:0.5},
+        default_interpolation=method,
+        default_interpolator_args=args,
+    )
+    for value in (0.25, 3, 5.5, 0.5):
+        ts = c.crossings(value, 0, 16)
+        for t in brute_crossings(c, value, 0, 16):
+            assert min(abs(t - x) for x in ts) < 0.01
+
+def test_inverse_monotone():
+    c = Curve({0:0, 3:5, 6:7})
+    inv = c.inverse()
+    assert isinstance(inv, InverseCurve)
+    assert [inv[v] for v in (0, 2, 5, 6, 7)] == [0, 3, 3, 6, 6]
+    with pytest.raises(ValueError):
+        inv[8]
+
+def test_inverse_closed_forms():
+    inv = Curve({0:10, 5:0}, default_interpolation='linear').inverse()
+    assert inv[5] == pytest.approx(2.5)
+    c = Curve({0:0, 4:4}, default_interpolation='sin^2')
+    assert c[c.inverse()[1]] == pytest.approx(1)
+    c = Curve(((0, 8, 'exp_decay', {'decay_rate':0.5}), (10, 0)))
+    assert c.inverse()[1] == pytest.approx(math.log(8) / 0.5)
+
+def test_inverse_opaque_segments_bisect():
+    c = Curve({0:0, 10:1000}, default_interpolation=lambda k, curve: k**3)
+    assert c.inverse()[125] == pytest.approx(5)
+
+def test_inverse_rejects_non_monotone():
+    with pytest.raises(ValueError):
+        Curve({0:0, 3:5, 6:1}).inverse()
+    with pytest.raises(ValueError):
+        Curve({0:0, 3:5}, loop=True).inverse()
+
+def test_inverse_tracks_edits():
+    c = Curve({0:0, 10:10}, default_interpolation='linear')
+    inv = c.inverse()
+    assert inv[5] == pytest.approx(5)
+    c[10] = 20
+    assert inv[5] == pytest.approx(2.5)
+    c[20] = 0
+    with pytest.raises(ValueError):
+        inv[5]
+
+
+def brute_extrema(c, t0, t1, n=2000):
+    xs = [t0 + (t1 - t0)*j/n for j in range(n + 1)] + [k for k in c.keyframes if t0 <= k <= t1]
+    vs = [c[x] for x in xs]
+    return min(vs), max(vs)
+
+@pytest.mark.parametrize('method', ['previous', 'next', 'linear', 'sin^2'])
+def test_range_extrema_matches_sampling(method):
+    c = Curve({0:1, 3:-4, 7:2, 10:5, 14:0, 20:3}, default_interpolation=method)
+    for t0, t1 in [(0, 20), (1, 2), (2.5, 8), (7, 10), (3.5, 19.5)]:
+        assert c.range_extrema(t0, t1) == pytest.approx(brute_extrema(c, t0, t1), abs=1e-6)
+
+def test_range_extrema_defaults_to_whole_curve():
+    c = Curve({0:1, 3:-4, 7:2})
+    assert c.range_extrema() == (-4, 2)
+
+def test_range_extrema_sine_wave():
+    c = Curve(((0, 0, 'sine_wave', {'wavelength':4, 'amplitude':2}), (20, 0)))
+    assert c.range_extrema(0.5, 0.75) == pytest.approx(brute_extrema(c, 0.5, 0.75))
+    assert c.range_extrema(0, 10) == pytest.approx((-2, 2))
+
+def test_range_extrema_loop():
+    c = Curve({0:0, 4:4}, loop=True, default_interpolation='linear')
+    assert c.range_extrema(6, 7) == pytest.approx((1, 2))
+    assert c.range_extrema(3, 12) == pytest.approx((0, 4))
+
+def test_range_extrema_tracks_edits():
+    c = Curve({t:t % 5 for t in range(50)})
+    assert c.range_extrema(0, 49) == (0, 4)
+    c[20] = 100
+    assert c.range_extrema(0, 49) == (0, 100)
+    assert c.range_extrema(21, 49) == (0, 4)
+
+def test_downsample_minmax():
+    c = Curve({t:(t % 10) for t in range(100)}, default_interpolation='linear')
+    buckets = c.downsample_minmax(0, 99, 9)
+    assert len(buckets) == 9
+    for j, (lo, hi) in enumerate(buckets):
+        t0, t1 = j*11, (j+1)*11
+        assert (lo, hi) == pytest.approx(brute_extrema(c, t0, t1))
+
+def test_extrema_index_isnt_pickled():
+    import pickle
+    c = Curve({0:0, 5:5, 10:0}, default_interpolation='linear')
+    c.range_extrema(1, 9)
+    c2 = pickle.loads(pickle.dumps(c))
+    assert '_extrema_index' not in c2.__dict__
+    c.crossings(2)
+    assert '_segment_cache' not in pickle.loads(pickle.dumps(c)).__dict__
+    assert c2.range_extrema(1, 9) == (1, 5)
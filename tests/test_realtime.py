@@ -0,0 +1,137 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from keyframed import Curve, ParameterGroup, Scheduler
+
+
+async def collect(stream, n=None):
+    outv = []
+    async for frame, value in stream:
+        outv.append((frame, value))
+        if (n is not None) and (len(outv) >= n):
+            break
+    return outv
+
+def test_astream_stops_at_duration():
+    c = Curve({0:0, 4:4}, default_interpolation='linear')
+    outv = asyncio.run(collect(c.astream(fps=500)))
+    assert outv == [(i, i) for i in range(5)]
+
+def test_astream_start_and_end():
+    c = Curve({0:0, 10:10}, default_interpolation='linear')
+    outv = asyncio.run(collect(c.astream(fps=500, start=3, end=5)))
+    assert outv == [(3, 3), (4, 4), (5, 5)]
+
+def test_astream_loop_is_endless():
+    c = Curve({0:0, 2:2}, loop=True)
+    outv = asyncio.run(collect(c.astream(fps=500), n=8))
+    assert [f for f, _ in outv] == list(range(8))
+    assert [v for _, v in outv] == [c[f] for f in range(8)]
+
+def test_astream_pgroup():
+    pg = ParameterGroup({'a':Curve({0:0, 2:2}), 'b':Curve({0:1})})
+    outv = asyncio.run(collect(pg.astream(fps=500)))
+    assert [f for f, _ in outv] == [0, 1, 2]
+    assert outv[0][1] == {'a':0, 'b':1}
+
+class FakeClock:
+    def __init__(self, t=0):
+        self.t = t
+    def __call__(self):
+        return self.t
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    """A FakeClock that asyncio.sleep advances instead of waiting."""
+    clock = FakeClock()
+    sleep = asyncio.sleep
+    async def fake_sleep(delay, *args, **kwargs):
+        clock.t += delay
+        await sleep(0)
+    monkeypatch.setattr(asyncio, 'sleep', fake_sleep)
+    return clock
+
+def test_astream_paced(fake_time):
+    c = Curve({0:0, 5:0})
+    asyncio.run(collect(c.astream(fps=100, clock=fake_time)))
+    # 6 frames at 100fps: the last one is due 50ms in
+    assert fake_time.t == pytest.approx(0.05)
+
+def test_astream_reports_and_drops_late_frames(fake_time):
+    class Slow(Curve):
+        def __getitem__(self, k):
+            if k == 1:
+                fake_time.t += 0.05
+            return super().__getitem__(k)
+    c = Slow({0:0, 20:20}, default_interpolation='linear')
+    late = []
+    outv = asyncio.run(collect(c.astream(fps=200, on_late=lambda f, s: late.append((f, s)), drop_late=True, clock=fake_time)))
+    frames = [f for f, _ in outv]
+    # frame 1 was due by 10ms and finished at 55ms
+    assert late == [(1, pytest.approx(0.045))]
+    # frames whose slot passed while frame 1 was evaluating were skipped
+    assert 2 not in frames
+    assert frames[-1] == 20
+
+def test_astream_executor():
+    c = Curve({0:0, 3:3}, default_interpolation='linear')
+    with ThreadPoolExecutor(1) as executor:
+        outv = asyncio.run(collect(c.astream(fps=500, executor=executor)))
+    assert outv == [(i, i) for i in range(4)]
+
+def test_astream_bad_fps():
+    with pytest.raises(ValueError):
+        asyncio.run(collect(Curve().astream(fps=0)))
+
+def test_scheduler_maps_clock_to_curve_time():
+    clock = FakeClock(10)
+    c = Curve({0:0, 100:100}, default_interpolation='linear')
+    s = Scheduler(c, fps=10, clock=clock)
+    assert s.tick() == 0
+    clock.t = 10.25
+    assert s.time() == pytest.approx(2.5)
+    assert s.tick() == pytest.approx(2.5)
+    # an explicit clock reading doesn't need the clock
+    assert s.tick(11) == pytest.approx(10)
+
+def test_scheduler_sample_clock():
+    c = Curve({0:0, 100:100}, default_interpolation='linear')
+    s = Scheduler(c, fps=24, clock=lambda: 0, clock_rate=48000)
+    assert s.tick(48000) == pytest.approx(24)
+    assert s.tick(12000) == pytest.approx(6)
+
+def test_scheduler_pause_seek_rate():
+    clock = FakeClock(0)
+    s = Scheduler(Curve({0:0, 100:100}, default_interpolation='linear'), fps=1, offset=5, clock=clock)
+    clock.t = 2
+    assert s.time() == 7
+    s.pause()
+    clock.t = 10
+    assert s.paused
+    assert s.time() == 7
+    s.resume()
+    clock.t = 11
+    assert s.time() == 8
+    s.rate = 2
+    clock.t = 12
+    assert s.time() == 10
+    s.seek(50)
+    assert s.tick() == 50
+    clock.t = 13
+    assert s.tick() == 52
+
+def test_scheduler_latency_stats():
+    pg = ParameterGroup({'a':Curve({0:0, 10:10}, default_interpolation='linear')})
+    s = Scheduler(pg, fps=30, deadline=0)
+    for _ in range(5):
+        s.tick()
+    stats = s.stats()
+    assert stats['count'] == 5
+    assert stats['missed'] == 5
+    assert stats['p50'] <= stats['max']
+    assert sum(stats['buckets'].values()) == 5
+    s.reset_stats()
+    assert s.stats()['count'] == 0
+    assert s.stats()['missed'] == 0
@@ -0,0 +1,36 @@
+import math
+
+import pytest
+
+from keyframed import Curve, SmoothCurve, ParameterGroup, Composition, SinusoidalCurve
+
+
+def make_pgroup():
+    return ParameterGroup({
+        'a': SmoothCurve({0:0, 10:1, 20:0}, loop=True),
+        'b': Curve({0:1, 7:3}, default_interpolation='linear') * SinusoidalCurve(wavelength=13),
+        'c': Curve({0:2, 5:4}),
+    }, weight=0.5)
+
+def test_render_serial_curve():
+    c = SmoothCurve({0:0, 10:1})
+    assert c.render(range(20)) == [c[i] for i in range(20)]
+
+def test_render_serial_pgroup():
+    pg = make_pgroup()
+    cols = pg.render(range(30))
+    assert set(cols) == {'a', 'b', 'c'}
+    for i in range(30):
+        assert {k:cols[k][i] for k in cols} == pg[i]
+
+def test_render_parallel_matches_serial():
+    pg = make_pgroup()
+    frames = [i/3 for i in range(300)]
+    assert pg.render(frames, workers=2) == pg.render(frames)
+    comp = Composition({'x':SmoothCurve({0:0, 10:1}, bounce=True), 'y':Curve(2)}, reduction='multiply')
+    assert comp.render(frames, workers=2, chunksize=7) == comp.render(frames)
+
+def test_render_unpicklable_fails_fast():
+    c = Curve.from_function(lambda k: k)
+    with pytest.raises(TypeError, match="needs a picklable curve"):
+        c.render(range(10), workers=2)
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from keyframed import Curve, ParameterGroup, save_curve, open_curve
+from keyframed.curve import FunctionInterpolator
+from keyframed.interpolation import INTERPOLATORS
+from keyframed.serialization import to_dict, from_dict, to_yaml, from_yaml
+
+
+def wobble(k, curve, *args, **kargs):
+    return math.sin(k)
+
+def unregistered(k, curve, *args, **kargs):
+    return 2*k
+
+@pytest.fixture(autouse=True)
+def registered_wobble(monkeypatch):
+    # registered per test, so 'wobble' doesn't leak into the global registry for other test modules
+    monkeypatch.setitem(INTERPOLATORS, 'wobble', wobble)
+
+
+def test_registered_callable_by_name():
+    c = Curve({0:0, 5:1}, default_interpolation=wobble, label='foo')
+    txt = to_yaml(c, simplify=False)
+    assert 'wobble' in txt
+    c2 = from_yaml(txt)
+    assert c2._data[0].interpolation_method == 'wobble'
+    for i in range(10):
+        assert c2[i + 0.5] == c[i + 0.5]
+
+def test_registered_callable_in_pgroup_tagged():
+    pg = ParameterGroup({'a':Curve({0:0}, default_interpolation=wobble), 'b':Curve(1)})
+    pg2 = from_dict(to_dict(pg, tagged=True))
+    for i in range(10):
+        assert pg2[i + 0.5] == pg[i + 0.5]
+
+def test_unregistered_callable_raises():
+    c = Curve({0:0}, default_interpolation=unregistered)
+    with pytest.raises(TypeError, match='register_interpolation_method'):
+        to_yaml(c)
+
+def test_import_fallback():
+    c = Curve({0:0}, default_interpolation=unregistered)
+    txt = to_yaml(c, callables='import')
+    assert 'import:' in txt
+    with pytest.raises(ValueError):
+        from_yaml(txt)
+    c2 = from_yaml(txt, allow_import=True)
+    assert c2._data[0].interpolation_method is unregistered
+    assert c2[3.5] == 7
+
+def test_import_fallback_rejects_lambdas():
+    c = Curve({0:0}, default_interpolation=lambda k, _: k)
+    with pytest.raises(TypeError):
+        to_yaml(c, callables='import')
+
+def test_pickle_fallback():
+    c = Curve.from_function(math.sqrt)
+    d = to_dict(c, callables='pickle')
+    with pytest.raises(ValueError):
+        from_dict(d)
+    c2 = from_dict(d, allow_pickle=True)
+    assert isinstance(c2._data[0].interpolation_method, FunctionInterpolator)
+    assert c2[9] == 3
+
+def test_mapped_curve_registered_callable(tmp_path):
+    c = Curve({0:0, 5:1}, default_interpolation=wobble)
+    save_curve(c, tmp_path / 'w.kfc')
+    m = open_curve(tmp_path / 'w.kfc')
+    assert m[2.5] == c[2.5]
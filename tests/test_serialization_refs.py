@@ -0,0 +1,52 @@
+from keyframed import Curve, ParameterGroup, Composition, SmoothCurve
+from keyframed.serialization import to_dict, from_dict, to_yaml, from_yaml
+
+
+def make_shared():
+    base = SmoothCurve({0:0, 10:1, 20:0}, loop=True, label='base')
+    a = Composition({'base':base, 'two':Curve(2)}, reduction='multiply', label='a')
+    b = Composition({'base':base, 'three':Curve(3)}, reduction='add', label='b')
+    return base, ParameterGroup({'a':a, 'b':b})
+
+def test_shared_curve_written_once():
+    base, pg = make_shared()
+    d = to_dict(pg, dedupe=True)
+    assert list(d['$refs'].keys()) == ['base']
+    assert d['parameters']['a']['parameters']['base'] == {'$ref':'base'}
+    assert d['parameters']['b']['parameters']['base'] == {'$ref':'base'}
+    assert len(to_yaml(pg, dedupe=True)) < len(to_yaml(pg))
+
+def test_no_refs_without_sharing():
+    pg = ParameterGroup({'a':Curve(1), 'b':Curve(2)})
+    assert to_dict(pg, dedupe=True) == pg.to_dict()
+
+def test_aliasing_preserved_on_load():
+    base, pg = make_shared()
+    pg2 = from_dict(to_dict(pg, dedupe=True))
+    a, b = pg2.parameters['a'], pg2.parameters['b']
+    assert a.parameters['base'] is b.parameters['base']
+    for i in range(30):
+        assert pg2[i] == pg[i]
+
+def test_aliasing_preserved_yaml():
+    base, pg = make_shared()
+    txt = to_yaml(pg, simplify=True, dedupe=True)
+    pg2 = from_yaml(txt)
+    a, b = pg2.parameters['a'], pg2.parameters['b']
+    assert a.parameters['base'] is b.parameters['base']
+    for i in range(30):
+        assert pg2[i] == pg[i]
+
+def test_nested_shared_composition():
+    c = Curve({0:1, 5:2}, label='c')
+    inner = Composition({'c':c, 'one':Curve(1)}, reduction='add', label='inner')
+    outer = Composition({'x':inner, 'y':inner, 'c':c}, reduction='add', label='outer')
+    d = to_dict(outer, dedupe=True)
+    # ParameterGroup relabels its parameters, so the shared composition is now named after its last key
+    assert set(d['$refs'].keys()) == {inner.label, 'c'}
+    assert d['$refs'][inner.label]['parameters']['c'] == {'$ref':'c'}
+    outer2 = from_dict(d)
+    assert outer2.parameters['x'] is outer2.parameters['y']
+    assert outer2.parameters['x'].parameters['c'] is outer2.parameters['c']
+    for i in range(10):
+        assert outer2[i] == outer[i]
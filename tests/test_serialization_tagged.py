@@ -0,0 +1,76 @@
+import pytest
+
+from keyframed import Keyframe, Curve, ParameterGroup, Composition, SmoothCurve
+from keyframed.misc import HawkesProcessIntensity, SinusoidalCurve
+from keyframed.serialization import to_dict, from_dict, to_yaml, from_yaml, SCHEMA_VERSION
+
+
+def test_tagged_curve():
+    c = Curve({0:1, 5:2}, default_interpolation='linear', label='foo')
+    d = to_dict(c, tagged=True)
+    assert d['__type__'] == 'Curve'
+    assert d['__version__'] == SCHEMA_VERSION
+    c2 = from_dict(d)
+    assert c2 == c
+    assert c2.label == 'foo'
+
+def test_tagged_keyframe():
+    kf = Keyframe(t=0, value=1, interpolation_method='linear')
+    d = to_dict(kf, tagged=True)
+    assert d['__type__'] == 'Keyframe'
+    kf2 = from_dict(d)
+    assert (kf2.t, kf2.value, kf2.interpolation_method) == (0, 1, 'linear')
+
+def test_tagged_nested():
+    c1 = SmoothCurve({0:0, 10:1}, label='foo')
+    c2 = Curve({0:1, 3:2}, label='bar')
+    pg = ParameterGroup({'comp':c1 * c2, 'bar':c2}, weight=2)
+    d = to_dict(pg, simplify=True, for_yaml=True, tagged=True)
+    assert d['__type__'] == 'ParameterGroup'
+    assert d['weight']['__type__'] == 'Curve'
+    assert d['parameters']['comp']['__type__'] == 'Composition'
+    assert d['parameters']['comp']['parameters']['foo']['__type__'] == 'Curve'
+    pg2 = from_dict(d)
+    assert isinstance(pg2.parameters['comp'], Composition)
+    for i in range(12):
+        assert pg2[i] == pg[i]
+
+def test_tagged_subclasses():
+    c = HawkesProcessIntensity(decay=0.5, events=[1, 3])
+    d = to_dict(c, tagged=True)
+    assert d['__type__'] == 'Composition'
+    c2 = from_dict(d)
+    assert c2[4] == c[4]
+    assert to_dict(SinusoidalCurve(wavelength=10), tagged=True)['__type__'] == 'Curve'
+
+def test_tagged_yaml_with_refs():
+    base = Curve({0:0, 10:10}, default_interpolation='linear', label='base')
+    pg = ParameterGroup({'a':base + 1, 'b':base * 2})
+    txt = to_yaml(pg, tagged=True, dedupe=True)
+    pg2 = from_yaml(txt)
+    a, b = pg2.parameters['a'], pg2.parameters['b']
+    assert a.parameters['base'] is b.parameters['base']
+    for i in range(12):
+        assert pg2[i] == pg[i]
+
+def test_tag_beats_key_inference():
+    # a pgroup with a parameter named 'curve' would be mistaken for a Curve without the tag
+    pg = ParameterGroup({'curve':Curve(1), 'other':Curve(2)})
+    d = to_dict(pg, tagged=True)
+    pg2 = from_dict(d)
+    assert isinstance(pg2, ParameterGroup)
+    assert pg2[0] == {'curve':1, 'other':2}
+
+def test_untagged_still_supported():
+    pg = ParameterGroup({'a':Curve(1), 'b':Curve({0:0, 2:2})})
+    assert from_dict(pg.to_dict()) == pg
+
+def test_newer_schema_rejected():
+    d = to_dict(Curve(1), tagged=True)
+    d['__version__'] = SCHEMA_VERSION + 1
+    with pytest.raises(ValueError):
+        from_dict(d)
+
+def test_unknown_tag_rejected():
+    with pytest.raises(ValueError):
+        from_dict({'__type__':'Spline', 'curve':{}})
@@ -0,0 +1,149 @@
+import threading
+
+import pytest
+
+from keyframed import Curve, ParameterGroup, simplify
+
+
+def test_snapshot_unaffected_by_edits():
+    c = Curve({0:0, 5:5}, default_interpolation='linear')
+    snap = c.snapshot()
+    c[2] = 100
+    c[5] = -1
+    assert snap[2] == 2
+    assert snap[5] == 5
+    assert c[2] == 100
+    assert list(snap.keyframes) == [0, 5]
+
+def test_snapshot_is_read_only():
+    c = Curve({0:0, 5:5})
+    snap = c.snapshot()
+    with pytest.raises(TypeError):
+        snap[1] = 1
+    with pytest.raises(TypeError):
+        snap.append(Curve({0:1}))
+    # copies of a snapshot are ordinary curves
+    c2 = snap.copy()
+    c2[1] = 1
+    assert c2[1] == 1
+    assert 1 not in c.keyframes
+
+def test_snapshot_append_and_simplify():
+    c = Curve({0:0, 1:0, 2:0, 3:1})
+    snap = c.snapshot()
+    simplify(c)
+    c.append(Curve({0:2}))
+    assert list(c.keyframes) == [0, 2, 3, 4]
+    assert list(snap.keyframes) == [0, 1, 2, 3]
+
+def test_version_bumps_on_edit():
+    c = Curve({0:0})
+    v = c._version
+    c[1] = 1
+    assert c._version > v
+    v = c._version
+    with c.edit() as draft:
+        draft[2] = 2
+        assert 2 not in c.keyframes
+    assert c[2] == 2
+    assert c._version > v
+
+def test_edit_publishes_atomically():
+    c = Curve({0:0, 1:1})
+    snap = c.snapshot()
+    with c.edit() as draft:
+        draft[0] = 10
+        mid = c.snapshot()
+        draft[1] = 11
+    assert (snap[0], snap[1]) == (0, 1)
+    assert (mid[0], mid[1]) == (0, 1)
+    assert (c[0], c[1]) == (10, 11)
+
+def test_pgroup_snapshot():
+    pg = ParameterGroup({'a':Curve({0:0, 5:5}), 'b':Curve({0:1})})
+    snap = pg.snapshot()
+    pg.parameters['a'][0] = 3
+    assert snap[0] == {'a':0, 'b':1}
+    assert pg[0] == {'a':3, 'b':1}
+
+def test_concurrent_edits_and_reads():
+    n = 50
+    c = Curve({t:0 for t in range(n)})
+    done = threading.Event()
+    errors = []
+
+    def writer():
+        for i in range(1, 50):
+            with c.edit() as draft:
+                for t in range(n):
+                    draft[t] = i
+        done.set()
+
+    def reader():
+        while not done.is_set():
+            snap = c.snapshot()
+            values = [snap[t] for t in range(n)]
+            if len(set(values)) != 1:
+                errors.append(values)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert not errors
+    assert c[0] == 49
+
+def test_curve_from_snapshot_copies_on_write():
+    c = Curve({0:0, 5:5})
+    snap = c.snapshot()
+    c2 = Curve(snap)
+    c2[1] = 1
+    assert list(snap.keyframes) == [0, 5]
+    assert list(c.keyframes) == [0, 5]
+    c3 = Curve(c)
+    c[2] = 2
+    assert list(c3.keyframes) == [0, 5]
+
+def test_pgroup_edit_publishes_atomically():
+    pg = ParameterGroup({'a':Curve({0:0}), 'b':Curve({0:1})})
+    with pg.edit() as draft:
+        draft.parameters['a'][0] = 10
+        mid = pg.snapshot()
+        draft.parameters['b'][0] = 11
+    assert mid[0] == {'a':0, 'b':1}
+    assert pg[0] == {'a':10, 'b':11}
+
+def test_pgroup_snapshot_edit_is_refused():
+    pg = ParameterGroup({'a':Curve({0:0}), 'b':Curve({0:1})})
+    snap = pg.snapshot()
+    with pytest.raises(TypeError):
+        with snap.edit() as draft:
+            draft.parameters['a'][0] = 10
+    assert snap[0] == {'a':0, 'b':1}
+
+def test_concurrent_group_edits_and_snapshots():
+    pg = ParameterGroup({name:Curve({0:0}) for name in 'abcd'})
+    done = threading.Event()
+    errors = []
+
+    def writer():
+        for i in range(1, 200):
+            with pg.edit() as draft:
+                for curve in draft.parameters.values():
+                    curve[0] = i
+        done.set()
+
+    def reader():
+        while not done.is_set():
+            values = pg.snapshot()[0].values()
+            if len(set(values)) != 1:
+                errors.append(values)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert not errors
+    assert pg[0]['a'] == 199
@@ -0,0 +1,73 @@
+import json
+
+import keyframed
+from keyframed import Curve, Composition
+
+
+def nested():
+    a = Curve({0:1, 10:2}, default_interpolation='linear', label='a')
+    b = Curve({0:3}, label='b')
+    c = Curve({0:5}, label='c')
+    inner = Composition({'a':a, 'b':b}, reduction='add', label='inner')
+    return Composition({'inner':inner, 'c':c}, reduction='multiply', label='outer')
+
+def test_trace_spans():
+    comp = nested()
+    with keyframed.trace() as tr:
+        v = comp[5]
+    assert v == comp[5]
+    stacks = {span.stack for span in tr.spans}
+    assert ('outer',) in stacks
+    assert ('outer', 'inner', 'a') in stacks
+    assert ('outer', 'c') in stacks
+    outer = [span for span in tr.spans if span.stack == ('outer',)][0]
+    assert outer.method == 'multiply'
+    assert outer.duration >= outer.self_time
+    a = [span for span in tr.spans if span.name == 'a'][0]
+    assert a.method == 'linear'
+    assert a.k == 5
+
+def test_trace_uninstalls_on_exit():
+    original = Curve.__dict__['__getitem__']
+    with keyframed.trace() as tr:
+        Curve({0:1})[0]
+    assert Curve.__dict__['__getitem__'] is original
+    n = len(tr.spans)
+    Curve({0:1})[0]
+    assert len(tr.spans) == n
+
+def test_trace_with_stats_enabled():
+    original = Curve.__dict__['__getitem__']
+    keyframed.enable_instrumentation()
+    with keyframed.trace():
+        pass
+    # still instrumented for stats
+    assert Curve.__dict__['__getitem__'] is not original
+    keyframed.disable_instrumentation()
+    keyframed.reset_stats()
+    assert Curve.__dict__['__getitem__'] is original
+
+def test_chrome_trace():
+    comp = nested()
+    with keyframed.trace() as tr:
+        comp[1]
+        comp[2]
+    d = json.loads(json.dumps(tr.to_chrome_trace()))
+    events = d['traceEvents']
+    assert len(events) == len(tr.spans)
+    assert all(e['ph'] == 'X' for e in events)
+    assert events[0]['name'] == 'outer'
+    assert [e['ts'] for e in events] == sorted(e['ts'] for e in events)
+    assert {e['cat'] for e in events} == {'Curve', 'Composition'}
+
+def test_collapsed():
+    comp = nested()
+    with keyframed.trace() as tr:
+        for i in range(3):
+            comp[i]
+    lines = tr.to_collapsed().splitlines()
+    stacks = {line.rsplit(' ', 1)[0] for line in lines}
+    assert 'outer;inner;a' in stacks
+    assert 'outer;inner' in stacks
+    assert all(int(line.rsplit(' ', 1)[1]) >= 1 for line in lines)
+    assert len(lines) == len(stacks)